@@ -1,7 +1,186 @@
 import json
 import os
+import threading
+import time
 import requests
-from typing import Dict, List, Any, Optional, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Any, Optional, Union, Callable
+
+from nacha_file_gen_struct import NachaGenerator
+from nacha_file_validation import validate_nacha_file
+from nacha_repair import repair_nacha_file
+
+
+class ToolExecutor:
+    """
+    Run independent tool calls concurrently on a shared thread pool.
+
+    A timeout only stops the wait: Python threads cannot be interrupted, so a tool
+    that is already running keeps going and holds its pool slot until it returns,
+    and its late result is discarded. Tools that may run long have to enforce
+    their own deadlines.
+    """
+
+    def __init__(self, max_workers: int = 8, default_timeout: float = 30.0,
+                 timeouts: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            max_workers: Maximum number of tool calls running at once
+            default_timeout: Seconds to wait for a tool without its own timeout
+            timeouts: Per-tool timeouts in seconds, keyed by tool name
+        """
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool")
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+
+    def run_all(self, calls: List[Dict[str, Any]], execute: Callable[[str, Dict[str, Any]], Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Execute all tool calls at once and collect their results in call order.
+
+        Args:
+            calls: Tool calls with "name" and "parameters"
+            execute: Function running a single tool
+
+        Returns:
+            One result per call; calls that time out or raise return an error result
+        """
+        started = time.monotonic()
+        futures = [self.pool.submit(execute, call["name"], call["parameters"]) for call in calls]
+        results = []
+        for call, future in zip(calls, futures):
+            timeout = self.timeouts.get(call["name"], self.default_timeout)
+            try:
+                # Timeouts count from submission, so waiting on one call doesn't extend another's budget
+                results.append(future.result(timeout=max(0, started + timeout - time.monotonic())))
+            except FutureTimeoutError:
+                future.cancel()  # only helps if the call has not started yet
+                results.append({"status": "error", "message": f"Tool {call['name']} timed out after {timeout}s"})
+            except Exception as e:
+                results.append({"status": "error", "message": f"Tool {call['name']} failed: {e}"})
+        return results
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AgentMemory:
+    """
+    Bounded agent memory with entries serialized once, on insert.
+
+    Recent items live in a ring buffer of pre-serialized JSON strings. When the buffer
+    exceeds its item or token budget, the oldest items are folded into a compact
+    running summary. The serialized resource is cached and only rebuilt from the
+    already-serialized entries when memory changes, so building a request costs the
+    same no matter how long the session has been running.
+    """
+
+    def __init__(self, max_items: int = 20, max_tokens: int = 4000, max_item_chars: int = 2000):
+        """
+        Args:
+            max_items: Maximum number of recent items kept verbatim
+            max_tokens: Approximate token budget for the serialized memory resource
+            max_item_chars: Serialized items longer than this are truncated
+        """
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_item_chars = max_item_chars
+        self.entries = deque()  # (item, serialized, tokens)
+        self.tokens = 0
+        self.summary = {"type": "summary", "compacted_items": 0, "item_types": {}, "tools": {}, "recent_topics": []}
+        self.summary_text = None
+        self.summary_tokens = 0
+        self._resource = None
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token estimate (about four characters per token)."""
+        return len(text) // 4 + 1
+
+    def append(self, item: Dict[str, Any]):
+        """Serialize an item once and add it, compacting old items if over budget."""
+        serialized = json.dumps(item, separators=(",", ":"), ensure_ascii=False, default=str)
+        if len(serialized) > self.max_item_chars:
+            serialized = json.dumps({"type": item.get("type", "item"), "truncated": serialized[:self.max_item_chars]},
+                                    separators=(",", ":"), ensure_ascii=False)
+        tokens = self.estimate_tokens(serialized)
+        self.entries.append((item, serialized, tokens))
+        self.tokens += tokens
+
+        while len(self.entries) > 1 and (len(self.entries) > self.max_items
+                                         or self.tokens + self.summary_tokens > self.max_tokens):
+            self._compact(self.entries.popleft())
+        self._resource = None
+
+    def _compact(self, entry):
+        """Fold an evicted item into the running summary."""
+        item, _, tokens = entry
+        self.tokens -= tokens
+        summary = self.summary
+        summary["compacted_items"] += 1
+        item_type = item.get("type", "item")
+        summary["item_types"][item_type] = summary["item_types"].get(item_type, 0) + 1
+        if "tool" in item:
+            summary["tools"][item["tool"]] = summary["tools"].get(item["tool"], 0) + 1
+        if "user_input" in item:
+            summary["recent_topics"] = (summary["recent_topics"] + [str(item["user_input"])[:80]])[-3:]
+        self.summary_text = json.dumps(summary, separators=(",", ":"), ensure_ascii=False)
+        self.summary_tokens = self.estimate_tokens(self.summary_text)
+
+    def resource_content(self) -> str:
+        """Return the serialized memory resource, rebuilding it only after changes."""
+        if self._resource is None:
+            parts = [self.summary_text] if self.summary_text else []
+            parts.extend(serialized for _, serialized, _ in self.entries)
+            self._resource = "[" + ",".join(parts) + "]"
+        return self._resource
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Return the items currently held verbatim (oldest first)."""
+        return [item for item, _, _ in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+
+def create_http_session(api_key: str, pool_size: int = 10, retries: int = 3) -> requests.Session:
+    """
+    Create a pooled HTTP session for the Anthropic API.
+
+    Connections are kept alive and reused across calls; 429 and 5xx responses are
+    retried with exponential backoff, honouring Retry-After.
+
+    Args:
+        api_key: Anthropic API key
+        pool_size: Number of connections kept per host
+        retries: Maximum number of retries per request
+
+    Returns:
+        Configured requests.Session
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504, 529],
+        allowed_methods=["POST"],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json"
+    })
+    return session
+
 
 class Agent:
     def __init__(self, api_key: str):
@@ -13,20 +192,32 @@ class Agent:
         """
         self.api_key = api_key
         self.state = {
-            "memory": [],  # Long-term memory for the agent
+            "memory": AgentMemory(),  # Long-term memory for the agent
             "goals": [],   # Current goals the agent is pursuing
             "tools_used": {},  # Track tool usage statistics
             "user_preferences": {}  # Store user preferences
         }
         self.model = "claude-3-7-sonnet-20250219"  # Using the latest model
         self.api_url = "https://api.anthropic.com/v1/messages"
+        self.api_timeout = (5, 120)  # (connect, read) seconds
+        self.session = create_http_session(api_key)
+        self.tool_executor = ToolExecutor(timeouts={
+            "nacha_generate": 10,
+            "nacha_validate": 10,
+            "nacha_repair": 10
+        })
+        self._state_lock = threading.Lock()
+        # Tool name -> (definition factory, handler)
+        self.tools = {
+            "nacha_generate": (self.create_nacha_generate_tool, self.run_nacha_generate),
+            "nacha_validate": (self.create_nacha_validate_tool, self.run_nacha_validate),
+            "nacha_repair": (self.create_nacha_repair_tool, self.run_nacha_repair)
+        }
         
     def add_to_memory(self, item: Dict[str, Any]):
         """Add an important item to agent's memory."""
+        # Old items are compacted into a summary once the memory budget is exceeded
         self.state["memory"].append(item)
-        # Prune memory if it gets too large
-        if len(self.state["memory"]) > 20:
-            self.state["memory"] = self.state["memory"][-20:]
     
     def set_goal(self, goal: str):
         """Set a new goal for the agent."""
@@ -38,49 +229,103 @@ class Agent:
     
     def record_tool_use(self, tool_name: str):
         """Record the use of a tool for analytics."""
-        if tool_name in self.state["tools_used"]:
-            self.state["tools_used"][tool_name] += 1
-        else:
-            self.state["tools_used"][tool_name] = 1
+        with self._state_lock:
+            if tool_name in self.state["tools_used"]:
+                self.state["tools_used"][tool_name] += 1
+            else:
+                self.state["tools_used"][tool_name] = 1
     
-    def create_web_search_tool(self) -> Dict[str, Any]:
-        """Create a web search tool definition."""
+    def create_nacha_generate_tool(self) -> Dict[str, Any]:
+        """Create the local NACHA file generation tool definition."""
         return {
-            "name": "web_search",
-            "description": "Search the web for information",
+            "name": "nacha_generate",
+            "description": "Generate a NACHA file locally from a list of transactions",
             "input_schema": {
                 "type": "object",
                 "properties": {
-                    "query": {
+                    "company_name": {
                         "type": "string",
-                        "description": "The search query"
+                        "description": "Originating company name (max 16 characters)"
+                    },
+                    "company_id": {
+                        "type": "string",
+                        "description": "10 digit company identification"
+                    },
+                    "immediate_destination": {
+                        "type": "string",
+                        "description": "9 digit routing number of the receiving point"
+                    },
+                    "transactions": {
+                        "type": "array",
+                        "description": "Transactions to include in the file",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "routing_number": {"type": "string"},
+                                "account_number": {"type": "string"},
+                                "amount": {"type": "integer", "description": "Amount in cents"},
+                                "transaction_type": {"type": "string", "enum": ["credit", "debit"]},
+                                "id_number": {"type": "string"},
+                                "name": {"type": "string"}
+                            },
+                            "required": ["routing_number", "account_number", "amount", "transaction_type"]
+                        }
                     }
                 },
-                "required": ["query"]
+                "required": ["transactions"]
             }
         }
-    
-    def create_database_query_tool(self) -> Dict[str, Any]:
-        """Create a database query tool definition."""
+
+    def create_nacha_validate_tool(self) -> Dict[str, Any]:
+        """Create the local NACHA file validation tool definition."""
         return {
-            "name": "database_query",
-            "description": "Query a database for information",
+            "name": "nacha_validate",
+            "description": "Validate the structure, fields and control totals of a NACHA file",
             "input_schema": {
                 "type": "object",
                 "properties": {
-                    "query": {
+                    "file_content": {
                         "type": "string",
-                        "description": "The SQL query to execute"
-                    },
-                    "database": {
+                        "description": "The NACHA file content"
+                    }
+                },
+                "required": ["file_content"]
+            }
+        }
+
+    def create_nacha_repair_tool(self) -> Dict[str, Any]:
+        """Create the local NACHA file repair tool definition."""
+        return {
+            "name": "nacha_repair",
+            "description": "Fix record lengths, control records and block padding of a NACHA file; wrong check digits are reported, not changed",
+            "input_schema": {
+                "type": "object",
+                "properties": {
+                    "file_content": {
                         "type": "string",
-                        "description": "The database to query"
+                        "description": "The NACHA file content"
                     }
                 },
-                "required": ["query", "database"]
+                "required": ["file_content"]
             }
         }
-    
+
+    def run_nacha_generate(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate a NACHA file with the local NachaGenerator."""
+        originator = {key: params[key] for key in ("company_name", "company_id", "immediate_destination") if key in params}
+        nacha_file = NachaGenerator(**originator).generate_file(params["transactions"])
+        return {"status": "success", "file_content": nacha_file}
+
+    def run_nacha_validate(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate a NACHA file locally."""
+        status, errors = validate_nacha_file(params["file_content"])
+        return {"status": "success", "validation_status": status, "errors": errors}
+
+    def run_nacha_repair(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Repair a NACHA file locally."""
+        repaired, fixes, unrepaired = repair_nacha_file(params["file_content"])
+        return {"status": "success", "file_content": repaired, "fixes": fixes, "unrepaired": unrepaired}
+
     def execute_tool(self, tool_name: str, tool_params: Dict[str, Any]) -> Dict[str, Any]:
         """
         Execute a tool based on its name and parameters.
@@ -94,32 +339,14 @@ class Agent:
         """
         self.record_tool_use(tool_name)
         
-        # Mock implementations - in a real system these would call actual APIs
-        if tool_name == "web_search":
-            # Mock web search
-            return {
-                "status": "success",
-                "results": [
-                    {"title": "Mock search result 1", "snippet": "This is a mock search result."},
-                    {"title": "Mock search result 2", "snippet": "Another mock search result."}
-                ]
-            }
-        
-        elif tool_name == "database_query":
-            # Mock database query
-            return {
-                "status": "success",
-                "rows": [
-                    {"id": 1, "name": "Mock data 1"},
-                    {"id": 2, "name": "Mock data 2"}
-                ]
-            }
-        
-        else:
+        if tool_name not in self.tools:
             return {
                 "status": "error",
                 "message": f"Unknown tool: {tool_name}"
             }
+
+        _, handler = self.tools[tool_name]
+        return handler(tool_params)
     
     def build_mcp_request(self, user_input: str) -> Dict[str, Any]:
         """
@@ -132,10 +359,7 @@ class Agent:
             Complete MCP request structure
         """
         # Define available tools
-        tools = [
-            self.create_web_search_tool(),
-            self.create_database_query_tool()
-        ]
+        tools = [definition() for definition, _ in self.tools.values()]
         
         # Create resources (documents to be included in context)
         resources = []
@@ -145,7 +369,7 @@ class Agent:
             memory_resource = {
                 "type": "text",
                 "id": "agent_memory",
-                "content": json.dumps(self.state["memory"], indent=2)
+                "content": self.state["memory"].resource_content()
             }
             resources.append(memory_resource)
         
@@ -195,17 +419,15 @@ class Agent:
         """
         # Check if the response contains tool calls
         if "tool_calls" in response and response["tool_calls"]:
-            for tool_call in response["tool_calls"]:
-                tool_name = tool_call["name"]
-                tool_params = tool_call["parameters"]
-                
-                # Execute the tool
-                tool_result = self.execute_tool(tool_name, tool_params)
-                
-                # Add result to the response
-                if "tool_results" not in response:
-                    response["tool_results"] = []
-                
+            tool_calls = response["tool_calls"]
+
+            # Independent tool calls run concurrently; results keep the call order
+            tool_results = self.tool_executor.run_all(tool_calls, self.execute_tool)
+
+            if "tool_results" not in response:
+                response["tool_results"] = []
+
+            for tool_call, tool_result in zip(tool_calls, tool_results):
                 response["tool_results"].append({
                     "call_id": tool_call["id"],
                     "result": tool_result
@@ -214,8 +436,8 @@ class Agent:
                 # Save important tool results to memory
                 self.add_to_memory({
                     "type": "tool_result",
-                    "tool": tool_name,
-                    "params": tool_params,
+                    "tool": tool_call["name"],
+                    "params": tool_call["parameters"],
                     "result": tool_result
                 })
                 
@@ -279,33 +501,41 @@ class Agent:
                 break
         
         # Simple response logic based on user input
-        if "search" in user_input.lower():
+        if "generate" in user_input.lower():
             return {
                 "id": "msg_mockid12345",
                 "type": "message",
                 "role": "assistant",
                 "model": self.model,
-                "content": [{"text": "I'll search for that information."}],
+                "content": [{"text": "I'll generate a NACHA file for you."}],
                 "tool_calls": [
                     {
                         "id": "call_mock123",
-                        "name": "web_search",
-                        "parameters": {"query": user_input}
+                        "name": "nacha_generate",
+                        "parameters": {
+                            "company_name": "ACME CORP",
+                            "company_id": "1234567890",
+                            "transactions": [
+                                {"routing_number": "021000021", "account_number": "9876543210",
+                                 "amount": 100000, "transaction_type": "credit", "name": "JOHN DOE"}
+                            ]
+                        }
                     }
                 ]
             }
-        elif "database" in user_input.lower():
+        elif "validate" in user_input.lower() or "repair" in user_input.lower():
+            tool_name = "nacha_repair" if "repair" in user_input.lower() else "nacha_validate"
             return {
                 "id": "msg_mockid12346",
                 "type": "message",
                 "role": "assistant",
                 "model": self.model,
-                "content": [{"text": "Let me query the database for you."}],
+                "content": [{"text": "Let me check that NACHA file for you."}],
                 "tool_calls": [
                     {
                         "id": "call_mock124",
-                        "name": "database_query",
-                        "parameters": {"query": "SELECT * FROM mock_table LIMIT 2", "database": "mock_db"}
+                        "name": tool_name,
+                        "parameters": {"file_content": user_input.split(":", 1)[-1].strip("\n")}
                     }
                 ]
             }
@@ -328,16 +558,10 @@ class Agent:
         Returns:
             Response from Claude API
         """
-        headers = {
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
-        
-        response = requests.post(
+        response = self.session.post(
             self.api_url,
-            headers=headers,
-            json=request
+            json=request,
+            timeout=self.api_timeout
         )
         
         if response.status_code == 200:
@@ -0,0 +1,373 @@
+import os
+import json
+import time
+import uuid
+import argparse
+from types import SimpleNamespace
+from datetime import datetime, timezone
+
+from nacha_with_advanced_prompt import build_generation_params, clean_nacha_content
+from nacha_file_validation import validate_nacha_file
+from instrumentation import metrics
+
+STATE_FILE = "state.json"
+MAX_REQUESTS_PER_BATCH = 10000
+CHECKPOINT_EVERY = 100
+CLOCK_SKEW = 300  # seconds of client/server clock difference allowed when matching a batch to a submission
+
+
+class BatchJob:
+    """
+    Offline bulk generation through the Message Batches API
+
+    A job lives in its own directory. state.json records every request's recipe
+    (prompt + attachments, or a nacha_config), which batch it was submitted in and
+    what happened to its result. The state is rewritten atomically before and
+    after every submission and every few processed results, so an interrupted run
+    picks up where it stopped: submitted requests are never sent again, and results
+    already written to outputs/ are not reprocessed.
+    """
+
+    def __init__(self, job_dir, client=None):
+        """
+        Args:
+            job_dir: Directory holding state.json and outputs/
+            client: Anthropic client (or LocalBatchesStub); created on first use if omitted
+        """
+        self.job_dir = job_dir
+        self.output_dir = os.path.join(job_dir, "outputs")
+        self.state_path = os.path.join(job_dir, STATE_FILE)
+        self._client = client
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        else:
+            self.state = {"requests": {}, "batches": {}}
+        self.state.setdefault("submissions", {})  # client-side submission ID -> custom_ids, started_at
+
+    @property
+    def client(self):
+        if self._client is None:
+            from anthropic import Anthropic
+            self._client = Anthropic()
+        return self._client
+
+    def checkpoint(self):
+        """Atomically persist the job state"""
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def _add(self, custom_id, recipe):
+        if custom_id in self.state["requests"]:
+            return False  # already known from an earlier run
+        self.state["requests"][custom_id] = {"recipe": recipe, "status": "pending"}
+        return True
+
+    def add_attachments_request(self, custom_id, files, prompt, **kwargs):
+        """Queue a request built like generate_nacha_file.claude_api_with_attachments"""
+        return self._add(custom_id, {"kind": "attachments", "files": files, "prompt": prompt, "options": kwargs})
+
+    def add_config_request(self, custom_id, nacha_config, **kwargs):
+        """Queue a request built like nacha_with_advanced_prompt.generate_nacha_file"""
+        return self._add(custom_id, {"kind": "config", "config": nacha_config, "options": kwargs})
+
+    def _build_params(self, recipe):
+        if recipe["kind"] == "attachments":
+            from generate_nacha_file import build_message_params
+            return build_message_params(recipe["files"], recipe["prompt"], **recipe["options"])
+        return build_generation_params(recipe["config"], **recipe["options"])
+
+    def _record_batch(self, batch_id, status, custom_ids):
+        self.state["batches"][batch_id] = {"status": status, "custom_ids": custom_ids, "submitted_at": time.time()}
+        for custom_id in custom_ids:
+            self.state["requests"][custom_id].update(status="submitted", batch_id=batch_id)
+            self.state["requests"][custom_id].pop("submission_id", None)
+
+    def _reopen(self, submission_id):
+        for custom_id in self.state["submissions"].pop(submission_id)["custom_ids"]:
+            self.state["requests"][custom_id]["status"] = "pending"
+
+    def _candidates(self, submission):
+        """Unknown batches created since the submission started with its request count, newest first"""
+        candidates = []
+        for batch in self.client.messages.batches.list(limit=100):
+            if batch.created_at.timestamp() < submission["started_at"] - CLOCK_SKEW:
+                break
+            counts = batch.request_counts
+            total = counts.processing + counts.succeeded + counts.errored + counts.canceled + counts.expired
+            if batch.id not in self.state["batches"] and total == len(submission["custom_ids"]):
+                candidates.append(batch.id)
+        return candidates
+
+    def _holds(self, batch_id, custom_ids):
+        """Whether an ended batch's results are exactly these custom IDs"""
+        expected = set(custom_ids)
+        seen = set()
+        for result in self.client.messages.batches.results(batch_id):
+            if result.custom_id not in expected:
+                return False
+            seen.add(result.custom_id)
+        return seen == expected
+
+    def recover_submissions(self):
+        """
+        Resolve submissions interrupted before their batch ID was recorded
+
+        The Batches API takes no client-side ID, so the candidates are the unknown
+        batches created since the submission started with its request count. A
+        candidate is adopted only once it has ended and its results carry exactly
+        the submission's custom IDs; another job's batch of the same size is never
+        claimed. Until then the submission stays open and its requests are not
+        resent. When no candidate matches, the requests go back to pending.
+
+        Returns:
+            list: IDs of the batches recovered
+        """
+        recovered = []
+        for submission_id, submission in list(self.state["submissions"].items()):
+            if "candidates" not in submission:
+                submission["candidates"] = self._candidates(submission)
+            for batch_id in list(submission["candidates"]):
+                if self.client.messages.batches.retrieve(batch_id).processing_status != "ended":
+                    continue
+                submission["candidates"].remove(batch_id)
+                if self._holds(batch_id, submission["custom_ids"]):
+                    self._record_batch(batch_id, "ended", submission["custom_ids"])
+                    del self.state["submissions"][submission_id]
+                    recovered.append(batch_id)
+                    print(f"Recovered batch {batch_id} for interrupted submission {submission_id}")
+                    break
+            else:
+                if not submission["candidates"]:
+                    self._reopen(submission_id)
+                    print(f"No batch found for interrupted submission {submission_id}; its requests will be resent")
+            self.checkpoint()
+        return recovered
+
+    def submit(self, max_per_batch=MAX_REQUESTS_PER_BATCH):
+        """
+        Submit every pending request, at most max_per_batch per Message Batch
+
+        Each chunk is checkpointed under a client-side submission ID before its
+        batch is created, so a crash in between is recovered (see
+        recover_submissions) instead of being paid for twice.
+
+        Returns:
+            list: IDs of the batches created by this call
+        """
+        self.recover_submissions()
+        pending = [custom_id for custom_id, request in self.state["requests"].items() if request["status"] == "pending"]
+        created = []
+        for start in range(0, len(pending), max_per_batch):
+            chunk = pending[start:start + max_per_batch]
+            requests = [{"custom_id": custom_id, "params": self._build_params(self.state["requests"][custom_id]["recipe"])}
+                        for custom_id in chunk]
+            submission_id = uuid.uuid4().hex
+            self.state["submissions"][submission_id] = {"custom_ids": chunk, "started_at": time.time()}
+            for custom_id in chunk:
+                self.state["requests"][custom_id].update(status="submitting", submission_id=submission_id)
+            self.checkpoint()
+            with metrics.span("batch_submit", requests=len(requests)):
+                batch = self.client.messages.batches.create(requests=requests)
+
+            self._record_batch(batch.id, batch.processing_status, chunk)
+            del self.state["submissions"][submission_id]
+            self.checkpoint()
+            created.append(batch.id)
+            print(f"Submitted batch {batch.id} with {len(chunk)} requests")
+        return created
+
+    def _process_result(self, result):
+        request = self.state["requests"].get(result.custom_id)
+        if request is None or request["status"] not in ("submitted",):
+            return  # unknown or already handled before a restart
+
+        if result.result.type != "succeeded":
+            request["status"] = result.result.type  # errored, canceled or expired
+            error = getattr(result.result, "error", None)
+            request["error"] = str(error) if error is not None else None
+            return
+
+        message = result.result.message
+        metrics.record_usage(getattr(message, "usage", None))
+        text = "".join(block.text for block in message.content if block.type == "text")
+        with metrics.span("clean_nacha_content"):
+            content = clean_nacha_content(text)
+        status, errors = validate_nacha_file(content)
+
+        output_path = os.path.join(self.output_dir, f"{result.custom_id}.txt")
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        request.update(status="succeeded", output=output_path, validation_status=status,
+                       validation_errors=len(errors))
+
+    def collect(self, batch_id):
+        """Post-process the results of an ended batch, checkpointing as results come in"""
+        processed = 0
+        for result in self.client.messages.batches.results(batch_id):
+            self._process_result(result)
+            processed += 1
+            if processed % CHECKPOINT_EVERY == 0:
+                self.checkpoint()
+        self.state["batches"][batch_id]["status"] = "processed"
+        self.checkpoint()
+
+    def poll(self, interval=60, timeout=None):
+        """
+        Wait for submitted batches to end, collecting each one as soon as it does
+
+        Interrupted submissions are resolved along the way; requests they hand
+        back to pending are left for the next submit().
+
+        Args:
+            interval: Seconds between status checks
+            timeout: Give up after this many seconds (None waits until all batches end)
+
+        Returns:
+            bool: True if every batch has been processed
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            if self.state["submissions"]:
+                self.recover_submissions()
+            open_batches = [batch_id for batch_id, batch in self.state["batches"].items() if batch["status"] != "processed"]
+            if not open_batches and not self.state["submissions"]:
+                return True
+
+            for batch_id in open_batches:
+                batch = self.client.messages.batches.retrieve(batch_id)
+                self.state["batches"][batch_id]["status"] = batch.processing_status
+                if batch.processing_status == "ended":
+                    self.collect(batch_id)
+
+            if all(batch["status"] == "processed" for batch in self.state["batches"].values()) and not self.state["submissions"]:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                self.checkpoint()
+                return False
+            time.sleep(interval)
+
+    def retry_failed(self):
+        """Mark errored, expired and canceled requests as pending again so the next submit() resends them"""
+        count = 0
+        for request in self.state["requests"].values():
+            if request["status"] in ("errored", "expired", "canceled"):
+                request["status"] = "pending"
+                count += 1
+        self.checkpoint()
+        return count
+
+    def run(self, interval=60, timeout=None):
+        """Submit whatever is pending, then poll until done; safe to call again after an interruption"""
+        self.checkpoint()
+        while True:
+            self.submit()
+            if not self.poll(interval, timeout):
+                return False
+            if not any(request["status"] == "pending" for request in self.state["requests"].values()):
+                return True
+
+    def summary(self):
+        counts = {}
+        for request in self.state["requests"].values():
+            key = request["status"]
+            if key == "succeeded":
+                key = f"succeeded_{request['validation_status']}"
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+class LocalBatchesStub:
+    """
+    In-process stand-in for the Message Batches endpoint
+
+    Exposes client.messages.batches.create / retrieve / list / results with the same
+    shape as the Anthropic SDK. A batch reports "in_progress" for the first
+    `polls_until_ended` retrieves and "ended" afterwards; each request's text is
+    produced by `responder(params)`.
+    """
+
+    def __init__(self, responder, polls_until_ended=1, fail_custom_ids=()):
+        """
+        Args:
+            responder: Callable returning the response text for one request's params
+            polls_until_ended: Number of retrieve calls before a batch ends
+            fail_custom_ids: Custom IDs whose results come back as errored
+        """
+        self.responder = responder
+        self.polls_until_ended = polls_until_ended
+        self.fail_custom_ids = set(fail_custom_ids)
+        self.batches = {}
+        self.create_calls = 0
+        self.messages = SimpleNamespace(batches=self)
+
+    def create(self, requests):
+        self.create_calls += 1
+        batch_id = f"msgbatch_stub_{len(self.batches) + 1:04d}"
+        self.batches[batch_id] = {"requests": list(requests), "polls": 0, "created_at": datetime.now(timezone.utc)}
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+
+    def list(self, limit=20):
+        """Batches newest first, with their creation time and request counts"""
+        return [SimpleNamespace(id=batch_id, processing_status="in_progress", created_at=batch["created_at"],
+                                request_counts=SimpleNamespace(processing=len(batch["requests"]), succeeded=0,
+                                                               errored=0, canceled=0, expired=0))
+                for batch_id, batch in reversed(self.batches.items())][:limit]
+
+    def retrieve(self, batch_id):
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        status = "ended" if batch["polls"] >= self.polls_until_ended else "in_progress"
+        return SimpleNamespace(id=batch_id, processing_status=status)
+
+    def results(self, batch_id):
+        for request in self.batches[batch_id]["requests"]:
+            if request["custom_id"] in self.fail_custom_ids:
+                result = SimpleNamespace(type="errored", error={"type": "api_error", "message": "stub failure"})
+            else:
+                text = self.responder(request["params"])
+                message = SimpleNamespace(content=[SimpleNamespace(type="text", text=text)],
+                                          usage={"input_tokens": 0, "output_tokens": len(text) // 4})
+                result = SimpleNamespace(type="succeeded", message=message)
+            yield SimpleNamespace(custom_id=request["custom_id"], result=result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate many NACHA files through the Message Batches API")
+    parser.add_argument("job_dir", help="Job directory; re-running with the same directory resumes the job")
+    parser.add_argument("--manifest", help="JSON lines file: {custom_id, prompt, files} or {custom_id, config} per line")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between status polls")
+    parser.add_argument("--retry-failed", action="store_true", help="Resubmit errored, expired and canceled requests")
+    parser.add_argument("--stub", help="Answer every request locally with the contents of this NACHA file")
+
+    args = parser.parse_args()
+
+    client = None
+    if args.stub:
+        with open(args.stub, 'r', encoding='utf-8') as f:
+            stub_content = f.read()
+        client = LocalBatchesStub(lambda params: stub_content)
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+
+    job = BatchJob(args.job_dir, client)
+    if args.manifest:
+        with open(args.manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if "config" in item:
+                    job.add_config_request(item["custom_id"], item["config"])
+                else:
+                    job.add_attachments_request(item["custom_id"], item["files"], item["prompt"])
+    if args.retry_failed:
+        job.retry_failed()
+
+    job.run(interval=args.interval)
+    print(json.dumps(job.summary(), indent=2))
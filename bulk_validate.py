@@ -0,0 +1,213 @@
+import os
+import sys
+import csv
+import json
+import time
+import fnmatch
+import hashlib
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from nacha_file_validation import RULES_VERSION, validate_nacha_file
+
+DEFAULT_PATTERNS = ("*.txt", "*.ach")
+CACHE_FILE = ".nacha_validation_cache.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    content_hash TEXT NOT NULL,
+    rules_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    errors TEXT NOT NULL,
+    PRIMARY KEY (content_hash, rules_key)
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+"""
+
+_directories = {}  # routing directory index path -> RoutingDirectory, per worker process
+
+
+def _validate_path(path, routing_directory=None):
+    """Validate one file in a worker process; returns (path, content hash, status, errors)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    directory = None
+    if routing_directory:
+        if routing_directory not in _directories:
+            from routing_directory import RoutingDirectory
+            _directories[routing_directory] = RoutingDirectory(routing_directory)
+        directory = _directories[routing_directory]
+    status, errors = validate_nacha_file(data.decode('utf-8', errors='replace'), routing_directory=directory)
+    return path, hashlib.sha256(data).hexdigest(), status, errors
+
+
+def find_files(root, patterns=DEFAULT_PATTERNS):
+    """Walk a directory tree for files matching any of the glob patterns, skipping hidden directories"""
+    for directory, subdirs, names in os.walk(root):
+        subdirs[:] = sorted(name for name in subdirs if not name.startswith("."))
+        for name in sorted(names):
+            if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                yield os.path.join(directory, name)
+
+
+def rules_key(routing_directory=None):
+    """RULES_VERSION, plus the routing directory index's size and mtime when one is used"""
+    if not routing_directory:
+        return RULES_VERSION
+    stat = os.stat(routing_directory)
+    return f"{RULES_VERSION}:{os.path.abspath(routing_directory)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class ValidationCache:
+    """
+    SQLite cache of validation results keyed on content hash and rules key
+
+    A second table remembers each path's size, mtime and content hash, so files
+    untouched since the last run are recognised from a stat() alone, without
+    being read. Files whose mtime changed but whose content did not are read and
+    hashed, then still answered from the cache.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.executescript(SCHEMA)
+
+    def lookup_stat(self, path, stat, key):
+        row = self._db.execute(
+            "SELECT r.status, r.errors FROM files f JOIN results r ON r.content_hash = f.content_hash "
+            "WHERE f.path = ? AND f.size = ? AND f.mtime_ns = ? AND r.rules_key = ?",
+            (path, stat.st_size, stat.st_mtime_ns, key)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def lookup_hash(self, content_hash, key):
+        row = self._db.execute("SELECT status, errors FROM results WHERE content_hash = ? AND rules_key = ?",
+                               (content_hash, key)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def store(self, path, stat, content_hash, key, status=None, errors=None):
+        self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                         (path, stat.st_size, stat.st_mtime_ns, content_hash))
+        if status is not None:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                             (content_hash, key, status, json.dumps(errors)))
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def bulk_validate(root, patterns=DEFAULT_PATTERNS, cache_path=None, workers=None, routing_directory=None):
+    """
+    Validate every matching file under a directory tree on a process pool
+
+    Files whose content hash was already validated under the current rules key
+    are answered from the cache; an unchanged corpus is checked with one stat()
+    per file. Bump nacha_file_validation.RULES_VERSION after changing a rule to
+    revalidate everything.
+
+    Args:
+        root: Directory to walk
+        patterns: File name glob patterns to validate
+        cache_path: SQLite cache (default: <root>/.nacha_validation_cache.sqlite)
+        workers: Processes for validation (default: CPU count)
+        routing_directory: Optional routing directory index, passed to validate_nacha_file
+
+    Returns:
+        tuple: (summary dict with file counts and per error class counts, list of per-file results)
+    """
+    started = time.perf_counter()
+    key = rules_key(routing_directory)
+    cache = ValidationCache(cache_path or os.path.join(root, CACHE_FILE))
+    results = []
+    pending = {}
+    cached = 0
+
+    for path in find_files(root, patterns):
+        stat = os.stat(path)
+        hit = cache.lookup_stat(path, stat, key)
+        if hit is None:
+            with open(path, 'rb') as f:
+                content_hash = hashlib.sha256(f.read()).hexdigest()
+            hit = cache.lookup_hash(content_hash, key)
+            if hit is not None:
+                cache.store(path, stat, content_hash, key)  # touched but unchanged: remember the new mtime
+        if hit is None:
+            pending[path] = stat
+        else:
+            cached += 1
+            results.append({"file": path, "status": hit[0], "errors": hit[1]})
+
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(pending) // (workers * 4))
+            args = [routing_directory] * len(pending)
+            for path, content_hash, status, errors in pool.map(_validate_path, pending, args, chunksize=chunksize):
+                cache.store(path, pending[path], content_hash, key, status, errors)
+                results.append({"file": path, "status": status, "errors": errors})
+    cache.close()
+
+    error_classes = {}
+    for result in results:
+        codes = [error["code"] for error in result["errors"]]
+        for code in codes:
+            counts = error_classes.setdefault(code, {"errors": 0, "files": 0})
+            counts["errors"] += 1
+        for code in set(codes):
+            error_classes[code]["files"] += 1
+
+    summary = {
+        "root": root,
+        "rules_version": RULES_VERSION,
+        "files": len(results),
+        "validated": len(pending),
+        "cached": cached,
+        "valid": sum(result["status"] == "valid" for result in results),
+        "invalid": sum(result["status"] != "valid" for result in results),
+        "error_classes": dict(sorted(error_classes.items(), key=lambda item: (-item[1]["files"], item[0]))),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    results.sort(key=lambda result: result["file"])
+    return summary, results
+
+
+def write_report(summary, results, path):
+    """Write the summary as JSON (with per-file statuses), or as CSV with one row per error class"""
+    if path.lower().endswith(".csv"):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["error_class", "errors", "files"])
+            for code, counts in summary["error_classes"].items():
+                writer.writerow([code, counts["errors"], counts["files"]])
+        return
+    report = {**summary, "files_detail": [{"file": result["file"], "status": result["status"],
+                                           "error_classes": sorted({error["code"] for error in result["errors"]})}
+                                          for result in results]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate every NACHA file under a directory tree")
+    parser.add_argument("root", help="Directory to walk")
+    parser.add_argument("--pattern", action="append", help=f"File name glob (repeatable, default: {' '.join(DEFAULT_PATTERNS)})")
+    parser.add_argument("--cache", help=f"Result cache (default: ROOT/{CACHE_FILE})")
+    parser.add_argument("--workers", type=int, help="Validation processes (default: CPU count)")
+    parser.add_argument("--routing-directory", help="Index built by routing_directory.py; flags unknown receiving DFIs")
+    parser.add_argument("--report", help="Write the report to this .json or .csv file")
+
+    args = parser.parse_args()
+
+    summary, results = bulk_validate(args.root, tuple(args.pattern or DEFAULT_PATTERNS), args.cache,
+                                     args.workers, args.routing_directory)
+    if args.report:
+        write_report(summary, results, args.report)
+    print(json.dumps(summary, indent=2))
+    sys.exit(1 if summary["invalid"] else 0)
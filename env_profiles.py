@@ -0,0 +1,110 @@
+import os
+import json
+import random
+import threading
+
+DEFAULT_ENV_FILE = "resources/env_specific_data.json"
+SELECTION_TYPES = ("random", "fixed")
+
+# Environment field name -> NachaGenerator keyword argument
+GENERATOR_FIELDS = {
+    "Immediate Destination": "immediate_destination",
+    "Immediate Origin": "immediate_origin",
+    "Company Name": "company_name",
+    "Company ID": "company_id",
+    "Company Identification": "company_id",
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class EnvProfile:
+    """A parsed and validated environment file, flattened to one entry per field"""
+
+    def __init__(self, path, fields):
+        """
+        Args:
+            path: File the profile was loaded from
+            fields: List of (field name, possible values, selection type)
+        """
+        self.path = path
+        self.fields = fields
+
+    def resolve(self, seed=None):
+        """
+        Choose one value per field
+
+        Args:
+            seed: Seed for the random selections; the same seed always yields the same values
+
+        Returns:
+            dict: field name -> chosen value
+        """
+        rng = random.Random(seed)
+        return {name: rng.choice(values) if selection_type == "random" else values[0]
+                for name, values, selection_type in self.fields}
+
+
+def _flatten(section, path, fields, source):
+    for name, spec in section.items():
+        if not isinstance(spec, dict):
+            raise ValueError(f"{source}: '{'/'.join(path + [name])}' must be an object")
+        if "possible_values" not in spec:
+            _flatten(spec, path + [name], fields, source)
+            continue
+
+        values = spec["possible_values"]
+        selection_type = spec.get("selection_type", "fixed")
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"{source}: '{'/'.join(path + [name])}' needs a non-empty possible_values list")
+        if selection_type not in SELECTION_TYPES:
+            raise ValueError(f"{source}: '{'/'.join(path + [name])}' has unknown selection_type '{selection_type}'")
+        if any(existing == name for existing, _, _ in fields):
+            raise ValueError(f"{source}: field '{name}' is defined more than once")
+        fields.append((name, values, selection_type))
+
+
+def load_profile(path=DEFAULT_ENV_FILE):
+    """
+    Load an environment file, parsing it only when it changed on disk
+
+    Args:
+        path: Path to the environment JSON file
+
+    Returns:
+        EnvProfile: the cached profile, re-parsed if the file's mtime or size changed
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = os.path.abspath(path)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    fields = []
+    _flatten(data, [], fields, path)
+    profile = EnvProfile(path, fields)
+
+    with _cache_lock:
+        _cache[key] = (stamp, profile)
+    return profile
+
+
+def resolve_env_values(path=DEFAULT_ENV_FILE, seed=None):
+    """Load (or reuse) a profile and choose one value per field"""
+    return load_profile(path).resolve(seed)
+
+
+def compact_prompt_text(values):
+    """Minimal JSON rendering of the chosen values for inclusion in a prompt"""
+    return json.dumps(values, separators=(",", ":"), ensure_ascii=False)
+
+
+def generator_kwargs(values):
+    """Map chosen environment values to NachaGenerator keyword arguments"""
+    return {GENERATOR_FIELDS[name]: value for name, value in values.items() if name in GENERATOR_FIELDS}
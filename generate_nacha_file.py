@@ -3,10 +3,12 @@ import base64
 import mimetypes
 import argparse
 from datetime import datetime
-from dotenv import load_dotenv
-from anthropic import Anthropic
 
-from json_util import json_to_simple_text
+from env_profiles import DEFAULT_ENV_FILE, resolve_env_values, compact_prompt_text
+from instrumentation import metrics
+from resilient_calls import create_message
+from model_router import router
+from transport import transport
 
 system_prompt = """
 you are a payment domain expert and you have a detailed understanding of NACHA clearing and its terminology. 
@@ -31,10 +33,13 @@ def encode_ifrequired(file_path):
     """Read a file and encode its contents in base64 for pdf files"""
     mime_type = get_file_mimetype(file_path)
     
-    with open(file_path, 'rb') as file:
-        file_data = file.read()
-    
-    file_base64 = base64.b64encode(file_data).decode('utf-8')
+    with metrics.span("encode_ifrequired", file=file_path) as span:
+        with open(file_path, 'rb') as file:
+            file_data = file.read()
+        
+        file_base64 = base64.b64encode(file_data).decode('utf-8')
+        span["bytes"] = len(file_data)
+    metrics.add("bytes_in", len(file_data))
     print(f"Encoded {file_path} with MIME type {mime_type} and size {len(file_base64)} bytes")
     
     if mime_type != 'application/pdf':
@@ -45,31 +50,35 @@ def encode_ifrequired(file_path):
         "data": file_base64
     }
 
-def claude_api_with_attachments(files, prompt, model="claude-sonnet-4-20250514", max_tokens=2000, output_file=None):
+def build_message_params(files, prompt, model=None, max_tokens=None,
+                         env_file=DEFAULT_ENV_FILE, seed=None, env_values=None):
     """
-    Send a request to Claude API with file attachments using the Anthropic Python SDK
+    Build the Messages API parameters for a generation request with file attachments
     
     Args:
         files (list): List of file paths to attach
         prompt (str): The prompt to send to Claude
-        model (str): The Claude model to use
-        max_tokens (int): Maximum tokens to generate
-        output_file (str, optional): Path to save the response to. If None, no file is created.
+        model (str, optional): The Claude model to use; chosen by model_router if omitted
+        max_tokens (int, optional): Maximum tokens to generate; sized by model_router if omitted
+        env_file (str): Environment profile whose random selections are resolved locally
+        seed (int, optional): Seed for the environment selections, for reproducible prompts
+        env_values (dict, optional): Environment values already chosen for this run; resolved from env_file and seed if omitted
         
     Returns:
-        dict: The API response
+        dict: keyword arguments for client.messages.create (or one Message Batches request)
     """
-    # Load API key from environment variables
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
-    
-    # append the user prompt with enviornment specific data
-    prompt += "\n\n Use below values strictly" + json_to_simple_text("resources/env_specific_data.json")
+    if model is None or max_tokens is None:
+        decision = router.route_prompt(prompt, files)
+        model = model or decision["model"]
+        max_tokens = max_tokens or decision["max_tokens"]
+
+    # append the user prompt with the environment values chosen for this run
+    if env_values is None:
+        env_values = resolve_env_values(env_file, seed)
+    with metrics.span("prompt_assembly"):
+        prompt += "\n\n Use below values strictly" + compact_prompt_text(env_values)
 
     print(f"Prompt being sent to Api \n: {prompt}")
-    # Initialize Anthropic client
-    client = Anthropic(api_key=api_key)
     
     # Prepare message content
     message_content = [
@@ -97,34 +106,80 @@ def claude_api_with_attachments(files, prompt, model="claude-sonnet-4-20250514",
          
         
         message_content.append(message_object)
-       
     
-    # Make the API call using the SDK
-    message = client.messages.create(
-        model=model,
-        max_tokens=max_tokens,
-        system=system_prompt,
-        messages=[
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "system": system_prompt,
+        "messages": [
             {
                 "role": "user",
                 "content": message_content
             }
         ]
-    )
+    }
+
+@metrics.traced("claude_api_with_attachments")
+def claude_api_with_attachments(files, prompt, model=None, max_tokens=None, output_file=None,
+                                env_file=DEFAULT_ENV_FILE, seed=None, store=None):
+    """
+    Send a request to Claude API with file attachments using the Anthropic Python SDK
+    
+    Args:
+        files (list): List of file paths to attach
+        prompt (str): The prompt to send to Claude
+        model (str, optional): The Claude model to use; chosen by model_router if omitted
+        max_tokens (int, optional): Maximum tokens to generate; sized by model_router if omitted
+        output_file (str, optional): Path to save the response to. If None, no file is created.
+        env_file (str): Environment profile whose random selections are resolved locally
+        seed (int, optional): Seed for the environment selections, for reproducible prompts
+        store (OutputStore, optional): Content-addressed store to record the generated file in
+        
+    Returns:
+        dict: The API response
+    """
+    decision = router.route_prompt(prompt, files)
+    model = model or decision["model"]
+    max_tokens = max_tokens or decision["max_tokens"]
+    env_values = resolve_env_values(env_file, seed)  # resolved once, for the prompt and the store
+    params = build_message_params(files, prompt, model, max_tokens, env_file, seed, env_values)
+
+    # Real client, or recorded answers when NACHA_TRANSPORT is record/replay (see transport.py)
+    client = transport.client()
+    
+    # Make the API call using the SDK
+    with metrics.span("api_call", model=model):
+        message = create_message(client, params)
+    metrics.record_usage(getattr(message, "usage", None))
+    router.record_outcome(decision, message)
     
-    # Save response to output file if specified
     final_response = ""
+    for content in message.content:
+        if content.type == "text":
+            final_response = content.text
+    
+    # Save response to output file if specified
     if output_file:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for content in message.content:
-                if content.type == "text":
-                    f.write(content.text)
-                    final_response = content.text
+        with metrics.span("file_write", file=output_file) as span:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(final_response)
+            span["bytes"] = len(final_response.encode('utf-8'))
+        metrics.add("bytes_out", span["bytes"])
+    
+    # Record the file in the content-addressed store, deduplicated by content hash
+    if store is not None:
+        from nacha_file_validation import validate_nacha_file
+        status, _ = validate_nacha_file(final_response)
+        with metrics.span("store_put"):
+            store.put(final_response, prompt=prompt, env=env_file, env_values=compact_prompt_text(env_values),
+                      seed=seed, model=model, validation_status=status)
                 
     
     return final_response
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
     # Load environment variables from .env file
     load_dotenv()
     
@@ -132,8 +187,8 @@ if __name__ == "__main__":
     parser.add_argument("--file1", required=True, help="Path to first file attachment")
     parser.add_argument("--file2", required=True, help="Path to second file attachment")
     parser.add_argument("--prompt", required=True, help="Prompt for Claude")
-    parser.add_argument("--model", default="claude-3-7-sonnet-20250219", help="Claude model to use")
-    parser.add_argument("--max-tokens", type=int, default=2000, help="Maximum tokens to generate")
+    parser.add_argument("--model", help="Claude model to use (default: chosen by model_router)")
+    parser.add_argument("--max-tokens", type=int, help="Maximum tokens to generate (default: sized by model_router)")
     parser.add_argument("--output", help="Path to save the response to. If not specified, a timestamped file will be created.")
     
     args = parser.parse_args()
@@ -0,0 +1,295 @@
+import json
+import time
+import argparse
+
+from env_profiles import DEFAULT_ENV_FILE, resolve_env_values, generator_kwargs, compact_prompt_text
+from nacha_records import ENTRY_DETAIL_FIELDS, BATCH_HEADER_FIELDS, ADDENDA_FIELDS, iter_records, iter_entries, field, to_int, is_debit
+from nacha_compiler import compile_to_string
+from nacha_file_validation import validate_nacha_file
+from banking_calendar import default_calendar, eastern_now
+from instrumentation import metrics
+from resilient_calls import create_message
+from model_router import router
+from transport import transport
+
+SPEC_TOOL_NAME = "emit_nacha_spec"
+
+# Only the variable parts of a file; record layout, padding and control totals are rendered locally
+NACHA_SPEC_TOOL = {
+    "name": SPEC_TOOL_NAME,
+    "description": "Emit the batches and entries of the requested NACHA file. Record formatting and control totals are computed by the caller.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "batches": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "sec_code": {"type": "string", "enum": ["PPD", "CCD", "CTX", "WEB", "TEL"]},
+                        "entry_description": {"type": "string", "maxLength": 10},
+                        "effective_date": {"type": "string", "pattern": "^[0-9]{6}$", "description": "YYMMDD"},
+                        "entries": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "transaction_code": {"type": "string", "enum": ["22", "23", "27", "28", "32", "33", "37", "38"]},
+                                    "routing_number": {"type": "string", "pattern": "^[0-9]{8,9}$"},
+                                    "account_number": {"type": "string", "maxLength": 17},
+                                    "amount": {"type": "integer", "minimum": 0, "description": "Amount in cents"},
+                                    "name": {"type": "string", "maxLength": 22},
+                                    "id_number": {"type": "string", "maxLength": 15},
+                                    "payment_info": {"type": "string", "maxLength": 80},
+                                },
+                                "required": ["transaction_code", "routing_number", "account_number", "amount", "name"],
+                            },
+                        },
+                    },
+                    "required": ["sec_code", "entries"],
+                },
+            },
+        },
+        "required": ["batches"],
+    },
+}
+
+HYBRID_SYSTEM_PROMPT = """
+you are a payment domain expert with a detailed understanding of NACHA clearing and its terminology.
+Describe the NACHA file requested by the user by calling the emit_nacha_spec tool.
+Only provide business content: batches, SEC codes, transaction codes, routing and account numbers, amounts in cents and names.
+Do not format records; file headers, control records and totals are produced by the caller.
+"""
+
+
+def build_hybrid_params(prompt, model=None, max_tokens=None):
+    """
+    Build Messages API parameters that force a structured answer through the spec tool
+
+    The model and max_tokens are chosen by model_router when omitted.
+
+    Returns:
+        dict: keyword arguments for client.messages.create
+    """
+    if model is None or max_tokens is None:
+        decision = router.route_prompt(prompt, output="spec")
+        model = model or decision["model"]
+        max_tokens = max_tokens or decision["max_tokens"]
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "system": HYBRID_SYSTEM_PROMPT,
+        "tools": [NACHA_SPEC_TOOL],
+        "tool_choice": {"type": "tool", "name": SPEC_TOOL_NAME},
+        "messages": [{"role": "user", "content": prompt}],
+    }
+
+
+def extract_spec(message):
+    """Return the spec passed to the spec tool in a Messages API response"""
+    for block in message.content:
+        if block.type == "tool_use" and block.name == SPEC_TOOL_NAME:
+            return block.input
+    raise ValueError("Response did not call the emit_nacha_spec tool")
+
+
+def service_class_code(entries):
+    """200 for mixed batches, 220 for credits only, 225 for debits only"""
+    debits = {is_debit(entry["transaction_code"]) for entry in entries}
+    if debits == {True}:
+        return "225"
+    if debits == {False}:
+        return "220"
+    return "200"
+
+
+def spec_to_config(spec, originator=None, now=None):
+    """
+    Expand a compact spec into a nacha_config for nacha_compiler
+
+    Args:
+        spec: Dict matching NACHA_SPEC_TOOL's input schema
+        originator: NachaGenerator-style originator fields (immediate_destination,
+            immediate_origin, company_name, company_id); missing ones use NachaGenerator's defaults
+        now: datetime for the file creation date and the same-day cutoff (defaults to the current Eastern time)
+
+    Returns:
+        dict: nacha_config with file_header and batches
+    """
+    now = now or eastern_now()
+    originator = {"immediate_destination": "071000505", "immediate_origin": "1234567890",
+                  "company_name": "COMPANY NAME", "company_id": "1234567890", **(originator or {})}
+
+    batches = []
+    for batch in spec["batches"]:
+        entries = [{
+            "transaction_code": entry["transaction_code"],
+            "receiving_dfi_id": entry["routing_number"],
+            "dfi_account_number": entry["account_number"],
+            "amount": entry["amount"],
+            "individual_name": entry["name"],
+            "individual_id_number": entry.get("id_number", ""),
+            "addenda": [{"payment_related_info": entry["payment_info"]}] if entry.get("payment_info") else [],
+        } for entry in batch["entries"]]
+        batches.append({
+            "batch_header": {
+                "service_class_code": service_class_code(batch["entries"]),
+                "company_name": originator["company_name"],
+                "company_identification": originator["company_id"],
+                "standard_entry_class_code": batch["sec_code"],
+                "company_entry_description": batch.get("entry_description", "PAYMENT"),
+                "effective_entry_date": default_calendar.resolve(batch.get("effective_date"), now).strftime('%y%m%d'),
+            },
+            "entries": entries,
+        })
+
+    return {
+        "file_header": {
+            "immediate_destination": originator["immediate_destination"],
+            "immediate_origin": originator["immediate_origin"],
+            "file_creation_date": now.strftime('%y%m%d'),
+            "file_creation_time": now.strftime('%H%M'),
+        },
+        "batches": batches,
+    }
+
+
+def spec_from_file(path):
+    """
+    Reduce an existing NACHA file to the compact spec the model is asked to produce
+
+    Useful for measuring how much smaller the structured answer is than the file itself.
+    """
+    batches = []
+    current_header = None
+    for header, entry, addenda in iter_entries(iter_records(path)):
+        if header is not current_header:
+            current_header = header
+            batches.append({
+                "sec_code": field(header, BATCH_HEADER_FIELDS, "standard_entry_class_code"),
+                "entry_description": field(header, BATCH_HEADER_FIELDS, "company_entry_description").strip(),
+                "effective_date": field(header, BATCH_HEADER_FIELDS, "effective_entry_date"),
+                "entries": [],
+            })
+        item = {
+            "transaction_code": field(entry, ENTRY_DETAIL_FIELDS, "transaction_code"),
+            "routing_number": field(entry, ENTRY_DETAIL_FIELDS, "receiving_dfi_id") + field(entry, ENTRY_DETAIL_FIELDS, "check_digit"),
+            "account_number": field(entry, ENTRY_DETAIL_FIELDS, "dfi_account_number").strip(),
+            "amount": to_int(field(entry, ENTRY_DETAIL_FIELDS, "amount")),
+            "name": field(entry, ENTRY_DETAIL_FIELDS, "individual_name").strip(),
+        }
+        id_number = field(entry, ENTRY_DETAIL_FIELDS, "individual_id_number").strip()
+        if id_number:
+            item["id_number"] = id_number
+        if addenda:
+            item["payment_info"] = field(addenda[0], ADDENDA_FIELDS, "payment_related_info").strip()
+        batches[-1]["entries"].append(item)
+    return {"batches": batches}
+
+
+@metrics.traced("generate_hybrid")
+def generate_hybrid(prompt, model=None, max_tokens=None, output_file=None,
+                    env_file=DEFAULT_ENV_FILE, seed=None, client=None, store=None, now=None):
+    """
+    Generate a NACHA file by asking the model only for its variable fields
+
+    The model answers through a forced tool call with batches and entries; the
+    records, control totals and padding are rendered locally, so the model emits
+    a fraction of the tokens. Fields taken from the answer (routing numbers,
+    amounts) can still be invalid, so a stored file records its real validation
+    status.
+    Environment values (destination, origin, company) are applied locally and
+    are not sent to the model; a stored file records them with the seed.
+
+    Args:
+        prompt (str): Description of the payments to generate
+        model (str, optional): The Claude model to use; chosen by model_router if omitted
+        max_tokens (int, optional): Maximum tokens for the structured answer; sized by model_router if omitted
+        output_file (str, optional): Path to save the rendered file to
+        env_file (str): Environment profile supplying the originator fields
+        seed (int, optional): Seed for the environment selections
+        client (optional): Anthropic client; taken from transport.transport if omitted
+        store (OutputStore, optional): Content-addressed store to record the generated file in
+        now (datetime, optional): Time used for the file dates and the same-day cutoff
+
+    Returns:
+        str: the rendered NACHA file content
+    """
+    if client is None:
+        client = transport.client()
+
+    decision = router.route_prompt(prompt, output="spec")
+    model = model or decision["model"]
+    with metrics.span("api_call", model=model):
+        message = create_message(client, build_hybrid_params(prompt, model, max_tokens or decision["max_tokens"]))
+    metrics.record_usage(getattr(message, "usage", None))
+    router.record_outcome(decision, message)
+
+    with metrics.span("render"):
+        env_values = resolve_env_values(env_file, seed) if env_file else {}
+        content = compile_to_string(spec_to_config(extract_spec(message), generator_kwargs(env_values), now), now)
+
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+    if store is not None:
+        with metrics.span("store_put"):
+            store.put(content, prompt=prompt, env=env_file, env_values=compact_prompt_text(env_values), seed=seed,
+                      model=model, validation_status=validate_nacha_file(content)[0])
+    return content
+
+
+def compare_with_attachments(prompt, files, model=None, env_file=DEFAULT_ENV_FILE, seed=None):
+    """
+    Run the same prompt through claude_api_with_attachments and generate_hybrid
+
+    Returns:
+        dict: per mode, latency in seconds, input/output tokens and validation status
+    """
+    from generate_nacha_file import claude_api_with_attachments
+
+    report = {}
+    for mode, call in (("attachments", lambda: claude_api_with_attachments(files, prompt, model, env_file=env_file, seed=seed)),
+                       ("hybrid", lambda: generate_hybrid(prompt, model, env_file=env_file, seed=seed))):
+        started = time.perf_counter()
+        with metrics.request(f"compare_{mode}") as record:
+            content = call()
+        report[mode] = {
+            "seconds": round(time.perf_counter() - started, 3),
+            "input_tokens": record.counters.get("input_tokens", 0),
+            "output_tokens": record.counters.get("output_tokens", 0),
+            "validation_status": validate_nacha_file(content)[0],
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a NACHA file from a structured model answer rendered locally")
+    parser.add_argument("--prompt", help="Description of the payments to generate")
+    parser.add_argument("--model", help="Claude model to use (default: chosen by model_router)")
+    parser.add_argument("--env", default=DEFAULT_ENV_FILE, help="Environment profile supplying originator fields")
+    parser.add_argument("--seed", type=int, help="Seed for the environment profile's random selections")
+    parser.add_argument("--output", help="Path to save the rendered file to")
+    parser.add_argument("--compare", nargs="*", metavar="ATTACHMENT",
+                        help="Also run claude_api_with_attachments with these attachments and report the savings")
+    parser.add_argument("--spec-size", metavar="NACHA_FILE",
+                        help="Offline: compare a file's size with the size of its compact spec")
+
+    args = parser.parse_args()
+
+    if args.spec_size:
+        with open(args.spec_size, 'r', encoding='utf-8') as f:
+            file_chars = len(f.read())
+        spec_chars = len(json.dumps(spec_from_file(args.spec_size), separators=(",", ":")))
+        print(json.dumps({"file_chars": file_chars, "spec_chars": spec_chars,
+                          "ratio": round(spec_chars / file_chars, 3)}, indent=2))
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+        if args.compare is not None:
+            files = args.compare or ["resources/NACHA_format.pdf", "resources/nacha_customer_CT_PPD.txt"]
+            print(json.dumps(compare_with_attachments(args.prompt, files, args.model, args.env, args.seed), indent=2))
+        else:
+            content = generate_hybrid(args.prompt, args.model, output_file=args.output, env_file=args.env, seed=args.seed)
+            if not args.output:
+                print(content)
@@ -0,0 +1,278 @@
+import os
+import json
+import math
+import time
+import argparse
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Request currently being traced in this thread / task
+_current_request = contextvars.ContextVar("nacha_current_request", default=None)
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (q between 0 and 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class RequestRecord:
+    """Spans and counters collected while serving one generation request"""
+
+    def __init__(self, name, attrs):
+        self.id = os.urandom(8).hex()
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self.duration = None
+        self.spans = []
+        self.counters = {}
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "request_id": self.id,
+            "name": self.name,
+            "started": self.started,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "error": self.error,
+            "attrs": self.attrs,
+            "counters": self.counters,
+            "spans": self.spans,
+        }
+
+
+class Metrics:
+    """
+    Lightweight in-process metrics for the generation pipeline
+
+    Timing spans and counters (tokens, bytes, cache hits, retries) are aggregated
+    per span name and per request. Completed requests can be appended to a JSON
+    lines file, and the aggregates rendered in Prometheus text format.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, max_samples=10000):
+        """
+        Args:
+            jsonl_path: Append one JSON line per completed request to this file
+            prometheus_path: Rewrite this file in Prometheus text format after each request
+            max_samples: Number of recent durations kept per span for percentiles
+        """
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.durations = {}    # span name -> deque of seconds
+            self.span_totals = {}  # span name -> [count, total seconds]
+            self.counters = {}     # counter name -> total
+            self.request_log = deque(maxlen=self.max_samples)
+
+    @contextmanager
+    def request(self, name, **attrs):
+        """
+        Trace one end-to-end request; spans and counters recorded inside are attached to it
+
+        Yields:
+            RequestRecord: the record being filled
+        """
+        record = RequestRecord(name, attrs)
+        token = _current_request.set(record)
+        started = time.perf_counter()
+        try:
+            with self.span(name):
+                yield record
+        except Exception as e:
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.duration = time.perf_counter() - started
+            _current_request.reset(token)
+            self._finish(record)
+
+    def traced(self, name):
+        """Decorator tracing every call of a function as a request"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _current_request.get() is not None:
+                    with self.span(name):
+                        return func(*args, **kwargs)
+                with self.request(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def timed(self, name):
+        """Decorator recording every call of a function as a span"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Time a block of work
+
+        Yields:
+            dict: attributes of the span; callers may add to it (e.g. bytes written)
+        """
+        started = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                samples = self.durations.setdefault(name, deque(maxlen=self.max_samples))
+                samples.append(duration)
+                totals = self.span_totals.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += duration
+            record = _current_request.get()
+            if record is not None:
+                record.spans.append({"name": name, "duration_ms": round(duration * 1000, 3), **attrs})
+
+    def add(self, name, value=1):
+        """Increment a counter globally and on the current request"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        record = _current_request.get()
+        if record is not None:
+            record.counters[name] = record.counters.get(name, 0) + value
+
+    def record_usage(self, usage):
+        """Record token counts and prompt cache hits from an Anthropic `usage` object"""
+        if usage is None:
+            return
+        get = usage.get if isinstance(usage, dict) else lambda key, default=None: getattr(usage, key, default)
+        self.add("input_tokens", get("input_tokens", 0) or 0)
+        self.add("output_tokens", get("output_tokens", 0) or 0)
+        cache_read = get("cache_read_input_tokens", 0) or 0
+        self.add("cache_read_tokens", cache_read)
+        self.add("cache_write_tokens", get("cache_creation_input_tokens", 0) or 0)
+        if cache_read:
+            self.add("cache_hits")
+
+    def _finish(self, record):
+        summary = {"name": record.name, "duration": record.duration, "error": record.error,
+                   "output_tokens": record.counters.get("output_tokens", 0),
+                   "input_tokens": record.counters.get("input_tokens", 0)}
+        with self._lock:
+            self.request_log.append(summary)
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record.to_dict(), default=str) + "\n")
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+    def summary(self):
+        """
+        Aggregate latency percentiles and token usage
+
+        Returns:
+            dict: per-span count/p50/p95/p99 in milliseconds, counters, and tokens per request
+        """
+        with self._lock:
+            spans = {name: list(samples) for name, samples in self.durations.items()}
+            counts = {name: totals[0] for name, totals in self.span_totals.items()}
+            requests = list(self.request_log)
+            counters = dict(self.counters)
+
+        return {
+            "spans": {
+                name: {
+                    "count": counts[name],
+                    "p50_ms": round(percentile(values, 50) * 1000, 3),
+                    "p95_ms": round(percentile(values, 95) * 1000, 3),
+                    "p99_ms": round(percentile(values, 99) * 1000, 3),
+                }
+                for name, values in spans.items()
+            },
+            "counters": counters,
+            "requests": len(requests),
+            "output_tokens_per_request": (sum(r["output_tokens"] for r in requests) / len(requests)) if requests else 0,
+            "input_tokens_per_request": (sum(r["input_tokens"] for r in requests) / len(requests)) if requests else 0,
+        }
+
+    def prometheus_text(self):
+        """Render the aggregates in the Prometheus text exposition format"""
+        with self._lock:
+            spans = {name: (list(self.durations[name]), totals) for name, totals in self.span_totals.items()}
+            counters = dict(self.counters)
+
+        lines = [
+            "# HELP nacha_span_seconds Duration of instrumented pipeline stages",
+            "# TYPE nacha_span_seconds summary",
+        ]
+        for name, (values, (count, total)) in sorted(spans.items()):
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'nacha_span_seconds{{span="{name}",quantile="{q}"}} {percentile(values, q * 100):.6f}')
+            lines.append(f'nacha_span_seconds_sum{{span="{name}"}} {total:.6f}')
+            lines.append(f'nacha_span_seconds_count{{span="{name}"}} {count}')
+        for name in sorted(counters):
+            lines.append(f"# TYPE nacha_{name}_total counter")
+            lines.append(f"nacha_{name}_total {counters[name]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically rewrite a Prometheus textfile (e.g. for node_exporter's textfile collector)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def push(self, url, timeout=5):
+        """POST the Prometheus text to an endpoint such as a Pushgateway job URL"""
+        import urllib.request  # only needed when pushing; keeps CLI start-up fast
+
+        request = urllib.request.Request(url, data=self.prometheus_text().encode('utf-8'), method="POST",
+                                         headers={"Content-Type": "text/plain; version=0.0.4"})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+
+
+# Shared registry used by the generation modules; export paths come from the environment
+metrics = Metrics(jsonl_path=os.environ.get("NACHA_METRICS_JSONL"),
+                  prometheus_path=os.environ.get("NACHA_METRICS_PROM"))
+
+
+def summarize_jsonl(path):
+    """Compute p50/p95 latency and tokens per request from an exported JSON lines file"""
+    durations = {}
+    output_tokens = []
+    input_tokens = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            for span in record["spans"]:
+                durations.setdefault(span["name"], []).append(span["duration_ms"])
+            output_tokens.append(record["counters"].get("output_tokens", 0))
+            input_tokens.append(record["counters"].get("input_tokens", 0))
+
+    return {
+        "requests": len(output_tokens),
+        "spans": {name: {"count": len(values), "p50_ms": percentile(values, 50), "p95_ms": percentile(values, 95)}
+                  for name, values in durations.items()},
+        "output_tokens_per_request": sum(output_tokens) / len(output_tokens) if output_tokens else 0,
+        "input_tokens_per_request": sum(input_tokens) / len(input_tokens) if input_tokens else 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize exported generation metrics")
+    parser.add_argument("jsonl", help="JSON lines file written via NACHA_METRICS_JSONL")
+
+    args = parser.parse_args()
+    print(json.dumps(summarize_jsonl(args.jsonl), indent=2))
@@ -0,0 +1,266 @@
+import os
+import re
+import json
+import time
+import argparse
+import threading
+
+from nacha_records import RECORD_SIZE, BLOCKING_FACTOR
+from instrumentation import metrics
+
+LARGE_MODEL = os.environ.get("NACHA_LARGE_MODEL", "claude-sonnet-4-20250514")
+SMALL_MODEL = os.environ.get("NACHA_SMALL_MODEL", "claude-3-5-haiku-20241022")
+
+# Largest max_tokens each model accepts
+MODEL_OUTPUT_LIMITS = {
+    "claude-sonnet-4-20250514": 64000,
+    "claude-3-7-sonnet-20250219": 64000,
+    "claude-3-5-haiku-20241022": 8192,
+}
+DEFAULT_OUTPUT_LIMIT = 8192
+
+# Fixed-width records are mostly digits and runs of blanks, which tokenize poorly;
+# tune with summarize_log() once real outcomes have been recorded
+CHARS_PER_TOKEN = 1.25
+SPEC_TOKENS_PER_ENTRY = 45
+SPEC_TOKENS_PER_BATCH = 30
+SAFETY_MARGIN = 1.25
+OVERHEAD_TOKENS = 200
+MIN_MAX_TOKENS = 512
+UNKNOWN_SIZE_MAX_TOKENS = 2000  # the fixed budget used before routing, for prompts giving no sizes
+IAT_ADDENDA_PER_ENTRY = 7
+EDIT_RECORD_LIMIT = 200
+
+# An edit request leads with the verb; "generate a file and update the control record" is a generation
+EDIT_REQUEST = re.compile(r"^\W*(?:(?:please|can you|could you)\s+)?(fix|correct|change|update|edit|modify|repair|replace|adjust)\b",
+                          re.IGNORECASE)
+ENTRY_COUNT = re.compile(r"(\d+)\s+(?:[a-z-]+\s+){0,2}?(entries|entry|transactions?|payments?|records?|credits?|debits?)\b",
+                         re.IGNORECASE)
+BATCH_COUNT = re.compile(r"(\d+)\s+(?:[a-z-]+\s+)?batch(es)?\b", re.IGNORECASE)
+PER_BATCH = re.compile(r"\b(each|every|per)\s+batch\b", re.IGNORECASE)
+SENTENCE_END = re.compile(r"[.;!?]\s|\n")
+IAT_WORDS = re.compile(r"\b(IAT|international|cross-border|foreign)\b", re.IGNORECASE)
+
+
+def estimate_records(entries, batches=1, addenda=0):
+    """File header/control, batch header/control per batch, entries and addenda, padded to the blocking factor"""
+    records = 2 + 2 * batches + entries + addenda
+    return -(-records // BLOCKING_FACTOR) * BLOCKING_FACTOR
+
+
+def _round_up(value, step=256):
+    return int(-(-value // step) * step)
+
+
+class ModelRouter:
+    """
+    Choose the model and max_tokens for a generation request from its expected size
+
+    The output size is estimated from the entry, addenda and batch counts (94
+    characters per record, or a per-entry allowance for hybrid JSON answers) and
+    max_tokens is set to that estimate plus a safety margin. IAT requests stay on
+    the large model; edits of small files and structured (hybrid) answers go to the
+    small one. Every decision, and the actual usage it led to, can be appended to a
+    JSON lines log for tuning the constants above.
+    """
+
+    def __init__(self, log_path=None, small_model=SMALL_MODEL, large_model=LARGE_MODEL):
+        """
+        Args:
+            log_path: JSON lines file receiving decisions and outcomes (None keeps no log)
+            small_model: Model for edits and structured answers
+            large_model: Model for IAT and large generations
+        """
+        self.log_path = log_path
+        self.small_model = small_model
+        self.large_model = large_model
+        self._lock = threading.Lock()
+
+    def route(self, entries, batches=1, addenda=0, sec_codes=(), edit=False, output="records", source="generation",
+              min_tokens=MIN_MAX_TOKENS):
+        """
+        Route one request
+
+        Args:
+            entries: Expected number of entry detail records
+            batches: Expected number of batches
+            addenda: Expected number of addenda records
+            sec_codes: SEC codes in the request (IAT keeps the large model)
+            edit: True when the request modifies an existing file rather than creating one
+            output: "records" for a fixed-width file, "spec" for a hybrid JSON answer
+            source: Label recorded with the decision (which code path asked)
+            min_tokens: Floor for max_tokens
+
+        Returns:
+            dict: decision with model, max_tokens, the estimates and the reason
+        """
+        sec_codes = sorted(set(sec_codes))
+        records = estimate_records(entries, batches, addenda)
+        if output == "spec":
+            estimated_tokens = entries * SPEC_TOKENS_PER_ENTRY + batches * SPEC_TOKENS_PER_BATCH
+        else:
+            estimated_tokens = records * (RECORD_SIZE + 1) / CHARS_PER_TOKEN
+        wanted = max(min_tokens, _round_up(estimated_tokens * SAFETY_MARGIN + OVERHEAD_TOKENS))
+
+        if "IAT" in sec_codes:
+            model, reason = self.large_model, "iat"
+        elif edit and records <= EDIT_RECORD_LIMIT:
+            model, reason = self.small_model, "simple_edit"
+        elif output == "spec":
+            model, reason = self.small_model, "structured_output"
+        else:
+            model, reason = self.large_model, "generation"
+        if wanted > MODEL_OUTPUT_LIMITS.get(model, DEFAULT_OUTPUT_LIMIT) and model != self.large_model:
+            model, reason = self.large_model, f"{reason}_too_large"
+
+        decision = {
+            "id": os.urandom(6).hex(),
+            "event": "decision",
+            "time": time.time(),
+            "source": source,
+            "model": model,
+            "max_tokens": min(wanted, MODEL_OUTPUT_LIMITS.get(model, DEFAULT_OUTPUT_LIMIT)),
+            "reason": reason,
+            "entries": entries,
+            "batches": batches,
+            "addenda": addenda,
+            "sec_codes": sec_codes,
+            "estimated_records": records,
+            "estimated_output_tokens": round(estimated_tokens),
+            "capped": wanted > MODEL_OUTPUT_LIMITS.get(model, DEFAULT_OUTPUT_LIMIT),
+        }
+        metrics.add(f"route_{reason}")
+        self._log(decision)
+        return decision
+
+    def route_config(self, nacha_config, output="records"):
+        """Route a nacha_config (as built by create_sample_iat_config)"""
+        entries = addenda = 0
+        sec_codes = []
+        for batch in nacha_config["batches"]:
+            sec_code = batch["batch_header"]["standard_entry_class_code"]
+            sec_codes.append(sec_code)
+            for entry in batch["entries"]:
+                entries += 1
+                addenda += len(entry.get("addenda", [])) + (IAT_ADDENDA_PER_ENTRY if sec_code == "IAT" else 0)
+        return self.route(entries, len(nacha_config["batches"]), addenda, sec_codes, output=output, source="config")
+
+    def route_transactions(self, transactions, sec_code="PPD"):
+        """Route a single-batch request for a list of transactions"""
+        return self.route(len(transactions), 1, 0, [sec_code], source="transactions")
+
+    def route_prompt(self, prompt, files=(), output="records"):
+        """
+        Route a free text request, reading entry and batch counts from the prompt
+
+        A prompt starting with an edit verb ("fix", "change", ...) is routed as an
+        edit. Counts in a sentence saying "each batch" or "per batch" are multiplied
+        by the batch count. When the prompt gives no counts, the size of any attached NACHA
+        text file is used instead (the common case for edits of an existing file);
+        with neither, max_tokens keeps the UNKNOWN_SIZE_MAX_TOKENS floor.
+        """
+        batches = sum(int(match.group(1)) for match in BATCH_COUNT.finditer(prompt)) or 1
+        entries = 0
+        for sentence in SENTENCE_END.split(prompt):
+            count = sum(int(match.group(1)) for match in ENTRY_COUNT.finditer(sentence))
+            entries += count * batches if PER_BATCH.search(sentence) else count
+        edit = bool(EDIT_REQUEST.search(prompt))
+        sec_codes = ["IAT"] if IAT_WORDS.search(prompt) else []
+
+        addenda = 0
+        if not entries:
+            for path in files:
+                if path.lower().endswith(".txt") and os.path.exists(path):
+                    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                        counts = {"5": 0, "6": 0, "7": 0}
+                        for line in f:
+                            if line[:1] in counts:
+                                counts[line[:1]] += 1
+                    entries = max(entries, counts["6"])
+                    addenda = max(addenda, counts["7"])
+                    batches = max(batches, counts["5"])
+        if not entries:
+            return self.route(10, batches, addenda, sec_codes, edit=edit, output=output, source="prompt",
+                              min_tokens=UNKNOWN_SIZE_MAX_TOKENS)
+        return self.route(entries, batches, addenda, sec_codes, edit=edit, output=output, source="prompt")
+
+    def record_outcome(self, decision, message):
+        """Log the usage and stop reason of the response a decision led to"""
+        usage = getattr(message, "usage", None)
+        get = usage.get if isinstance(usage, dict) else lambda key, default=None: getattr(usage, key, default)
+        stop_reason = getattr(message, "stop_reason", None)
+        if stop_reason == "max_tokens":
+            metrics.add("max_tokens_truncations")
+        self._log({
+            "id": decision["id"],
+            "event": "outcome",
+            "time": time.time(),
+            "model": decision["model"],
+            "max_tokens": decision["max_tokens"],
+            "output_tokens": (get("output_tokens", 0) or 0) if usage is not None else None,
+            "stop_reason": stop_reason,
+        })
+
+    def _log(self, item):
+        if not self.log_path:
+            return
+        with self._lock:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(item) + "\n")
+
+
+def summarize_log(path):
+    """
+    Compare estimates with actual output tokens in a routing log
+
+    Returns:
+        dict: per model, decision count, truncations and mean actual/estimated output token ratio
+    """
+    decisions = {}
+    outcomes = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            item = json.loads(line)
+            if item["event"] == "decision":
+                decisions[item["id"]] = item
+            else:
+                outcomes.append(item)
+
+    summary = {}
+    for decision in decisions.values():
+        stats = summary.setdefault(decision["model"], {"decisions": 0, "outcomes": 0, "truncated": 0, "ratios": []})
+        stats["decisions"] += 1
+    for outcome in outcomes:
+        decision = decisions.get(outcome["id"])
+        if decision is None:
+            continue
+        stats = summary[decision["model"]]
+        stats["outcomes"] += 1
+        stats["truncated"] += outcome["stop_reason"] == "max_tokens"
+        if outcome["output_tokens"] and decision["estimated_output_tokens"]:
+            stats["ratios"].append(outcome["output_tokens"] / decision["estimated_output_tokens"])
+    for stats in summary.values():
+        ratios = stats.pop("ratios")
+        stats["actual_to_estimate"] = round(sum(ratios) / len(ratios), 3) if ratios else None
+    return summary
+
+
+# Shared router used by the generation modules; decisions are logged when NACHA_ROUTING_LOG is set
+router = ModelRouter(log_path=os.environ.get("NACHA_ROUTING_LOG"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show routing decisions, or summarize a routing log")
+    parser.add_argument("--prompt", help="Route a free text prompt")
+    parser.add_argument("--config", help="Route a nacha_config JSON file")
+    parser.add_argument("--summarize", help="Summarize a routing log written via NACHA_ROUTING_LOG")
+
+    args = parser.parse_args()
+
+    if args.summarize:
+        print(json.dumps(summarize_log(args.summarize), indent=2))
+    elif args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            print(json.dumps(router.route_config(json.load(f)), indent=2))
+    else:
+        print(json.dumps(router.route_prompt(args.prompt or ""), indent=2))
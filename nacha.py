@@ -0,0 +1,291 @@
+"""
+Command line entry point for NACHA file tooling
+
+    python nacha.py generate --transactions payroll.json --output payroll.ach
+    python nacha.py generate --prompt "2 CCD batches of 2 payments" --output out.ach
+    python nacha.py validate out.ach other.ach
+    python nacha.py repair out.ach --output fixed.ach
+    python nacha.py diff reference.ach out.ach --output diff.jsonl
+    python nacha.py inspect out.ach
+    python nacha.py serve --port 8080
+
+Only the standard library and the local record modules are imported up front.
+The Anthropic SDK, python-dotenv and Gradio are imported inside the subcommands
+that need them, so local-only commands (validate, repair, diff, inspect and
+local generate) start fast enough to be called thousands of times from a shell
+pipeline. Check with: python -X importtime nacha.py validate FILE
+"""
+import sys
+import json
+import argparse
+
+DEFAULT_ATTACHMENTS = ["resources/NACHA_format.pdf", "resources/nacha_customer_CT_PPD.txt"]
+
+
+def _read(path):
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _write(path, content):
+    if not path or path == "-":
+        sys.stdout.write(content + "\n")
+        return
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(content)
+
+
+def _load_dotenv():
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def cmd_generate(args):
+    """Generate a file locally from transactions or a config, or through Claude from a prompt (or a config with --llm)"""
+    if args.transactions:
+        from nacha_file_gen_struct import NachaGenerator
+
+        spec = json.loads(_read(args.transactions))
+        if isinstance(spec, list):
+            spec = {"transactions": spec}
+        originator = {key: spec[key] for key in ("immediate_destination", "immediate_origin",
+                                                 "company_name", "company_id") if key in spec}
+        if args.env:
+            from env_profiles import resolve_env_values, generator_kwargs
+
+            originator.update(generator_kwargs(resolve_env_values(args.env, args.seed)))
+        content = NachaGenerator(**originator).generate_file(spec["transactions"])
+    elif args.config and not args.llm:
+        from nacha_compiler import compile_to_string
+
+        content = compile_to_string(json.loads(_read(args.config)))
+    elif args.config:
+        _load_dotenv()
+        from nacha_with_advanced_prompt import generate_nacha_file
+
+        content = generate_nacha_file(json.loads(_read(args.config)))
+    elif args.hybrid:
+        _load_dotenv()
+        from hybrid_generation import generate_hybrid
+
+        kwargs = {"model": args.model} if args.model else {}
+        if args.env:
+            kwargs["env_file"] = args.env
+        content = generate_hybrid(args.prompt, seed=args.seed, **kwargs)
+    else:
+        _load_dotenv()
+        from generate_nacha_file import claude_api_with_attachments
+
+        kwargs = {"model": args.model} if args.model else {}
+        if args.env:
+            kwargs["env_file"] = args.env
+        kwargs["seed"] = args.seed
+        content = claude_api_with_attachments(args.attach or DEFAULT_ATTACHMENTS, args.prompt, **kwargs)
+
+    _write(args.output, content)
+    return 0
+
+
+def cmd_validate(args):
+    """Validate one or more files; the exit status is 1 if any file is invalid"""
+    from nacha_file_validation import validate_nacha_file
+
+    directory = None
+    if args.routing_directory:
+        from routing_directory import RoutingDirectory
+
+        directory = RoutingDirectory(args.routing_directory)
+
+    exit_code = 0
+    for path in args.files:
+        status, errors = validate_nacha_file(_read(path), routing_directory=directory)
+        if args.json:
+            print(json.dumps({"file": path, "status": status, "errors": errors}))
+        else:
+            print(f"{path}: {status}")
+            for error in errors:
+                print(f"  line {error['line']}: {error['code']}: {error['message']}")
+        if status != "valid":
+            exit_code = 1
+    return exit_code
+
+
+def cmd_repair(args):
+    """Rebuild record lengths, controls and padding; exits 1 if problems were left unrepaired"""
+    from nacha_repair import repair_nacha_file
+
+    repaired, fixes, unrepaired = repair_nacha_file(_read(args.file))
+    for fix in fixes:
+        print(fix, file=sys.stderr)
+    for problem in unrepaired:
+        print(f"Not repaired: {problem}", file=sys.stderr)
+    _write(args.output, repaired)
+    return 1 if unrepaired else 0
+
+
+def cmd_diff(args):
+    """Reconcile the entries of two files"""
+    from nacha_diff import reconcile
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as report:
+            summary = reconcile(args.file_a, args.file_b, report)
+    else:
+        summary = reconcile(args.file_a, args.file_b)
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["added"] == summary["removed"] == summary["changed"] == 0 else 1
+
+
+def cmd_merge(args):
+    """Merge files into one, renumbering batches and rebuilding controls"""
+    from nacha_merge import merge_files
+
+    options = dict(order=args.order, resequence_traces=args.resequence_traces,
+                   recompute_controls=args.recompute_controls, file_id_modifier=args.file_id_modifier)
+    if args.output and args.output != "-":
+        with open(args.output, 'w', encoding='utf-8', newline='\n') as f:
+            stats = merge_files(args.files, f, **options)
+    else:
+        stats = merge_files(args.files, sys.stdout, **options)
+    print(json.dumps(stats), file=sys.stderr)
+    return 0
+
+
+def cmd_inspect(args):
+    """Print the file header, one line per batch and the file totals"""
+    from nacha_records import (FILE_HEADER_FIELDS, BATCH_HEADER_FIELDS, iter_records, field, is_padding)
+    from nacha_writer import ControlTotals
+
+    report = {"file_header": {}, "batches": [], "padding_records": 0}
+    file_totals = ControlTotals()
+    batch_totals = None
+    batch = None
+    addenda_count = 0
+
+    for record in iter_records(args.file):
+        record_type = record[:1]
+        if record_type == '1':
+            report["file_header"] = {name: field(record, FILE_HEADER_FIELDS, name).strip()
+                                     for name in ("immediate_destination", "immediate_origin",
+                                                  "file_creation_date", "file_creation_time",
+                                                  "immediate_destination_name", "immediate_origin_name")}
+        elif record_type == '5':
+            batch = {name: field(record, BATCH_HEADER_FIELDS, name).strip()
+                     for name in ("batch_number", "service_class_code", "company_name", "company_identification",
+                                  "standard_entry_class_code", "company_entry_description", "effective_entry_date")}
+            batch_totals = ControlTotals()
+        elif record_type == '6' and batch_totals is not None:
+            batch_totals.add_entry(record)
+        elif record_type == '7' and batch_totals is not None:
+            batch_totals.entry_addenda_count += 1
+            addenda_count += 1
+        elif record_type == '8' and batch is not None:
+            batch.update(batch_totals.as_dict())
+            report["batches"].append(batch)
+            file_totals.add(batch_totals)
+            batch = batch_totals = None
+        elif is_padding(record):
+            report["padding_records"] += 1
+
+    report["totals"] = {"batch_count": len(report["batches"]), "addenda_count": addenda_count,
+                        **file_totals.as_dict()}
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def cmd_ui(args):
+    """Launch the Gradio page"""
+    _load_dotenv()
+    import ui
+
+    ui.demo.launch()
+    return 0
+
+
+def cmd_serve(args):
+    """Run the HTTP service"""
+    _load_dotenv()
+    import asyncio
+    from nacha_service import serve
+
+    asyncio.run(serve(args.host, args.port, workers=args.workers, queue_size=args.queue_size,
+                      routing_directory=args.routing_directory))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="nacha", description="Generate, validate and compare NACHA files")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    generate = subcommands.add_parser("generate", help="Generate a NACHA file")
+    source = generate.add_mutually_exclusive_group(required=True)
+    source.add_argument("--transactions", help="JSON file with transactions (and optional originator fields), rendered locally")
+    source.add_argument("--config", help="JSON nacha_config, compiled locally (through Claude with --llm)")
+    source.add_argument("--prompt", help="Free text prompt, generated through Claude with attachments")
+    generate.add_argument("--llm", action="store_true", help="Send --config to Claude instead of compiling it locally")
+    generate.add_argument("--hybrid", action="store_true",
+                          help="For --prompt: ask Claude for structured fields only and render the records locally")
+    generate.add_argument("--attach", action="append", help="Attachment for --prompt (repeatable)")
+    generate.add_argument("--model", help="Claude model for --prompt")
+    generate.add_argument("--env", help="Environment profile whose selections override originator fields")
+    generate.add_argument("--seed", type=int, help="Seed for the environment profile's random selections")
+    generate.add_argument("--output", help="Output file (default: stdout)")
+    generate.set_defaults(func=cmd_generate)
+
+    validate = subcommands.add_parser("validate", help="Validate NACHA files")
+    validate.add_argument("files", nargs="+", help="Files to validate ('-' for stdin)")
+    validate.add_argument("--json", action="store_true", help="Print one JSON line per file")
+    validate.add_argument("--routing-directory", help="Index built by routing_directory.py; flags unknown receiving DFIs")
+    validate.set_defaults(func=cmd_validate)
+
+    repair = subcommands.add_parser("repair", help="Repair controls, padding and record lengths")
+    repair.add_argument("file", help="File to repair ('-' for stdin)")
+    repair.add_argument("--output", help="Output file (default: stdout)")
+    repair.set_defaults(func=cmd_repair)
+
+    diff = subcommands.add_parser("diff", help="Reconcile the entries of two files")
+    diff.add_argument("file_a", help="Reference file")
+    diff.add_argument("file_b", help="Compared file")
+    diff.add_argument("--output", help="Write per-entry differences as JSON lines")
+    diff.set_defaults(func=cmd_diff)
+
+    merge = subcommands.add_parser("merge", help="Merge files into one consolidated file")
+    merge.add_argument("files", nargs="+", help="Input files")
+    merge.add_argument("--output", help="Merged file (default: stdout)")
+    merge.add_argument("--order", choices=["input", "effective_date", "company"], default="input",
+                       help="Batch order in the merged file")
+    merge.add_argument("--resequence-traces", action="store_true", help="Renumber trace numbers across the merged file")
+    merge.add_argument("--recompute-controls", action="store_true", help="Recompute batch totals from the entries")
+    merge.add_argument("--file-id-modifier", help="File ID modifier for the merged file header")
+    merge.set_defaults(func=cmd_merge)
+
+    inspect = subcommands.add_parser("inspect", help="Summarize batches and totals of a file")
+    inspect.add_argument("file", help="File to inspect")
+    inspect.set_defaults(func=cmd_inspect)
+
+    serve = subcommands.add_parser("serve", help="Run the HTTP generation/validation service")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    serve.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    serve.add_argument("--workers", type=int, help="Processes for local work (default: CPU count)")
+    serve.add_argument("--queue-size", type=int, default=64, help="Waiting requests before 429s")
+    serve.add_argument("--routing-directory", help="Routing directory index used by /validate")
+    serve.set_defaults(func=cmd_serve)
+
+    ui = subcommands.add_parser("ui", help="Launch the Gradio UI")
+    ui.set_defaults(func=cmd_ui)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+import io
+import sys
+import json
+import argparse
+from datetime import datetime
+
+from nacha_records import aba_check_digit
+from nacha_writer import NachaWriter
+
+
+def _alpha(value, width):
+    """Left-justified, blank-filled alphanumeric field"""
+    return str(value if value is not None else "")[:width].ljust(width)
+
+
+def _numeric(value, width):
+    """Right-justified, zero-filled numeric field"""
+    return str(int(value or 0)).zfill(width)[-width:]
+
+
+def _routing(entry):
+    """Split an entry's receiving DFI into its 8-digit prefix and check digit"""
+    routing = str(entry["receiving_dfi_id"])
+    prefix = routing[:8]
+    check_digit = str(entry.get("check_digit") or (routing[8] if len(routing) > 8 else aba_check_digit(prefix)))
+    return prefix, check_digit
+
+
+def _first(entry, *names):
+    for name in names:
+        if entry.get(name):
+            return entry[name]
+    return ""
+
+
+def build_file_header(header, now):
+    """Create the File Header Record (Type 1) from a config's file_header section"""
+    origin = str(header["immediate_origin"])
+    record = '1'  # Record Type Code
+    record += header.get("priority_code", "01")  # Priority Code
+    record += f" {str(header['immediate_destination']):9}"  # Immediate Destination (leading space + 9 digits)
+    record += origin.rjust(10) if len(origin) < 10 else origin[:10]  # Immediate Origin
+    record += header.get("file_creation_date") or now.strftime('%y%m%d')  # File Creation Date
+    record += header.get("file_creation_time") or now.strftime('%H%M')  # File Creation Time
+    record += header.get("file_id_modifier", "A")  # File ID Modifier
+    record += '094'  # Record Size
+    record += '10'  # Blocking Factor
+    record += '1'  # Format Code
+    record += _alpha(header.get("immediate_destination_name"), 23)  # Immediate Destination Name
+    record += _alpha(header.get("immediate_origin_name"), 23)  # Immediate Origin Name
+    record += _alpha(header.get("reference_code"), 8)  # Reference Code
+
+    return record
+
+
+def build_batch_header(header, odfi, batch_number, now):
+    """Create a domestic Batch Header Record (Type 5)"""
+    record = '5'  # Record Type Code
+    record += header.get("service_class_code", "200")  # Service Class Code
+    record += _alpha(header["company_name"], 16)  # Company Name
+    record += _alpha(header.get("company_discretionary_data"), 20)  # Company Discretionary Data
+    record += _alpha(header["company_identification"], 10)  # Company Identification
+    record += header["standard_entry_class_code"]  # Standard Entry Class Code
+    record += _alpha(header.get("company_entry_description"), 10)  # Company Entry Description
+    record += _alpha(header.get("company_descriptive_date"), 6)  # Company Descriptive Date
+    record += header.get("effective_entry_date") or now.strftime('%y%m%d')  # Effective Entry Date
+    record += _alpha(header.get("settlement_date"), 3)  # Settlement Date (Julian) - filled by the ACH operator
+    record += header.get("originator_status_code", "1")  # Originator Status Code
+    record += odfi  # Originating DFI Identification
+    record += _numeric(batch_number, 7)  # Batch Number
+
+    return record
+
+
+def build_iat_batch_header(header, first_entry, odfi, batch_number, now):
+    """Create an IAT Batch Header Record (Type 5)"""
+    receiver = first_entry.get("foreign_receiver_info", {}) if first_entry else {}
+    currency = first_entry.get("currency_info", {}) if first_entry else {}
+    destination_currency = header.get("iso_destination_currency_code") or currency.get("currency_type", "USD")
+
+    record = '5'  # Record Type Code
+    record += header.get("service_class_code", "200")  # Service Class Code
+    record += _alpha(header.get("iat_indicator"), 16)  # IAT Indicator
+    record += header.get("foreign_exchange_indicator") or ("FF" if destination_currency == "USD" else "FV")  # Foreign Exchange Indicator
+    record += header.get("foreign_exchange_reference_indicator", "3")  # Foreign Exchange Reference Indicator
+    record += _alpha(header.get("foreign_exchange_reference"), 15)  # Foreign Exchange Reference
+    record += _alpha(header.get("iso_destination_country_code") or receiver.get("country_code"), 2)  # ISO Destination Country Code
+    record += _alpha(header["company_identification"], 10)  # Originator Identification
+    record += 'IAT'  # Standard Entry Class Code
+    record += _alpha(header.get("company_entry_description"), 10)  # Company Entry Description
+    record += _alpha(header.get("iso_originating_currency_code", "USD"), 3)  # ISO Originating Currency Code
+    record += _alpha(destination_currency, 3)  # ISO Destination Currency Code
+    record += header.get("effective_entry_date") or now.strftime('%y%m%d')  # Effective Entry Date
+    record += _alpha(header.get("settlement_date"), 3)  # Settlement Date (Julian)
+    record += header.get("originator_status_code", "1")  # Originator Status Code
+    record += odfi  # Go Identification / Originating DFI Identification
+    record += _numeric(batch_number, 7)  # Batch Number
+
+    return record
+
+
+def build_entry_detail(entry, sec_code, trace_number, addenda_count):
+    """Create a domestic Entry Detail Record (Type 6) for PPD, CCD, CTX, WEB, TEL and similar codes"""
+    prefix, check_digit = _routing(entry)
+    name = _first(entry, "individual_name", "receiving_company_name", "name")
+    identification = _first(entry, "individual_id_number", "identification_number", "id_number")
+
+    record = '6'  # Record Type Code
+    record += entry["transaction_code"]  # Transaction Code
+    record += prefix  # Receiving DFI Identification
+    record += check_digit  # Check Digit
+    record += _alpha(entry["dfi_account_number"], 17)  # DFI Account Number
+    record += _numeric(entry["amount"], 10)  # Amount
+    record += _alpha(identification, 15)  # Identification Number
+    if sec_code == "CTX":
+        record += _numeric(addenda_count, 4)  # Number of Addenda Records
+        record += _alpha(name, 16)  # Receiving Company Name
+        record += '  '  # Reserved
+    else:
+        record += _alpha(name, 22)  # Individual / Receiving Company Name
+    record += _alpha(entry.get("discretionary_data"), 2)  # Discretionary Data
+    record += '1' if addenda_count else '0'  # Addenda Record Indicator
+    record += trace_number  # Trace Number
+
+    return record
+
+
+def build_iat_entry_detail(entry, trace_number, addenda_count):
+    """Create an IAT Entry Detail Record (Type 6)"""
+    prefix, check_digit = _routing(entry)
+
+    record = '6'  # Record Type Code
+    record += entry["transaction_code"]  # Transaction Code
+    record += prefix  # Gateway Operator / Receiving DFI Identification
+    record += check_digit  # Check Digit
+    record += _numeric(addenda_count, 4)  # Number of Addenda Records
+    record += ' ' * 13  # Reserved
+    record += _numeric(entry["amount"], 10)  # Amount
+    record += _alpha(entry["dfi_account_number"], 35)  # Foreign Receiver's Account Number / DFI Account Number
+    record += '  '  # Reserved
+    record += _alpha(entry.get("gateway_ofac_screening_indicator"), 1)  # Gateway Operator OFAC Screening Indicator
+    record += _alpha(entry.get("secondary_ofac_screening_indicator"), 1)  # Secondary OFAC Screening Indicator
+    record += '1'  # Addenda Record Indicator
+    record += trace_number  # Trace Number
+
+    return record
+
+
+def build_payment_addenda(info, addenda_sequence, entry_sequence):
+    """Create a CCD/CTX/PPD Addenda Record (Type 7, addenda type 05)"""
+    record = '7'  # Record Type Code
+    record += '05'  # Addenda Type Code
+    record += _alpha(info.get("payment_related_info"), 80)  # Payment Related Information
+    record += _numeric(addenda_sequence, 4)  # Addenda Sequence Number
+    record += entry_sequence  # Entry Detail Sequence Number
+
+    return record
+
+
+def build_iat_addenda(entry, file_header, entry_sequence):
+    """
+    Create the mandatory IAT addenda records (types 10-16) and optional remittance addenda (17)
+
+    Returns:
+        list: addenda records in the order they must follow the entry
+    """
+    receiver = entry.get("foreign_receiver_info", {})
+    originator = entry.get("originator_info", {})
+    correspondent = entry.get("foreign_correspondent_bank", {})
+    odfi = entry.get("originating_bank", {})
+
+    # Addenda 10: transaction type, foreign payment amount and receiver name
+    addenda_10 = '710' + _alpha(entry.get("transaction_type_code", "BUS"), 3) + _numeric(entry["amount"], 18)
+    addenda_10 += _alpha(entry.get("foreign_trace_number"), 22) + _alpha(receiver.get("name") or entry.get("individual_name"), 35)
+    addenda_10 += ' ' * 6 + entry_sequence
+
+    # Addenda 11: originator name and street address
+    addenda_11 = '711' + _alpha(originator.get("name"), 35) + _alpha(originator.get("address"), 35) + ' ' * 14 + entry_sequence
+
+    # Addenda 12: originator city/state and country/postal code, '*' separated and '\' terminated
+    originator_city = f"{originator.get('city', '')}*{originator.get('state', '')}\\"
+    originator_country = f"{originator.get('country_code', '')}*{originator.get('postal_code', '')}\\"
+    addenda_12 = '712' + _alpha(originator_city, 35) + _alpha(originator_country, 35) + ' ' * 14 + entry_sequence
+
+    # Addenda 13: originating DFI (defaults to the file's immediate destination)
+    addenda_13 = '713' + _alpha(odfi.get("name") or file_header.get("immediate_destination_name"), 35)
+    addenda_13 += _alpha(odfi.get("id_qualifier", "01"), 2) + _alpha(odfi.get("id_number") or file_header["immediate_destination"], 34)
+    addenda_13 += _alpha(odfi.get("branch_country_code", "US"), 3) + ' ' * 10 + entry_sequence
+
+    # Addenda 14: receiving DFI (the foreign correspondent bank)
+    addenda_14 = '714' + _alpha(correspondent.get("name"), 35) + _alpha(correspondent.get("id_qualifier", "01"), 2)
+    addenda_14 += _alpha(correspondent.get("id_number"), 34)
+    addenda_14 += _alpha(correspondent.get("branch_country_code") or receiver.get("country_code"), 3) + ' ' * 10 + entry_sequence
+
+    # Addenda 15: receiver identification number and street address
+    addenda_15 = '715' + _alpha(receiver.get("id_number") or entry.get("individual_id_number"), 15)
+    addenda_15 += _alpha(receiver.get("address"), 35) + ' ' * 34 + entry_sequence
+
+    # Addenda 16: receiver city/state and country/postal code
+    receiver_city = f"{receiver.get('city', '')}*{receiver.get('state', '')}\\"
+    receiver_country = f"{receiver.get('country_code', '')}*{receiver.get('postal_code', '')}\\"
+    addenda_16 = '716' + _alpha(receiver_city, 35) + _alpha(receiver_country, 35) + ' ' * 14 + entry_sequence
+
+    records = [addenda_10, addenda_11, addenda_12, addenda_13, addenda_14, addenda_15, addenda_16]
+
+    # Addenda 17: optional remittance information (at most two per entry)
+    for sequence, info in enumerate(entry.get("addenda", [])[:2], 1):
+        records.append('717' + _alpha(info.get("payment_related_info"), 80) + _numeric(sequence, 4) + entry_sequence)
+
+    return records
+
+
+def compile_config(nacha_config, out, now=None):
+    """
+    Render a nacha_config dict (as built by create_sample_iat_config) into a NACHA file
+
+    Batches and entries may be lists or any iterables (e.g. generators reading from
+    disk); records are written as they are produced, so memory use does not grow
+    with the number of entries.
+
+    Args:
+        nacha_config: Dict with "file_header" and "batches" sections
+        out: Writable text file object
+        now: datetime used for defaulted dates and times (defaults to the current time)
+
+    Returns:
+        NachaWriter: the finished writer, exposing batch count and file totals
+    """
+    now = now or datetime.now()
+    file_header = nacha_config["file_header"]
+    writer = NachaWriter(out)
+    writer.write_file_header(build_file_header(file_header, now))
+
+    trace_sequence = 0
+    for batch_number, batch in enumerate(nacha_config["batches"], 1):
+        trace_sequence = write_batch(writer, batch, file_header, batch_number, trace_sequence, now)
+
+    writer.finish()
+    return writer
+
+
+def write_batch(writer, batch, file_header, batch_number, trace_sequence, now):
+    """
+    Render one batch of a nacha_config through a NachaWriter
+
+    Args:
+        batch: Dict with "batch_header" and "entries", or a callable returning one
+            (so expensive batches are only built when they are written)
+        trace_sequence: Last file-wide trace sequence number used before this batch
+
+    Returns:
+        int: the last trace sequence number used by this batch
+    """
+    if callable(batch):
+        batch = batch()
+    header = batch["batch_header"]
+    sec_code = header["standard_entry_class_code"]
+    odfi = str(header.get("originating_dfi_id") or file_header["immediate_destination"])[:8]
+    entries = iter(batch["entries"])
+
+    if sec_code == "IAT":
+        # The IAT header carries the destination country and currency, taken from the first entry
+        first_entry = next(entries, None)
+        writer.begin_batch(build_iat_batch_header(header, first_entry, odfi, batch_number, now))
+        if first_entry is not None:
+            entries = _chain_first(first_entry, entries)
+    else:
+        writer.begin_batch(build_batch_header(header, odfi, batch_number, now))
+
+    for entry in entries:
+        trace_sequence += 1
+        entry_sequence = _numeric(trace_sequence, 7)
+        trace_number = entry.get("trace_number") or odfi + entry_sequence
+        entry_sequence = str(trace_number)[-7:]
+
+        if sec_code == "IAT":
+            addenda = build_iat_addenda(entry, file_header, entry_sequence)
+            record = build_iat_entry_detail(entry, trace_number, len(addenda))
+        else:
+            addenda = [build_payment_addenda(info, sequence, entry_sequence)
+                       for sequence, info in enumerate(entry.get("addenda", []), 1)]
+            record = build_entry_detail(entry, sec_code, trace_number, len(addenda))
+        writer.add_entry(record, addenda)
+
+    writer.end_batch()
+    return trace_sequence
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
+
+
+def compile_to_string(nacha_config, now=None):
+    """Render a nacha_config into the NACHA file content as a string"""
+    out = io.StringIO()
+    compile_config(nacha_config, out, now)
+    return out.getvalue().rstrip("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a structured nacha_config JSON file into a NACHA file")
+    parser.add_argument("config", nargs="?", help="nacha_config JSON file (omit with --sample)")
+    parser.add_argument("--sample", action="store_true", help="Compile create_sample_iat_config()")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+
+    args = parser.parse_args()
+
+    if args.sample:
+        from nacha_with_advanced_prompt import create_sample_iat_config
+        config = create_sample_iat_config()
+    else:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='\n') as f:
+            compile_config(config, f)
+    else:
+        compile_config(config, sys.stdout)
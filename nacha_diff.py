@@ -0,0 +1,253 @@
+import os
+import json
+import zlib
+import argparse
+import tempfile
+from collections import deque
+
+from nacha_records import (
+    ENTRY_DETAIL_FIELDS, BATCH_HEADER_FIELDS, FILE_CONTROL_FIELDS, RECORD_SIZE,
+    iter_records, iter_entries, parse_record, field, to_int,
+)
+from nacha_writer import ControlTotals
+
+# Upper bound on the number of entries held in memory while joining one partition
+DEFAULT_PARTITION_ENTRIES = 200_000
+
+_ADDENDA_SEP = '\x1f'
+
+
+def trace_key(entry):
+    """Primary join key: the trace number, or None when it is blank or all zeros"""
+    trace = field(entry, ENTRY_DETAIL_FIELDS, "trace_number").strip()
+    if trace.isdigit() and int(trace) != 0:
+        return trace
+    return None
+
+
+def fallback_key(entry):
+    """Secondary join key: receiving routing number, account number and amount"""
+    routing = field(entry, ENTRY_DETAIL_FIELDS, "receiving_dfi_id") + field(entry, ENTRY_DETAIL_FIELDS, "check_digit")
+    account = field(entry, ENTRY_DETAIL_FIELDS, "dfi_account_number").strip()
+    amount = to_int(field(entry, ENTRY_DETAIL_FIELDS, "amount"))
+    return f"{routing}|{account}|{amount}"
+
+
+def entry_diff(row_a, row_b):
+    """
+    Compare two entries field by field
+
+    Returns:
+        dict: field name -> [value in A, value in B] for every field that differs
+    """
+    fields_a = parse_record(row_a["entry"])
+    fields_b = parse_record(row_b["entry"])
+    changes = {name: [fields_a[name], fields_b[name]]
+               for name in ENTRY_DETAIL_FIELDS if fields_a[name] != fields_b[name]}
+
+    addenda_a = row_a["addenda"]
+    addenda_b = row_b["addenda"]
+    for i in range(max(len(addenda_a), len(addenda_b))):
+        old = addenda_a[i] if i < len(addenda_a) else None
+        new = addenda_b[i] if i < len(addenda_b) else None
+        if old != new:
+            changes[f"addenda[{i}]"] = [old, new]
+    return changes
+
+
+class _ControlTotals(ControlTotals):
+    """Running control totals computed from the entries of one file"""
+
+    def __init__(self):
+        super().__init__()
+        self.batch_count = 0
+        self.declared = {}
+
+    def as_dict(self):
+        return {"batch_count": self.batch_count, **super().as_dict()}
+
+
+def _counting_records(path, totals):
+    """Stream records while picking up batch counts and the declared file control"""
+    for record in iter_records(path):
+        record_type = record[:1]
+        if record_type == '5':
+            totals.batch_count += 1
+        elif record_type == '9' and not totals.declared and record.strip('9'):
+            totals.declared = {name: to_int(field(record, FILE_CONTROL_FIELDS, name))
+                               for name in ("batch_count", "block_count", "entry_addenda_count",
+                                            "entry_hash", "total_debit", "total_credit")}
+        yield record
+
+
+class _Partitions:
+    """A set of append-only spill files, one per hash bucket"""
+
+    def __init__(self, work_dir, prefix, count):
+        self.paths = [os.path.join(work_dir, f"{prefix}_{i:04d}.tsv") for i in range(count)]
+        self.files = [open(p, 'w', encoding='utf-8', newline='\n') for p in self.paths]
+
+    def write(self, key, ordinal, batch_number, entry, addenda):
+        bucket = zlib.crc32(key.encode('utf-8')) % len(self.files)
+        self.files[bucket].write(f"{key}\t{ordinal}\t{batch_number}\t{entry}\t{_ADDENDA_SEP.join(addenda)}\n")
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+    def rows(self, i):
+        with open(self.paths[i], 'r', encoding='utf-8', newline='\n') as f:
+            for line in f:
+                key, ordinal, batch_number, entry, addenda = line.rstrip('\n').split('\t', 4)
+                yield key, {
+                    "ordinal": int(ordinal),
+                    "batch_number": batch_number,
+                    "entry": entry,
+                    "addenda": addenda.split(_ADDENDA_SEP) if addenda else [],
+                }
+        os.remove(self.paths[i])
+
+
+def _partition_file(path, totals, primary, secondary):
+    """Spill every entry of a file into primary (trace) or secondary (fallback) partitions"""
+    for ordinal, (batch_header, entry, addenda) in enumerate(iter_entries(_counting_records(path, totals)), 1):
+        totals.add_entry(entry, addenda)
+        batch_number = field(batch_header, BATCH_HEADER_FIELDS, "batch_number") if batch_header else ''
+        key = trace_key(entry)
+        if key is not None:
+            primary.write(key, ordinal, batch_number, entry, addenda)
+        else:
+            secondary.write(fallback_key(entry), ordinal, batch_number, entry, addenda)
+
+
+def _join_partition(rows_a, rows_b, on_match, on_unmatched_b):
+    """
+    Hash join one partition: build on A, probe with B
+
+    Returns:
+        list: the rows of A that found no partner
+    """
+    build = {}
+    for key, row in rows_a:
+        build.setdefault(key, deque()).append(row)
+
+    for key, row in rows_b:
+        candidates = build.get(key)
+        if candidates:
+            on_match(key, candidates.popleft(), row)
+            if not candidates:
+                del build[key]
+        else:
+            on_unmatched_b(key, row)
+
+    return [row for rows in build.values() for row in rows]
+
+
+def _describe(row):
+    return {"entry_number": row["ordinal"], "batch_number": row["batch_number"],
+            "entry": row["entry"], "addenda": row["addenda"]}
+
+
+def reconcile(file_a, file_b, out=None, partition_entries=DEFAULT_PARTITION_ENTRIES, work_dir=None):
+    """
+    Reconcile two NACHA files entry by entry
+
+    Entries are joined on trace number first; entries left over from that pass are
+    joined again on routing number, account number and amount. Both passes are Grace
+    hash joins over on-disk partitions, so time is linear in the number of entries and
+    memory is bounded by partition_entries rather than by the file sizes.
+
+    Args:
+        file_a: Path to the reference (old) file
+        file_b: Path to the compared (new) file
+        out: Optional text file object; one JSON line is written per added, removed or changed entry
+        partition_entries: Approximate number of entries loaded into memory per partition
+        work_dir: Directory for spill files (defaults to a temporary directory)
+
+    Returns:
+        dict: counts of added/removed/changed/unchanged entries and control total deltas
+    """
+    largest = max(os.path.getsize(file_a), os.path.getsize(file_b))
+    partition_count = max(1, -(-largest // ((RECORD_SIZE + 1) * partition_entries)))
+    counts = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0}
+
+    def emit(status, **details):
+        counts[status] += 1
+        if out is not None and status != "unchanged":
+            out.write(json.dumps(dict(status=status, **details)) + "\n")
+
+    def on_match(key, row_a, row_b):
+        if row_a["entry"] == row_b["entry"] and row_a["addenda"] == row_b["addenda"]:
+            emit("unchanged")
+            return
+        changes = entry_diff(row_a, row_b)
+        if changes:
+            emit("changed", key=key, a=_describe(row_a), b=_describe(row_b), fields=changes)
+        else:
+            emit("unchanged")
+
+    totals_a = _ControlTotals()
+    totals_b = _ControlTotals()
+
+    with tempfile.TemporaryDirectory(dir=work_dir, prefix="nacha_diff_") as tmp:
+        trace_a = _Partitions(tmp, "trace_a", partition_count)
+        trace_b = _Partitions(tmp, "trace_b", partition_count)
+        fallback_a = _Partitions(tmp, "fallback_a", partition_count)
+        fallback_b = _Partitions(tmp, "fallback_b", partition_count)
+
+        _partition_file(file_a, totals_a, trace_a, fallback_a)
+        _partition_file(file_b, totals_b, trace_b, fallback_b)
+        trace_a.close()
+        trace_b.close()
+
+        # Pass 1: trace number join; leftovers are re-keyed for the fallback pass
+        for i in range(partition_count):
+            leftover = _join_partition(
+                trace_a.rows(i), trace_b.rows(i), on_match,
+                lambda key, row: fallback_b.write(fallback_key(row["entry"]), row["ordinal"],
+                                                  row["batch_number"], row["entry"], row["addenda"]))
+            for row in leftover:
+                fallback_a.write(fallback_key(row["entry"]), row["ordinal"],
+                                 row["batch_number"], row["entry"], row["addenda"])
+        fallback_a.close()
+        fallback_b.close()
+
+        # Pass 2: routing/account/amount join; whatever is left was added or removed
+        for i in range(partition_count):
+            leftover = _join_partition(
+                fallback_a.rows(i), fallback_b.rows(i), on_match,
+                lambda key, row: emit("added", key=key, b=_describe(row)))
+            for row in leftover:
+                emit("removed", key=fallback_key(row["entry"]), a=_describe(row))
+
+    controls_a = totals_a.as_dict()
+    controls_b = totals_b.as_dict()
+    return {
+        **counts,
+        "controls": {
+            "a": controls_a,
+            "b": controls_b,
+            "delta": {name: controls_b[name] - controls_a[name] for name in controls_a},
+            "declared_a": totals_a.declared,
+            "declared_b": totals_b.declared,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile the entries of two NACHA files")
+    parser.add_argument("file_a", help="Reference NACHA file")
+    parser.add_argument("file_b", help="NACHA file to compare against the reference")
+    parser.add_argument("--output", help="Write per-entry differences to this JSON lines file")
+    parser.add_argument("--partition-entries", type=int, default=DEFAULT_PARTITION_ENTRIES,
+                        help="Entries held in memory per join partition")
+
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as report:
+            summary = reconcile(args.file_a, args.file_b, report, args.partition_entries)
+    else:
+        summary = reconcile(args.file_a, args.file_b, partition_entries=args.partition_entries)
+
+    print(json.dumps(summary, indent=2))
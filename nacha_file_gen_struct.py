@@ -1,81 +1,105 @@
+import io
+import sys
+import json
+import time
+import argparse
 import datetime
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from nacha_writer import NachaWriter, build_batch_control, build_file_control
+from banking_calendar import default_calendar, eastern_now
+
+
+@dataclass(frozen=True)
+class Originator:
+    """Company and bank information shared by every file a NachaGenerator produces"""
+
+    immediate_destination: str = '071000505'
+    immediate_origin: str = '1234567890'
+    company_name: str = 'COMPANY NAME'
+    company_id: str = '1234567890'
+    immediate_destination_name: str = 'LaSalle Bank N.A.'
+
+    def __post_init__(self):
+        object.__setattr__(self, 'company_name', self.company_name[:16])  # Truncate to 16 chars if longer
+
+    @property
+    def odfi(self):
+        """Originating DFI Identification: the first 8 digits of the destination routing number"""
+        return self.immediate_destination.strip()[:8]
+
 
 class NachaGenerator:
+    """
+    Build NACHA files for one originator
+
+    The instance holds only the immutable Originator; entry counts, hashes and
+    totals live in per-call ControlTotals and NachaWriter objects, so one
+    generator can serve concurrent generate_file calls from many threads.
+    """
+
     def __init__(self, immediate_destination='071000505', immediate_origin='1234567890',
                  company_name='COMPANY NAME', company_id='1234567890'):
         """
         Initialize NACHA file generator with company information
-        
+
         Args:
             immediate_destination: Bank routing number (default: LaSalle Bank)
             immediate_origin: Company identification number (10 digits)
             company_name: Company name (max 16 chars)
             company_id: Company ID number (10 digits)
         """
-        self.immediate_destination = immediate_destination
-        self.immediate_origin = immediate_origin
-        self.company_name = company_name[:16]  # Truncate to 16 chars if longer
-        self.company_id = company_id
-        self.batch_number = 1
-        self.entry_count = 0
-        self.entry_hash = 0
-        self.total_debit = 0
-        self.total_credit = 0
-        self.records = []
-        
-    def create_file_header(self):
+        self.originator = Originator(immediate_destination, immediate_origin, company_name, company_id)
+
+    def create_file_header(self, now=None):
         """Create the File Header Record (Type 1)"""
-        today = datetime.datetime.now()
-        file_date = today.strftime('%y%m%d')
-        file_time = today.strftime('%H%M')
-        
+        now = now or datetime.datetime.now()
+        originator = self.originator
+
         record = '1'  # Record Type Code
         record += '01'  # Priority Code
-        record += f" {self.immediate_destination:9}"  # Immediate Destination (leading space + 9 digits)
-        record += f"{self.immediate_origin:10}"  # Immediate Origin
-        record += file_date  # File Creation Date
-        record += file_time  # File Creation Time
+        record += f" {originator.immediate_destination:9}"  # Immediate Destination (leading space + 9 digits)
+        record += f"{originator.immediate_origin:10}"  # Immediate Origin
+        record += now.strftime('%y%m%d')  # File Creation Date
+        record += now.strftime('%H%M')  # File Creation Time
         record += 'A'  # File ID Modifier
         record += '094'  # Record Size
         record += '10'  # Blocking Factor
         record += '1'  # Format Code
-        record += 'LaSalle Bank N.A.'.ljust(23)  # Immediate Destination Name
-        record += self.company_name.ljust(23)  # Immediate Origin Name
+        record += originator.immediate_destination_name.ljust(23)  # Immediate Destination Name
+        record += originator.company_name.ljust(23)  # Immediate Origin Name
         record += ' ' * 8  # Reference Code (8 spaces)
-        
+
         return record.ljust(94)  # Each record must be 94 characters
-    
-    def create_batch_header(self, service_class_code='200', std_entry_class='PPD', 
-                           entry_description='PAYMENT', effective_date=None):
-        """Create the Batch Header Record (Type 5)"""
-        today = datetime.datetime.now()
-        if effective_date is None:
-            effective_date = today
-            
-        descriptive_date = today.strftime('%y%m%d')
-        effective_date_str = effective_date.strftime('%y%m%d')
-        
+
+    def create_batch_header(self, service_class_code='200', std_entry_class='PPD',
+                            entry_description='PAYMENT', effective_date=None, batch_number=1, now=None):
+        """Create the Batch Header Record (Type 5), rolling the effective date to a banking day"""
+        now = now or eastern_now()  # the same-day cutoff is in Eastern time
+        effective_date = default_calendar.resolve(effective_date, now)
+
         record = '5'  # Record Type Code
         record += service_class_code  # Service Class Code
-        record += self.company_name.ljust(16)  # Company Name
+        record += self.originator.company_name.ljust(16)  # Company Name
         record += ' ' * 20  # Company Discretionary Data
-        record += self.company_id.ljust(10)  # Company Identification
+        record += self.originator.company_id.ljust(10)  # Company Identification
         record += std_entry_class  # Standard Entry Class Code
         record += entry_description.ljust(10)  # Company Entry Description
-        record += descriptive_date  # Company Descriptive Date
-        record += effective_date_str  # Effective Entry Date
-        record += ' ' * 3  # Settlement Date (Julian) - Leave blank
+        record += now.strftime('%y%m%d')  # Company Descriptive Date
+        record += effective_date.strftime('%y%m%d')  # Effective Entry Date
+        record += ' ' * 3  # Settlement Date (Julian) - filled by the ACH operator
         record += '1'  # Originator Status Code
-        record += self.immediate_destination  # Originating DFI Identification
-        record += str(self.batch_number).zfill(7)  # Batch Number
-        
+        record += self.originator.odfi  # Originating DFI Identification
+        record += str(batch_number).zfill(7)  # Batch Number
+
         return record.ljust(94)
-    
+
     def create_entry_detail(self, routing_number, account_number, amount, transaction_type='credit',
-                           id_number='', individual_name='', transaction_code=None):
+                            id_number='', individual_name='', transaction_code=None, trace_sequence=1):
         """
         Create Entry Detail Record (Type 6)
-        
+
         Args:
             routing_number: Receiving bank routing number (9 digits)
             account_number: Receiving account number
@@ -84,6 +108,7 @@ class NachaGenerator:
             id_number: Identification number (optional)
             individual_name: Receiver's name (optional)
             transaction_code: Override automatic transaction code determination
+            trace_sequence: Entry sequence number within the file, used for the trace number
         """
         # Determine transaction code if not provided
         if transaction_code is None:
@@ -91,122 +116,128 @@ class NachaGenerator:
                 transaction_code = '22'  # Checking Account Credit
             else:
                 transaction_code = '27'  # Checking Account Debit
-        
-        # Calculate entry hash (first 8 digits of routing number)
-        routing_first_8 = routing_number[:8]
-        self.entry_hash += int(routing_first_8)
-        
-        # Track totals
-        amount_int = int(amount)
-        if transaction_type.lower() == 'credit':
-            self.total_credit += amount_int
-        else:
-            self.total_debit += amount_int
-            
-        self.entry_count += 1
-        
-        # Format amount with leading zeros
-        amount_str = str(amount_int).zfill(10)
-        
+
         record = '6'  # Record Type Code
         record += transaction_code  # Transaction Code
         record += routing_number[:8]  # Receiving DFI Identification
         record += routing_number[8]  # Check Digit
         record += account_number.ljust(17)  # DFI Account Number
-        record += amount_str  # Amount
+        record += str(int(amount)).zfill(10)  # Amount
         record += id_number.ljust(15)  # Individual Identification Number
         record += individual_name.ljust(22)  # Individual Name
         record += '  '  # Discretionary Data
         record += '0'  # Addenda Record Indicator
-        record += '01234567'.ljust(7)  # Trace Number (will be assigned by bank)
-        
-        return record.ljust(94)
-    
-    def create_batch_control(self):
-        """Create the Batch Control Record (Type 8)"""
-        record = '8'  # Record Type Code
-        record += '200'  # Service Class Code
-        record += str(self.entry_count).zfill(6)  # Entry/Addenda Count
-        record += str(self.entry_hash)[-10:].zfill(10)  # Entry Hash (last 10 digits)
-        record += str(self.total_debit).zfill(12)  # Total Debit Entry Dollar Amount
-        record += str(self.total_credit).zfill(12)  # Total Credit Entry Dollar Amount
-        record += self.company_id.ljust(10)  # Company Identification
-        record += ' ' * 19  # Message Authentication Code
-        record += ' ' * 6  # Reserved
-        record += self.immediate_destination  # Originating DFI Identification
-        record += str(self.batch_number).zfill(7)  # Batch Number
-        
-        return record.ljust(94)
-    
-    def create_file_control(self):
-        """Create the File Control Record (Type 9)"""
-        record = '9'  # Record Type Code
-        record += '000001'.ljust(6)  # Batch Count
-        record += '000003'.ljust(6)  # Block Count - typically File Header + File Control + 1 for each batch
-        record += str(self.entry_count).zfill(8)  # Entry/Addenda Count
-        record += str(self.entry_hash)[-10:].zfill(10)  # Entry Hash
-        record += str(self.total_debit).zfill(12)  # Total Debit Entry Dollar Amount in File
-        record += str(self.total_credit).zfill(12)  # Total Credit Entry Dollar Amount in File
-        record += ' ' * 39  # Reserved
-        
+        record += self.originator.odfi + str(trace_sequence).zfill(7)  # Trace Number (ODFI + entry sequence)
+
         return record.ljust(94)
-    
-    def generate_file(self, transactions):
+
+    def create_batch_control(self, batch_header, totals):
+        """Create the Batch Control Record (Type 8) for a batch header and its ControlTotals"""
+        return build_batch_control(batch_header, totals)
+
+    def create_file_control(self, batch_count, block_count, totals):
+        """Create the File Control Record (Type 9) from the file's ControlTotals"""
+        return build_file_control(batch_count, block_count, totals)
+
+    def generate_file(self, transactions, now=None):
         """
         Generate a complete NACHA file with the given transactions
-        
+
         Args:
             transactions: List of dictionaries containing transaction details
-                          Each dict should have: routing_number, account_number, amount, 
+                          Each dict should have: routing_number, account_number, amount,
                           transaction_type, id_number (optional), and name (optional)
-        
+            now: datetime for the header dates and the same-day cutoff (defaults to the current Eastern time)
+
         Returns:
             Complete NACHA file as a string
         """
-        # Reset totals
-        self.entry_count = 0
-        self.entry_hash = 0
-        self.total_debit = 0
-        self.total_credit = 0
-        self.records = []
-        
-        # Add file header
-        self.records.append(self.create_file_header())
-        
-        # Add batch header
-        self.records.append(self.create_batch_header())
-        
-        # Add transactions
-        for txn in transactions:
-            self.records.append(
+        now = now or eastern_now()
+        out = io.StringIO()
+        writer = NachaWriter(out)
+
+        writer.write_file_header(self.create_file_header(now))
+        writer.begin_batch(self.create_batch_header(now=now))
+        for trace_sequence, txn in enumerate(transactions, 1):
+            writer.add_entry(
                 self.create_entry_detail(
                     routing_number=txn['routing_number'],
                     account_number=txn['account_number'],
                     amount=txn['amount'],
                     transaction_type=txn['transaction_type'],
                     id_number=txn.get('id_number', ''),
-                    individual_name=txn.get('name', '')
+                    individual_name=txn.get('name', ''),
+                    trace_sequence=trace_sequence
                 )
             )
-        
-        # Add batch control
-        self.records.append(self.create_batch_control())
-        
-        # Add file control
-        self.records.append(self.create_file_control())
-        
-        # Return file as string
-        return '\n'.join(self.records)
+        writer.finish()
+
+        return out.getvalue().rstrip('\n')
+
+
+def benchmark(threads=8, files=2000, entries=50):
+    """
+    Generate files from one shared NachaGenerator, sequentially and on a thread pool
+
+    Every file is checked against its sequential rendering, so any state leaking
+    between concurrent calls shows up as a mismatch. On free-threaded builds
+    (python3.13t and later, GIL disabled) the threads run in parallel; with the
+    GIL the pool only shows that sharing the instance is safe.
+
+    Returns:
+        dict: build details, files per second for both runs, speedup and mismatches
+    """
+    generator = NachaGenerator(company_name='ACME CORP')
+    now = datetime.datetime(2025, 5, 1, 9, 30)
+    requests = [[{'routing_number': '071000505', 'account_number': f"{number:010d}",
+                  'amount': 100 * (number + entry + 1), 'name': f"PAYEE {entry}",
+                  'transaction_type': 'debit' if entry % 3 == 0 else 'credit'}
+                 for entry in range(entries)] for number in range(files)]
+
+    started = time.perf_counter()
+    expected = [generator.generate_file(transactions, now) for transactions in requests]
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda transactions: generator.generate_file(transactions, now), requests))
+    concurrent = time.perf_counter() - started
+
+    gil_check = getattr(sys, '_is_gil_enabled', None)
+    return {
+        "python": sys.version.split()[0],
+        "gil_enabled": gil_check() if gil_check else True,
+        "threads": threads,
+        "files": files,
+        "entries_per_file": entries,
+        "sequential_files_per_s": round(files / sequential),
+        "threaded_files_per_s": round(files / concurrent),
+        "speedup": round(sequential / concurrent, 2),
+        "mismatches": sum(result != reference for result, reference in zip(results, expected)),
+    }
+
 
 # Example usage
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a sample NACHA file, or benchmark concurrent generation")
+    parser.add_argument("--benchmark", action="store_true", help="Share one generator across a thread pool")
+    parser.add_argument("--threads", type=int, default=8, help="Benchmark threads")
+    parser.add_argument("--files", type=int, default=2000, help="Benchmark files")
+    parser.add_argument("--entries", type=int, default=50, help="Entries per benchmark file")
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.threads, args.files, args.entries), indent=2))
+        sys.exit(0)
+
     # Initialize NACHA generator
     nacha = NachaGenerator(
         immediate_origin='1234567890',
         company_name='ACME CORP',
         company_id='1234567890'
     )
-    
+
     # Define two transactions
     transactions = [
         {
@@ -226,13 +257,13 @@ if __name__ == '__main__':
             'name': 'JANE SMITH'
         }
     ]
-    
+
     # Generate NACHA file
     nacha_file = nacha.generate_file(transactions)
-    
+
     # Print or save to file
     print(nacha_file)
-    
+
     # Optionally save to file
     with open('nacha_payment_file.txt', 'w') as f:
-        f.write(nacha_file)
\ No newline at end of file
+        f.write(nacha_file)
@@ -1,9 +1,15 @@
-import anthropic
-import os
+from instrumentation import metrics
+from resilient_calls import create_message
+from model_router import router
+from transport import transport
 
-# Set up Claude client with your API key
-client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
 
+def get_client():
+    """Return the shared Claude client (or the record/replay client, see transport.py)"""
+    return transport.client()
+
+
+@metrics.traced("generate_nacha_file")
 def generate_nacha_file(payment_details):
     """
     Generate a NACHA file using Claude API
@@ -32,22 +38,29 @@ def generate_nacha_file(payment_details):
     Each record must be exactly 94 characters. Please provide only the raw NACHA file content, no explanations.
     """
     
+    # Size the request from the number of transactions
+    decision = router.route_transactions(payment_details['transactions'])
+
     # Call Claude API
-    message = client.messages.create(
-        model="claude-3-7-sonnet-20250219",
-        max_tokens=4000,
-        temperature=0,
-        system="You are an expert in ACH payment processing and NACHA file format. Generate valid NACHA files exactly according to specifications.",
-        messages=[
-            {"role": "user", "content": prompt}
-        ]
-    )
+    with metrics.span("api_call"):
+        message = create_message(get_client(), dict(
+            model=decision["model"],
+            max_tokens=decision["max_tokens"],
+            temperature=0,
+            system="You are an expert in ACH payment processing and NACHA file format. Generate valid NACHA files exactly according to specifications.",
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        ))
+    metrics.record_usage(getattr(message, "usage", None))
+    router.record_outcome(decision, message)
     
     # Extract the NACHA file from Claude's response
     nacha_content = message.content[0].text
     
     # Clean up any extra text Claude might have included
-    nacha_content = clean_nacha_content(nacha_content)
+    with metrics.span("clean_nacha_content"):
+        nacha_content = clean_nacha_content(nacha_content)
     
     return nacha_content
 
@@ -1,10 +1,180 @@
+from nacha_records import (
+  RECORD_SIZE, BLOCKING_FACTOR, is_padding, parse_record, aba_check_digit, to_int,
+)
+from nacha_writer import ControlTotals
+from routing_directory import aba_valid_many
+from instrumentation import metrics
 
-def validate_nacha_file(file_content):
-  status = "valid"
+# Bump whenever a check is added or changed; bulk_validate caches results per rules version
+RULES_VERSION = "2"
+
+SERVICE_CLASS_CODES = ("200", "220", "225")
+TRANSACTION_CODES = ("21", "22", "23", "24", "26", "27", "28", "29",
+                     "31", "32", "33", "34", "36", "37", "38", "39",
+                     "41", "42", "43", "44", "46", "47", "48", "49", "51", "52", "53", "55", "56")
+
+
+def _error(errors, line, code, message):
+  errors.append({"line": line, "code": code, "message": message})
+
+
+def _is_yymmdd(text):
+  return len(text) == 6 and text.isdigit() and 1 <= int(text[2:4]) <= 12 and 1 <= int(text[4:6]) <= 31
+
+
+def _check_file_header(fields, line, errors):
+  if fields["priority_code"] != "01":
+    _error(errors, line, "PRIORITY_CODE", f"Priority code must be '01', got '{fields['priority_code']}'")
+  if not fields["immediate_destination"].strip().isdigit():
+    _error(errors, line, "IMMEDIATE_DESTINATION", "Immediate destination must be numeric")
+  if not _is_yymmdd(fields["file_creation_date"]):
+    _error(errors, line, "FILE_CREATION_DATE", f"Invalid file creation date '{fields['file_creation_date']}'")
+  if not fields["file_id_modifier"].isalnum():
+    _error(errors, line, "FILE_ID_MODIFIER", "File ID modifier must be A-Z or 0-9")
+  if fields["record_size"] != "094":
+    _error(errors, line, "RECORD_SIZE", f"Record size must be '094', got '{fields['record_size']}'")
+  if fields["blocking_factor"] != "10":
+    _error(errors, line, "BLOCKING_FACTOR", f"Blocking factor must be '10', got '{fields['blocking_factor']}'")
+  if fields["format_code"] != "1":
+    _error(errors, line, "FORMAT_CODE", f"Format code must be '1', got '{fields['format_code']}'")
+
+
+def _check_batch_header(fields, line, errors):
+  if fields["service_class_code"] not in SERVICE_CLASS_CODES:
+    _error(errors, line, "SERVICE_CLASS_CODE", f"Invalid service class code '{fields['service_class_code']}'")
+  if not fields["standard_entry_class_code"].isalpha():
+    _error(errors, line, "SEC_CODE", f"Invalid standard entry class code '{fields['standard_entry_class_code']}'")
+  if not fields["company_entry_description"].strip():
+    _error(errors, line, "COMPANY_ENTRY_DESCRIPTION", "Company entry description is mandatory")
+  if not _is_yymmdd(fields["effective_entry_date"]):
+    _error(errors, line, "EFFECTIVE_ENTRY_DATE", f"Invalid effective entry date '{fields['effective_entry_date']}'")
+
+
+def _check_entry(fields, line, errors):
+  if fields["transaction_code"] not in TRANSACTION_CODES:
+    _error(errors, line, "TRANSACTION_CODE", f"Invalid transaction code '{fields['transaction_code']}'")
+  if not fields["receiving_dfi_id"].isdigit():
+    _error(errors, line, "RECEIVING_DFI", "Receiving DFI identification must be 8 digits")
+  if not fields["amount"].isdigit():
+    _error(errors, line, "AMOUNT", f"Amount must be numeric, got '{fields['amount']}'")
+  if not fields["trace_number"].isdigit():
+    _error(errors, line, "TRACE_NUMBER", f"Trace number must be numeric, got '{fields['trace_number']}'")
+
+
+def _check_controls(declared, computed, line, errors, prefix):
+  for name in ("entry_addenda_count", "entry_hash", "total_debit", "total_credit"):
+    if to_int(declared[name]) != computed[name]:
+      _error(errors, line, f"{prefix}_{name.upper()}",
+             f"{name} is {to_int(declared[name])}, expected {computed[name]}")
+
+
+@metrics.timed("validate_nacha_file")
+def validate_nacha_file(file_content, routing_directory=None):
+  """
+  Validate the structure, field formats and control totals of a NACHA file
+
+  Args:
+      file_content: The NACHA file as a string
+      routing_directory: Optional routing_directory.RoutingDirectory; when given, every
+          receiving DFI is looked up in one bulk pass after the file has been read, as the
+          check digits are
+
+  Returns:
+      tuple: (status, errors) where status is "valid" or "invalid" and errors is a list of
+             dicts with the 1-based line number, an error class code and a message
+  """
   errors = []
-  # read the system prompt from the file
-  with open("resources/nacha_validation_prompt.txt", "r", encoding="utf-8") as file:
-      system_prompt = file.read()
-  print(f"System prompt being used for validation: {system_prompt}")    
-  
-  return status,errors
\ No newline at end of file
+  lines = file_content.split("\n")
+  if lines and lines[-1] == "":
+    lines.pop()
+
+  file_totals = ControlTotals()
+  batch_totals = None
+  batch_header = None
+  batch_count = 0
+  seen_header = False
+  seen_control = False
+  routings = []
+
+  for number, raw in enumerate(lines, 1):
+    record = raw.rstrip("\r")
+    if len(record) != RECORD_SIZE:
+      _error(errors, number, "LINE_LENGTH", f"Line length {len(record)} != {RECORD_SIZE} characters")
+      record = record.ljust(RECORD_SIZE)
+    record_type = record[:1]
+    fields = parse_record(record)
+
+    if seen_control:
+      if not is_padding(record):
+        _error(errors, number, "PADDING", "Only 9-filled padding records may follow the file control record")
+      continue
+
+    if record_type == "1":
+      if seen_header or number != 1:
+        _error(errors, number, "FILE_HEADER", "File header must be the first and only type 1 record")
+      seen_header = True
+      _check_file_header(fields, number, errors)
+    elif record_type == "5":
+      if batch_header is not None:
+        _error(errors, number, "BATCH_STRUCTURE", "Batch header found before the previous batch control")
+      batch_header = fields
+      batch_totals = ControlTotals()
+      batch_count += 1
+      _check_batch_header(fields, number, errors)
+    elif record_type == "6":
+      if batch_header is None:
+        _error(errors, number, "BATCH_STRUCTURE", "Entry detail record outside of a batch")
+        continue
+      batch_totals.add_entry(record)
+      _check_entry(fields, number, errors)
+      if fields["receiving_dfi_id"].isdigit():
+        routings.append((number, fields["receiving_dfi_id"] + fields["check_digit"]))
+    elif record_type == "7":
+      if batch_header is None:
+        _error(errors, number, "BATCH_STRUCTURE", "Addenda record outside of a batch")
+        continue
+      batch_totals.entry_addenda_count += 1
+    elif record_type == "8":
+      if batch_header is None:
+        _error(errors, number, "BATCH_STRUCTURE", "Batch control record without a batch header")
+        continue
+      _check_controls(fields, batch_totals.as_dict(), number, errors, "BATCH")
+      for name in ("service_class_code", "originating_dfi_id", "batch_number"):
+        if fields[name] != batch_header[name]:
+          _error(errors, number, f"BATCH_{name.upper()}", f"{name} '{fields[name]}' does not match the batch header")
+      file_totals.add(batch_totals)
+      batch_header = None
+    elif record_type == "9":
+      if batch_header is not None:
+        _error(errors, number, "BATCH_STRUCTURE", "File control record inside an open batch")
+      seen_control = True
+      _check_controls(fields, file_totals.as_dict(), number, errors, "FILE")
+      if to_int(fields["batch_count"]) != batch_count:
+        _error(errors, number, "FILE_BATCH_COUNT", f"batch_count is {to_int(fields['batch_count'])}, expected {batch_count}")
+      expected_blocks = -(-len(lines) // BLOCKING_FACTOR)
+      if to_int(fields["block_count"]) != expected_blocks:
+        _error(errors, number, "FILE_BLOCK_COUNT",
+               f"block_count is {to_int(fields['block_count'])}, expected {expected_blocks}")
+    else:
+      _error(errors, number, "RECORD_TYPE", f"Unknown record type '{record_type}'")
+
+  if not seen_header:
+    _error(errors, 1, "FILE_HEADER", "File header record (type 1) is missing")
+  if not seen_control:
+    _error(errors, len(lines), "FILE_CONTROL", "File control record (type 9) is missing")
+  elif len(lines) % BLOCKING_FACTOR:
+    _error(errors, len(lines), "BLOCKING", f"Record count {len(lines)} is not a multiple of {BLOCKING_FACTOR}")
+
+  if routings:
+    for (number, routing), valid in zip(routings, aba_valid_many([routing for _, routing in routings])):
+      if not valid:
+        _error(errors, number, "CHECK_DIGIT",
+               f"Check digit '{routing[8]}' does not match routing prefix {routing[:8]}, expected {aba_check_digit(routing[:8])}")
+    if routing_directory is not None:
+      for (number, routing), listed in zip(routings, routing_directory.contains_many(routing for _, routing in routings)):
+        if not listed:
+          _error(errors, number, "RECEIVING_DFI_UNKNOWN", f"Routing number {routing} is not in the routing directory")
+    errors.sort(key=lambda error: error["line"])
+
+  status = "invalid" if errors else "valid"
+  return status, errors
@@ -0,0 +1,206 @@
+import sys
+import heapq
+import argparse
+from datetime import datetime
+
+from nacha_records import (
+    RECORD_SIZE, FILE_HEADER_FIELDS, BATCH_HEADER_FIELDS, BATCH_CONTROL_FIELDS,
+    iter_records, is_padding, field, to_int,
+)
+from nacha_writer import NachaWriter, ControlTotals
+
+# Batch orderings for the merge; each input is expected to list its batches in the same order
+MERGE_KEYS = {
+    "input": lambda header: (),
+    "effective_date": lambda header: (field(header, BATCH_HEADER_FIELDS, "effective_entry_date"),),
+    "company": lambda header: (field(header, BATCH_HEADER_FIELDS, "company_identification"),
+                               field(header, BATCH_HEADER_FIELDS, "effective_entry_date")),
+}
+
+
+class _Input:
+    """One input file, read forward one batch at a time"""
+
+    def __init__(self, path):
+        self.path = path
+        self._records = iter_records(path)
+        self.file_header = None
+        self.batch_header = None
+
+    def next_batch(self):
+        """Advance to the next batch header; returns False at the end of the file"""
+        for record in self._records:
+            record_type = record[:1]
+            if record_type == '1':
+                self.file_header = record.ljust(RECORD_SIZE)
+            elif record_type == '5':
+                self.batch_header = record.ljust(RECORD_SIZE)
+                return True
+            elif record_type == '9' or is_padding(record):
+                continue
+            else:
+                raise ValueError(f"{self.path}: type {record_type} record outside of a batch")
+        self.batch_header = None
+        return False
+
+    def batch_records(self):
+        """Yield the current batch's entry and addenda records, then its batch control"""
+        for record in self._records:
+            yield record
+            if record[:1] == '8':
+                return
+        raise ValueError(f"{self.path}: batch without a batch control record")
+
+
+def _declared_totals(batch_control):
+    totals = ControlTotals()
+    totals.entry_addenda_count = to_int(field(batch_control, BATCH_CONTROL_FIELDS, "entry_addenda_count"))
+    totals.entry_hash = to_int(field(batch_control, BATCH_CONTROL_FIELDS, "entry_hash"))
+    totals.total_debit = to_int(field(batch_control, BATCH_CONTROL_FIELDS, "total_debit"))
+    totals.total_credit = to_int(field(batch_control, BATCH_CONTROL_FIELDS, "total_credit"))
+    return totals
+
+
+def _retrace(record, trace_number):
+    """Put a new trace number on an entry, or the matching sequence on its addenda"""
+    if record[:1] == '6':
+        return record[:79] + trace_number
+    if record[1:3] in ("98", "99"):  # NOC and return addenda carry the full trace number
+        return record[:79] + trace_number
+    return record[:87] + trace_number[-7:]
+
+
+def build_merged_header(first_header, now, file_id_modifier=None, immediate_destination=None,
+                        immediate_origin=None, destination_name=None, origin_name=None):
+    """Reuse the first input's file header with a new creation time and any overrides"""
+    header = first_header.ljust(RECORD_SIZE)
+
+    def replace(text, name, value):
+        start, end = FILE_HEADER_FIELDS[name]
+        return text[:start] + value[:end - start].ljust(end - start) + text[end:]
+
+    header = replace(header, "file_creation_date", now.strftime('%y%m%d'))
+    header = replace(header, "file_creation_time", now.strftime('%H%M'))
+    if file_id_modifier:
+        header = replace(header, "file_id_modifier", file_id_modifier)
+    if immediate_destination:
+        header = replace(header, "immediate_destination", f" {immediate_destination}" if len(immediate_destination) == 9 else immediate_destination)
+    if immediate_origin:
+        header = replace(header, "immediate_origin", immediate_origin.rjust(10))
+    if destination_name:
+        header = replace(header, "immediate_destination_name", destination_name)
+    if origin_name:
+        header = replace(header, "immediate_origin_name", origin_name)
+    return header
+
+
+def merge_files(paths, out, order="input", resequence_traces=False, recompute_controls=False, now=None, **header_options):
+    """
+    Merge NACHA files into one, streaming batches straight through
+
+    Batches are copied record by record: entries and addenda are not parsed, batch
+    numbers are renumbered from 1, and batch controls plus the file header, file
+    control and blocking are rebuilt. Batch totals are taken from each input's
+    batch control unless recompute_controls is set.
+
+    With order="input" the inputs are read one after another. Other orders do a
+    k-way merge: a heap holds the next batch header of every input, and the batch
+    with the smallest key is streamed out next, so memory holds one header per
+    input however large the inputs are.
+
+    Args:
+        paths: Input NACHA files
+        out: Writable text file object
+        order: "input", "effective_date" or "company" (see MERGE_KEYS)
+        resequence_traces: Renumber trace numbers as each batch's ODFI + a file-wide 7-digit sequence
+        recompute_controls: Recompute batch totals from the entries instead of trusting the inputs
+        now: datetime for the new file creation date/time (defaults to the current time)
+        header_options: file_id_modifier, immediate_destination, immediate_origin,
+            destination_name or origin_name overrides for the file header
+
+    Returns:
+        dict: inputs, batches, entry_addenda_count, total_debit and total_credit of the merged file
+    """
+    if order not in MERGE_KEYS:
+        raise ValueError(f"Unknown merge order '{order}', expected one of {', '.join(MERGE_KEYS)}")
+    key = MERGE_KEYS[order]
+    now = now or datetime.now()
+    writer = NachaWriter(out)
+    state = {"trace": 0, "destination": None}
+
+    def copy_batch(source):
+        if writer.record_count == 0:
+            if source.file_header is None:
+                raise ValueError(f"{source.path}: missing file header")
+            writer.write_file_header(build_merged_header(source.file_header, now, **header_options))
+            state["destination"] = field(source.file_header, FILE_HEADER_FIELDS, "immediate_destination")
+        elif source.file_header is not None and field(source.file_header, FILE_HEADER_FIELDS, "immediate_destination") != state["destination"]:
+            print(f"Warning: {source.path} was addressed to a different immediate destination", file=sys.stderr)
+
+        header = source.batch_header[:87] + str(writer.batch_count + 1).zfill(7)
+        odfi = field(header, BATCH_HEADER_FIELDS, "originating_dfi_id")
+        writer.begin_batch(header)
+        computed = ControlTotals()
+        for record in source.batch_records():
+            record_type = record[:1]
+            if record_type == '8':
+                writer.batch_totals = computed if recompute_controls else _declared_totals(record)
+                break
+            if resequence_traces:
+                if record_type == '6':
+                    state["trace"] += 1
+                record = _retrace(record, odfi + str(state["trace"]).zfill(7))
+            writer.write_record(record)
+            if recompute_controls:
+                if record_type == '6':
+                    computed.add_entry(record)
+                else:
+                    computed.entry_addenda_count += 1
+        writer.end_batch()
+
+    if order == "input":
+        for path in paths:
+            source = _Input(path)
+            while source.next_batch():
+                copy_batch(source)
+    else:
+        sources = [_Input(path) for path in paths]
+        heap = [(key(source.batch_header), index, source) for index, source in enumerate(sources) if source.next_batch()]
+        heapq.heapify(heap)
+        while heap:
+            _, index, source = heapq.heappop(heap)
+            copy_batch(source)
+            if source.next_batch():
+                heapq.heappush(heap, (key(source.batch_header), index, source))
+
+    if writer.record_count == 0:
+        raise ValueError("No batches found in the input files")
+    writer.finish()
+
+    totals = writer.file_totals
+    return {"inputs": len(paths), "batches": writer.batch_count, "entry_addenda_count": totals.entry_addenda_count,
+            "total_debit": totals.total_debit, "total_credit": totals.total_credit}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge NACHA files into one consolidated file")
+    parser.add_argument("files", nargs="+", help="Input NACHA files")
+    parser.add_argument("--output", help="Merged file (default: stdout)")
+    parser.add_argument("--order", choices=list(MERGE_KEYS), default="input", help="Batch order in the merged file")
+    parser.add_argument("--resequence-traces", action="store_true", help="Renumber trace numbers across the merged file")
+    parser.add_argument("--recompute-controls", action="store_true", help="Recompute batch totals from the entries")
+    parser.add_argument("--file-id-modifier", help="File ID modifier for the merged file header")
+    parser.add_argument("--immediate-destination", help="Override the immediate destination")
+    parser.add_argument("--immediate-origin", help="Override the immediate origin")
+
+    args = parser.parse_args()
+    options = dict(order=args.order, resequence_traces=args.resequence_traces, recompute_controls=args.recompute_controls,
+                   file_id_modifier=args.file_id_modifier, immediate_destination=args.immediate_destination,
+                   immediate_origin=args.immediate_origin)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='\n') as f:
+            stats = merge_files(args.files, f, **options)
+    else:
+        stats = merge_files(args.files, sys.stdout, **options)
+    print(f"Merged {stats['inputs']} files into {stats['batches']} batches", file=sys.stderr)
@@ -0,0 +1,202 @@
+RECORD_SIZE = 94
+BLOCKING_FACTOR = 10
+PADDING_RECORD = '9' * RECORD_SIZE
+
+# Field layouts per record type: name -> (start, end) as 0-based slice bounds.
+# Positions follow resources/nacha_validation_prompt.txt (1-based, inclusive).
+FILE_HEADER_FIELDS = {
+    "record_type": (0, 1),
+    "priority_code": (1, 3),
+    "immediate_destination": (3, 13),
+    "immediate_origin": (13, 23),
+    "file_creation_date": (23, 29),
+    "file_creation_time": (29, 33),
+    "file_id_modifier": (33, 34),
+    "record_size": (34, 37),
+    "blocking_factor": (37, 39),
+    "format_code": (39, 40),
+    "immediate_destination_name": (40, 63),
+    "immediate_origin_name": (63, 86),
+    "reference_code": (86, 94),
+}
+
+BATCH_HEADER_FIELDS = {
+    "record_type": (0, 1),
+    "service_class_code": (1, 4),
+    "company_name": (4, 20),
+    "company_discretionary_data": (20, 40),
+    "company_identification": (40, 50),
+    "standard_entry_class_code": (50, 53),
+    "company_entry_description": (53, 63),
+    "company_descriptive_date": (63, 69),
+    "effective_entry_date": (69, 75),
+    "settlement_date": (75, 78),
+    "originator_status_code": (78, 79),
+    "originating_dfi_id": (79, 87),
+    "batch_number": (87, 94),
+}
+
+ENTRY_DETAIL_FIELDS = {
+    "record_type": (0, 1),
+    "transaction_code": (1, 3),
+    "receiving_dfi_id": (3, 11),
+    "check_digit": (11, 12),
+    "dfi_account_number": (12, 29),
+    "amount": (29, 39),
+    "individual_id_number": (39, 54),
+    "individual_name": (54, 76),
+    "discretionary_data": (76, 78),
+    "addenda_record_indicator": (78, 79),
+    "trace_number": (79, 94),
+}
+
+ADDENDA_FIELDS = {
+    "record_type": (0, 1),
+    "addenda_type_code": (1, 3),
+    "payment_related_info": (3, 83),
+    "addenda_sequence_number": (83, 87),
+    "entry_detail_sequence_number": (87, 94),
+}
+
+BATCH_CONTROL_FIELDS = {
+    "record_type": (0, 1),
+    "service_class_code": (1, 4),
+    "entry_addenda_count": (4, 10),
+    "entry_hash": (10, 20),
+    "total_debit": (20, 32),
+    "total_credit": (32, 44),
+    "company_identification": (44, 54),
+    "message_authentication_code": (54, 73),
+    "reserved": (73, 79),
+    "originating_dfi_id": (79, 87),
+    "batch_number": (87, 94),
+}
+
+FILE_CONTROL_FIELDS = {
+    "record_type": (0, 1),
+    "batch_count": (1, 7),
+    "block_count": (7, 13),
+    "entry_addenda_count": (13, 21),
+    "entry_hash": (21, 31),
+    "total_debit": (31, 43),
+    "total_credit": (43, 55),
+    "reserved": (55, 94),
+}
+
+RECORD_LAYOUTS = {
+    "1": FILE_HEADER_FIELDS,
+    "5": BATCH_HEADER_FIELDS,
+    "6": ENTRY_DETAIL_FIELDS,
+    "7": ADDENDA_FIELDS,
+    "8": BATCH_CONTROL_FIELDS,
+    "9": FILE_CONTROL_FIELDS,
+}
+
+# Transaction codes whose amounts count towards the debit total
+DEBIT_TRANSACTION_CODES = frozenset(["26", "27", "28", "29", "36", "37", "38", "39", "46", "47", "48", "49", "55"])
+
+
+def is_padding(record):
+    """Return True for the all-9 filler records used to complete the last block"""
+    return record == PADDING_RECORD
+
+
+def aba_check_digit(routing_prefix):
+    """
+    Compute the ABA check digit for the first 8 digits of a routing number
+
+    Args:
+        routing_prefix: 8-digit routing prefix (e.g. a Receiving DFI Identification)
+
+    Returns:
+        str: the single check digit
+    """
+    weights = (3, 7, 1, 3, 7, 1, 3, 7)
+    total = sum(int(digit) * weight for digit, weight in zip(routing_prefix, weights))
+    return str((10 - total % 10) % 10)
+
+
+def iter_records(source):
+    """
+    Stream the records of a NACHA file one line at a time
+
+    Args:
+        source: Path to a NACHA file, or an open text file object
+
+    Yields:
+        Each non-blank record with its line terminator removed
+    """
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8', newline='') as f:
+            yield from iter_records(f)
+        return
+
+    for line in source:
+        record = line.rstrip('\r\n')
+        if record and not record.isspace():
+            yield record
+
+
+def parse_record(record):
+    """
+    Split a record into its named fields
+
+    Args:
+        record: A single 94-character record
+
+    Returns:
+        dict: field name -> raw field text, or an empty dict for unknown record types
+    """
+    layout = RECORD_LAYOUTS.get(record[:1], {})
+    return {name: record[start:end] for name, (start, end) in layout.items()}
+
+
+def field(record, layout, name):
+    """Return a single raw field from a record without parsing the whole record"""
+    start, end = layout[name]
+    return record[start:end]
+
+
+def to_int(text):
+    """Parse a zero-filled numeric field, treating blanks and garbage as 0"""
+    text = text.strip()
+    return int(text) if text.isdigit() else 0
+
+
+def is_debit(transaction_code):
+    """Return True if the transaction code debits the receiver's account"""
+    return transaction_code in DEBIT_TRANSACTION_CODES
+
+
+def iter_entries(records):
+    """
+    Group a record stream into entries, keeping only one entry in memory at a time
+
+    Args:
+        records: Iterable of records, e.g. from iter_records()
+
+    Yields:
+        tuple: (batch_header, entry_record, addenda_records) for every type 6 record
+    """
+    batch_header = None
+    entry = None
+    addenda = []
+
+    for record in records:
+        record_type = record[:1]
+        if record_type == '7' and entry is not None:
+            addenda.append(record)
+            continue
+
+        if entry is not None:
+            yield batch_header, entry, addenda
+            entry = None
+            addenda = []
+
+        if record_type == '5':
+            batch_header = record
+        elif record_type == '6':
+            entry = record
+
+    if entry is not None:
+        yield batch_header, entry, addenda
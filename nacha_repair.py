@@ -0,0 +1,82 @@
+import io
+
+from nacha_records import RECORD_SIZE, aba_check_digit
+from nacha_writer import NachaWriter
+
+
+def repair_nacha_file(file_content):
+    """
+    Repair the mechanical parts of a NACHA file that LLM output most often gets wrong
+
+    Records are padded or trimmed to 94 characters, every batch control and the
+    file control are rebuilt from the entries, and the last block is padded with
+    9s. Business fields (names, amounts, accounts) are kept. A check digit that
+    does not match its routing prefix is not rewritten, as the routing number
+    itself is usually wrong and a new digit would make it point at another bank;
+    it is reported as unrepaired and the record is left as it was.
+
+    Args:
+        file_content: The NACHA file as a string
+
+    Returns:
+        tuple: (repaired file content, list of human readable fixes applied,
+        list of problems that were left unrepaired)
+    """
+    fixes = []
+    unrepaired = []
+    out = io.StringIO()
+    writer = NachaWriter(out)
+    entry = None
+    addenda = []
+
+    def flush_entry():
+        nonlocal entry, addenda
+        if entry is not None:
+            writer.add_entry(entry, addenda)
+        entry = None
+        addenda = []
+
+    for number, raw in enumerate(file_content.split("\n"), 1):
+        record = raw.rstrip("\r")
+        if not record.strip():
+            continue
+        if len(record) > RECORD_SIZE:
+            fixes.append(f"Line {number}: trimmed {len(record)} characters to {RECORD_SIZE}")
+            record = record[:RECORD_SIZE]
+        elif len(record) < RECORD_SIZE:
+            fixes.append(f"Line {number}: padded {len(record)} characters to {RECORD_SIZE}")
+            record = record.ljust(RECORD_SIZE)
+
+        record_type = record[:1]
+        if record_type == '7' and entry is not None:
+            addenda.append(record)
+            continue
+        flush_entry()
+
+        if record_type == '1':
+            writer.write_file_header(record)
+        elif record_type == '5':
+            writer.begin_batch(record)
+        elif record_type == '6':
+            if writer.batch_header is None:
+                raise ValueError(f"Line {number}: entry detail record outside of a batch cannot be repaired")
+            check_digit = aba_check_digit(record[3:11]) if record[3:11].isdigit() else record[11]
+            if record[11] != check_digit:
+                unrepaired.append(f"Line {number}: routing number {record[3:12]} fails the ABA checksum;"
+                                  f" left unchanged, correct the routing number")
+            entry = record
+        elif record_type in ('8', '9'):
+            continue  # control and padding records are rebuilt below
+        else:
+            fixes.append(f"Line {number}: dropped record with unknown type '{record_type}'")
+
+    flush_entry()
+    writer.finish()
+
+    repaired = out.getvalue().rstrip("\n")
+    original_controls = [line.rstrip("\r") for line in file_content.split("\n") if line[:1] in ('8', '9')]
+    rebuilt_controls = [line for line in repaired.split("\n") if line[:1] in ('8', '9')]
+    if original_controls != rebuilt_controls:
+        fixes.append("Rebuilt batch control, file control and block padding records")
+
+    return repaired, fixes, unrepaired
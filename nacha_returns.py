@@ -0,0 +1,226 @@
+import json
+import random
+import argparse
+
+from nacha_records import (
+    FILE_HEADER_FIELDS, BATCH_HEADER_FIELDS,
+    iter_records, parse_record, field, aba_check_digit,
+)
+from nacha_writer import NachaWriter
+
+# Original transaction code -> automated return / NOC transaction code
+RETURN_TRANSACTION_CODES = {
+    "22": "21", "23": "21", "24": "21",
+    "27": "26", "28": "26", "29": "26",
+    "32": "31", "33": "31", "34": "31",
+    "37": "36", "38": "36", "39": "36",
+    "42": "41", "47": "46", "52": "51", "55": "56",
+}
+
+DEFAULT_RETURN_CODES = ["R01", "R03"]
+DEFAULT_CHANGE_CODES = ["C01", "C02", "C05"]
+
+
+def select_by_fraction(fraction, seed=None):
+    """
+    Build a rule that samples roughly `fraction` of the entries
+
+    Args:
+        fraction: Share of entries to pick, between 0 and 1
+        seed: Seed for reproducible sampling
+
+    Returns:
+        callable: rule(entry_fields) -> bool
+    """
+    rng = random.Random(seed)
+    return lambda entry_fields: rng.random() < fraction
+
+
+def select_by_field(**criteria):
+    """
+    Build a rule that picks entries whose fields match all of the given values
+
+    Example: select_by_field(transaction_code="27") picks every checking debit.
+    Values are compared with surrounding blanks stripped.
+    """
+    return lambda entry_fields: all(entry_fields[name].strip() == str(value) for name, value in criteria.items())
+
+
+def corrected_data(change_code, entry_fields):
+    """Produce plausible corrected data for a Notification of Change"""
+    account = entry_fields["dfi_account_number"].strip()
+    routing = entry_fields["receiving_dfi_id"] + entry_fields["check_digit"]
+    savings_code = {"22": "32", "27": "37", "32": "22", "37": "27"}.get(entry_fields["transaction_code"], "32")
+
+    if change_code == "C01":  # Incorrect DFI account number
+        return account[:-1] + str((int(account[-1]) + 1) % 10) if account[-1:].isdigit() else account + "0"
+    if change_code == "C02":  # Incorrect routing number
+        return routing
+    if change_code == "C05":  # Incorrect transaction code
+        return savings_code
+    if change_code == "C06":  # Incorrect account number and transaction code
+        return f"{account:<17}   {savings_code}"
+    return account
+
+
+def build_return_addenda(reason_code, original_trace, original_rdfi, trace_number):
+    """Create a Return Addenda Record (Type 7, addenda type 99)"""
+    record = '7'  # Record Type Code
+    record += '99'  # Addenda Type Code
+    record += reason_code.ljust(3)  # Return Reason Code
+    record += original_trace.rjust(15, '0')  # Original Entry Trace Number
+    record += ' ' * 6  # Date of Death
+    record += original_rdfi.ljust(8)  # Original Receiving DFI Identification
+    record += ' ' * 44  # Addenda Information
+    record += trace_number  # Trace Number
+
+    return record
+
+
+def build_noc_addenda(change_code, original_trace, original_rdfi, data, trace_number):
+    """Create a Notification of Change Addenda Record (Type 7, addenda type 98)"""
+    record = '7'  # Record Type Code
+    record += '98'  # Addenda Type Code
+    record += change_code.ljust(3)  # Change Code
+    record += original_trace.rjust(15, '0')  # Original Entry Trace Number
+    record += ' ' * 6  # Reserved
+    record += original_rdfi.ljust(8)  # Original Receiving DFI Identification
+    record += data[:29].ljust(29)  # Corrected Data
+    record += ' ' * 15  # Reserved
+    record += trace_number  # Trace Number
+
+    return record
+
+
+def swap_file_header(file_header):
+    """Turn the original File Header into the header of the file sent back to the originator"""
+    fields = parse_record(file_header.ljust(94))
+    record = fields["record_type"] + fields["priority_code"]
+    record += fields["immediate_origin"]  # the original origin now receives the file
+    record += fields["immediate_destination"]
+    record += ''.join(fields[name] for name in ("file_creation_date", "file_creation_time", "file_id_modifier",
+                                                "record_size", "blocking_factor", "format_code"))
+    record += fields["immediate_origin_name"] + fields["immediate_destination_name"] + fields["reference_code"]
+
+    return record
+
+
+def synthesize(source, out, kind="return", rule=None, codes=None, seed=None, returning_dfi=None):
+    """
+    Stream an originated file and write a matching return or NOC file in one pass
+
+    Each original batch with at least one selected entry becomes one output batch;
+    the batch header is only written once its first entry is picked, so neither the
+    input nor the output is ever held in memory.
+
+    Args:
+        source: Path to the originated NACHA file, or an open text file object
+        out: Writable text file object for the return / NOC file
+        kind: "return" (addenda type 99) or "noc" (COR entries with addenda type 98)
+        rule: Callable taking the parsed entry fields; returns False to skip the entry,
+              True to pick it with a random code from `codes`, or a code string to use
+        codes: Return reason codes (R01, R03, ...) or change codes (C01, C02, ...) to draw from
+        seed: Seed for the code choice
+        returning_dfi: 8-digit routing prefix of the returning bank, used for the new trace
+                       numbers (defaults to the original file's immediate destination)
+
+    Returns:
+        dict: number of entries read and number of entries returned
+    """
+    if kind not in ("return", "noc"):
+        raise ValueError(f"Unknown kind: {kind}. Expected 'return' or 'noc'")
+    if rule is None:
+        rule = select_by_fraction(0.05, seed)
+    if codes is None:
+        codes = DEFAULT_RETURN_CODES if kind == "return" else DEFAULT_CHANGE_CODES
+    rng = random.Random(seed)
+
+    writer = NachaWriter(out)
+    stats = {"entries_read": 0, "entries_returned": 0}
+    original_header = None
+    batch_open = False
+    sequence = 0
+
+    for record in iter_records(source):
+        record_type = record[:1]
+
+        if record_type == '1':
+            writer.write_file_header(swap_file_header(record))
+            if returning_dfi is None:
+                returning_dfi = field(record.ljust(94), FILE_HEADER_FIELDS, "immediate_destination").strip()[:8]
+        elif record_type == '5':
+            original_header = record.ljust(94)
+            batch_open = False
+        elif record_type == '8':
+            if batch_open:
+                writer.end_batch()
+            batch_open = False
+        elif record_type == '6':
+            stats["entries_read"] += 1
+            entry_fields = parse_record(record.ljust(94))
+            decision = rule(entry_fields)
+            if not decision:
+                continue
+            code = decision if isinstance(decision, str) else rng.choice(codes)
+
+            odfi = field(original_header, BATCH_HEADER_FIELDS, "originating_dfi_id")
+            if not batch_open:
+                header = original_header
+                if kind == "noc":
+                    header = header[:50] + "COR" + "NOTIFCHG  " + header[63:]
+                writer.begin_batch(header[:79] + returning_dfi.ljust(8) + header[87:])
+                batch_open = True
+
+            sequence += 1
+            trace_number = returning_dfi.ljust(8) + str(sequence).zfill(7)
+            original_trace = entry_fields["trace_number"]
+            original_rdfi = entry_fields["receiving_dfi_id"]
+            transaction_code = RETURN_TRANSACTION_CODES.get(entry_fields["transaction_code"], entry_fields["transaction_code"])
+
+            entry = '6'  # Record Type Code
+            entry += transaction_code  # Transaction Code
+            entry += odfi + aba_check_digit(odfi)  # The original ODFI now receives the entry
+            entry += entry_fields["dfi_account_number"]  # DFI Account Number
+            entry += '0' * 10 if kind == "noc" else entry_fields["amount"]  # Amount
+            entry += entry_fields["individual_id_number"]  # Individual Identification Number
+            entry += entry_fields["individual_name"]  # Individual Name
+            entry += entry_fields["discretionary_data"]  # Discretionary Data
+            entry += '1'  # Addenda Record Indicator
+            entry += trace_number  # Trace Number
+
+            if kind == "return":
+                addenda = build_return_addenda(code, original_trace, original_rdfi, trace_number)
+            else:
+                addenda = build_noc_addenda(code, original_trace, original_rdfi,
+                                            corrected_data(code, entry_fields), trace_number)
+
+            writer.add_entry(entry, [addenda])
+            stats["entries_returned"] += 1
+
+    writer.finish()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthesize a return or NOC file from an originated NACHA file")
+    parser.add_argument("source", help="Originated NACHA file")
+    parser.add_argument("output", help="Path of the return / NOC file to write")
+    parser.add_argument("--kind", choices=["return", "noc"], default="return", help="Type of file to produce")
+    parser.add_argument("--fraction", type=float, default=0.05, help="Share of entries to return")
+    parser.add_argument("--codes", help="Comma separated reason or change codes, e.g. R01,R03")
+    parser.add_argument("--match", action="append", default=[],
+                        help="Pick entries by field instead of sampling, e.g. --match transaction_code=27")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible output")
+
+    args = parser.parse_args()
+
+    if args.match:
+        selection = select_by_field(**dict(item.split("=", 1) for item in args.match))
+    else:
+        selection = select_by_fraction(args.fraction, args.seed)
+
+    with open(args.output, 'w', encoding='utf-8', newline='\n') as f:
+        result = synthesize(args.source, f, kind=args.kind, rule=selection,
+                            codes=args.codes.split(",") if args.codes else None, seed=args.seed)
+
+    print(json.dumps(result))
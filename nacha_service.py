@@ -0,0 +1,474 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from env_profiles import DEFAULT_ENV_FILE
+from instrumentation import metrics, percentile
+
+MAX_BODY_BYTES = 50 * 1024 * 1024
+ASYNC_ENTRY_THRESHOLD = 1000   # generate requests with more entries get a job ID instead of waiting
+MAX_FINISHED_JOBS = 10000      # finished jobs (and their results) kept for GET /status/<job_id>
+
+STATUS_TEXT = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 422: "Unprocessable Entity", 429: "Too Many Requests",
+               500: "Internal Server Error"}
+
+SAMPLE_FILE = "resources/nacha_customer_CT_PPD.txt"
+
+_directories = {}  # routing directory index path -> RoutingDirectory, per worker process
+
+
+# Work run in the process pool; module level so it can be pickled
+def _validate(content, routing_directory=None):
+    from nacha_file_validation import validate_nacha_file
+
+    directory = None
+    if routing_directory:
+        if routing_directory not in _directories:
+            from routing_directory import RoutingDirectory
+            _directories[routing_directory] = RoutingDirectory(routing_directory)
+        directory = _directories[routing_directory]
+    status, errors = validate_nacha_file(content, routing_directory=directory)
+    return {"status": status, "errors": errors}
+
+
+def _repair(content):
+    from nacha_repair import repair_nacha_file
+
+    repaired, fixes, unrepaired = repair_nacha_file(content)
+    return {"content": repaired, "fixes": fixes, "unrepaired": unrepaired}
+
+
+def _compile(config):
+    from nacha_compiler import compile_to_string
+
+    return {"content": compile_to_string(config)}
+
+
+def _render_spec(spec, env_file=None, seed=None):
+    from nacha_compiler import compile_to_string
+    from hybrid_generation import spec_to_config
+
+    originator = {}
+    if env_file:
+        from env_profiles import resolve_env_values, generator_kwargs
+        originator = generator_kwargs(resolve_env_values(env_file, seed))
+    return {"content": compile_to_string(spec_to_config(spec, originator))}
+
+
+def _entry_count(request):
+    if "config" in request:
+        return sum(len(batch["entries"]) for batch in request["config"]["batches"])
+    if "spec" in request:
+        return sum(len(batch["entries"]) for batch in request["spec"]["batches"])
+    return 0
+
+
+async def _read_request(reader):
+    """Read one HTTP/1.1 request; returns None when the client closed the connection"""
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise ValueError("Malformed request line")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise OverflowError(f"Request body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], headers, body
+
+
+async def _write_response(writer, status, payload, headers=None, keep_alive=True):
+    body = json.dumps(payload).encode()
+    head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}", "Content-Type: application/json",
+            f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+
+class NachaService:
+    """
+    Headless HTTP service for generating, validating and repairing NACHA files
+
+    Endpoints (JSON in and out; validate and repair also take the raw file as the body):
+        POST /generate   {"config": nacha_config} or {"spec": hybrid spec}, rendered locally,
+                         or {"prompt": "..."} answered by the model through the async client
+        POST /validate   {"content": file} -> {"status", "errors"}
+        POST /repair     {"content": file} -> {"content", "fixes"}
+        GET  /status     queue depths, job counts and counters
+        GET  /status/<job_id>
+
+    Local rendering, validation and repair run on a process pool, so they use every
+    core and never block the event loop; model calls run on the event loop through
+    AsyncAnthropic, so hundreds can wait on the network at once. Each lane has a
+    bounded queue in front of its workers, and a request arriving at a full queue
+    is answered 429 with Retry-After instead of piling up. Prompts, requests with
+    more than async_threshold entries and requests with "async": true return 202
+    with a job ID to poll.
+    """
+
+    def __init__(self, workers=None, llm_workers=8, queue_size=64, llm_queue_size=32,
+                 async_threshold=ASYNC_ENTRY_THRESHOLD, llm_client=None, llm_deadline=None,
+                 routing_directory=None, env_file=DEFAULT_ENV_FILE):
+        """
+        Args:
+            workers: Processes for local work (default: CPU count)
+            llm_workers: Model calls in flight at once
+            queue_size: Local requests waiting for a process before 429s
+            llm_queue_size: Prompts waiting for a model call slot before 429s
+            async_threshold: Entry count above which generate requests become jobs
+            llm_client: Async Anthropic client (created from ANTHROPIC_API_KEY on first use if omitted)
+            llm_deadline: Seconds a model call may take (default: NACHA_CALL_DEADLINE, see resilient_calls)
+            routing_directory: Routing directory index used by /validate
+            env_file: Environment profile supplying originator fields for prompts and specs
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.llm_workers = llm_workers
+        self.queue_sizes = {"local": queue_size, "llm": llm_queue_size}
+        self.async_threshold = async_threshold
+        self.llm_deadline = llm_deadline or float(os.environ.get("NACHA_CALL_DEADLINE", 300))
+        self.routing_directory = routing_directory
+        self.env_file = env_file
+        self._llm_client = llm_client
+        self.jobs = {}
+        self._finished = deque()
+        self.port = None
+        self.started = None
+
+    @property
+    def llm_client(self):
+        if self._llm_client is None:
+            api_key = os.environ.get("ANTHROPIC_API_KEY")
+            if not api_key:
+                raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
+            from anthropic import AsyncAnthropic
+            self._llm_client = AsyncAnthropic(api_key=api_key)
+        return self._llm_client
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start the process pool, the lane workers and the listening socket (port 0 picks a free port)"""
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.queues = {lane: asyncio.Queue(size) for lane, size in self.queue_sizes.items()}
+        self._tasks = [asyncio.ensure_future(self._worker("local")) for _ in range(self.workers)]
+        self._tasks += [asyncio.ensure_future(self._worker("llm")) for _ in range(self.llm_workers)]
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started = time.time()
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _submit(self, lane, kind, work, track):
+        """
+        Queue work (a coroutine function) on a lane; returns the job, or None when the lane is full
+
+        Tracked jobs are kept in self.jobs for GET /status/<job_id>.
+        """
+        job = {"id": os.urandom(8).hex(), "kind": kind, "status": "queued", "created": time.time(),
+               "started": None, "finished": None, "result": None, "error": None,
+               "done": asyncio.get_running_loop().create_future()}
+        try:
+            self.queues[lane].put_nowait((job, work))
+        except asyncio.QueueFull:
+            metrics.add("rejected")
+            return None
+        if track:
+            self.jobs[job["id"]] = job
+        return job
+
+    async def _worker(self, lane):
+        queue = self.queues[lane]
+        while True:
+            job, work = await queue.get()
+            job["status"] = "running"
+            job["started"] = time.time()
+            try:
+                with metrics.span(f"service_{job['kind']}"):
+                    job["result"] = await work()
+                job["status"] = "done"
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = f"{type(e).__name__}: {e}"
+            job["finished"] = time.time()
+            job["done"].set_result(None)
+            queue.task_done()
+
+            if job["id"] not in self.jobs:
+                continue
+            self._finished.append(job["id"])
+            while len(self._finished) > MAX_FINISHED_JOBS:
+                self.jobs.pop(self._finished.popleft(), None)
+
+    def _local(self, func, *args):
+        return lambda: asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    async def _generate_from_prompt(self, request):
+        from hybrid_generation import build_hybrid_params, extract_spec
+        from model_router import router
+
+        decision = router.route_prompt(request["prompt"], output="spec")
+        params = build_hybrid_params(request["prompt"], request.get("model") or decision["model"],
+                                     decision["max_tokens"])
+        with metrics.span("api_call", model=params["model"]):
+            message = await asyncio.wait_for(self.llm_client.messages.create(**params), self.llm_deadline)
+        metrics.record_usage(getattr(message, "usage", None))
+        router.record_outcome(decision, message)
+        return await self._local(_render_spec, extract_spec(message), self.env_file, request.get("seed"))()
+
+    def _job_view(self, job):
+        return {name: value for name, value in job.items() if name != "done"}
+
+    async def _run(self, lane, kind, work, wait):
+        job = self._submit(lane, kind, work, track=not wait)
+        if job is None:
+            return 429, {"error": f"{lane} queue is full, retry later"}, {"Retry-After": "1"}
+        if not wait:
+            return 202, {"job_id": job["id"], "status_url": f"/status/{job['id']}"}, {"Location": f"/status/{job['id']}"}
+        await job["done"]
+        if job["status"] == "failed":
+            return 422, {"error": job["error"]}, None
+        return 200, job["result"], None
+
+    def status(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "workers": {"local": self.workers, "llm": self.llm_workers},
+            "queues": {lane: {"depth": queue.qsize(), "capacity": queue.maxsize} for lane, queue in self.queues.items()},
+            "jobs": counts,
+            "rejected": metrics.counters.get("rejected", 0),
+        }
+
+    async def dispatch(self, method, path, headers, body):
+        """Route one request; returns (status, JSON payload, extra headers)"""
+        if path == "/status" or path.startswith("/status/"):
+            if method != "GET":
+                return 405, {"error": "Use GET"}, None
+            if path == "/status":
+                return 200, self.status(), None
+            job = self.jobs.get(path[len("/status/"):])
+            if job is None:
+                return 404, {"error": "Unknown job ID"}, None
+            return 200, self._job_view(job), None
+
+        if path not in ("/generate", "/validate", "/repair"):
+            return 404, {"error": f"No endpoint {path}"}, None
+        if method != "POST":
+            return 405, {"error": "Use POST"}, None
+
+        if headers.get("content-type", "application/json").startswith("application/json"):
+            request = json.loads(body or b"{}")
+        else:
+            request = {"content": body.decode('utf-8')}
+        wait = not request.get("async", False)
+
+        if path == "/validate":
+            return await self._run("local", "validate", self._local(_validate, request["content"], self.routing_directory), wait)
+        if path == "/repair":
+            return await self._run("local", "repair", self._local(_repair, request["content"]), wait)
+        if "prompt" in request:
+            return await self._run("llm", "generate", lambda: self._generate_from_prompt(request), False)
+        wait = wait and _entry_count(request) <= self.async_threshold
+        if "config" in request:
+            return await self._run("local", "generate", self._local(_compile, request["config"]), wait)
+        if "spec" in request:
+            work = self._local(_render_spec, request["spec"], self.env_file, request.get("seed"))  # never a client-chosen path
+            return await self._run("local", "generate", work, wait)
+        return 400, {"error": "Expected one of config, spec or prompt"}, None
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except OverflowError as e:
+                    await _write_response(writer, 413, {"error": str(e)}, keep_alive=False)
+                    break
+                except ValueError as e:
+                    await _write_response(writer, 400, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    status, payload, extra = await self.dispatch(method, path, headers, body)
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload, extra = 400, {"error": f"{type(e).__name__}: {e}"}, None
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await _write_response(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def request(host, port, method, path, payload=None, connection=None):
+    """
+    Send one request to the service; returns (status, decoded JSON body)
+
+    Pass a (reader, writer) pair as connection to reuse a keep-alive connection.
+    """
+    reader, writer = connection or await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if connection else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    data = json.loads(await reader.readexactly(length)) if length else None
+    if connection is None:
+        writer.close()
+    return status, data
+
+
+async def load_test(host, port, path="/validate", payload=None, requests=2000, concurrency=32):
+    """
+    Send requests from concurrent keep-alive clients and measure throughput and latency
+
+    Returns:
+        dict: requests per second, status code counts and p50/p95/p99/max latency in milliseconds
+    """
+    if payload is None:
+        with open(SAMPLE_FILE, 'r', encoding='utf-8') as f:
+            payload = {"content": f.read()}
+    latencies = []
+    statuses = {}
+    remaining = [requests]
+
+    async def client():
+        connection = await asyncio.open_connection(host, port)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            sent = time.perf_counter()
+            status, _ = await request(host, port, "POST", path, payload, connection)
+            latencies.append(time.perf_counter() - sent)
+            statuses[status] = statuses.get(status, 0) + 1
+        connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "path": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+async def serve(host, port, **options):
+    service = await NachaService(**options).start(host, port)
+    print(f"Serving on http://{host}:{service.port}", flush=True)
+    async with service:
+        await service.server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP service for NACHA generation, validation and repair")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subcommands.add_parser("serve", help="Run the service")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    serve_parser.add_argument("--port", type=int, default=8080, help="Port to listen on (0 picks a free port)")
+    serve_parser.add_argument("--workers", type=int, help="Processes for local work (default: CPU count)")
+    serve_parser.add_argument("--llm-workers", type=int, default=8, help="Model calls in flight at once")
+    serve_parser.add_argument("--queue-size", type=int, default=64, help="Waiting local requests before 429s")
+    serve_parser.add_argument("--llm-queue-size", type=int, default=32, help="Waiting prompts before 429s")
+    serve_parser.add_argument("--routing-directory", help="Routing directory index used by /validate")
+    serve_parser.add_argument("--env", default=DEFAULT_ENV_FILE, help="Environment profile supplying originator fields")
+
+    load_parser = subcommands.add_parser("load-test", help="Measure throughput and latency percentiles")
+    load_parser.add_argument("--url", help="Running service, e.g. http://127.0.0.1:8080 (default: start one locally)")
+    load_parser.add_argument("--path", default="/validate", choices=["/validate", "/repair", "/generate"],
+                             help="Endpoint to load")
+    load_parser.add_argument("--file", default=SAMPLE_FILE, help="NACHA file sent to /validate and /repair")
+    load_parser.add_argument("--config", help="nacha_config JSON sent to /generate")
+    load_parser.add_argument("--requests", type=int, default=2000, help="Total requests")
+    load_parser.add_argument("--concurrency", type=int, default=32, help="Concurrent keep-alive clients")
+    load_parser.add_argument("--workers", type=int, help="Processes for the locally started service")
+    load_parser.add_argument("--queue-size", type=int, default=64, help="Queue size of the locally started service")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+        asyncio.run(serve(args.host, args.port, workers=args.workers, llm_workers=args.llm_workers,
+                          queue_size=args.queue_size, llm_queue_size=args.llm_queue_size,
+                          routing_directory=args.routing_directory, env_file=args.env))
+    else:
+        if args.config:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                payload = {"config": json.load(f)}
+        else:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                payload = {"content": f.read()}
+
+        process = None
+        if args.url:
+            host, _, port = args.url.split("//", 1)[-1].rstrip("/").partition(":")
+            port = int(port or 80)
+        else:
+            # The service runs in its own process so the load generator does not share its event loop
+            command = [sys.executable, __file__, "serve", "--port", "0", "--queue-size", str(args.queue_size)]
+            if args.workers:
+                command += ["--workers", str(args.workers)]
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+            host, _, port = process.stdout.readline().split("//", 1)[1].strip().partition(":")
+            port = int(port)
+        try:
+            print(json.dumps(asyncio.run(load_test(host, port, args.path, payload, args.requests, args.concurrency)), indent=2))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
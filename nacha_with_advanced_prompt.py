@@ -1,18 +1,40 @@
-import anthropic
-import os
 import json
 from datetime import datetime
 
-# Set up Claude client with your API key
-client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+from instrumentation import metrics
+from resilient_calls import create_message
+from model_router import router
+from transport import transport
 
-def generate_nacha_file(nacha_config):
+
+def get_client():
+    """Return the shared Claude client (or the record/replay client, see transport.py)"""
+    return transport.client()
+
+
+GENERATION_SYSTEM_PROMPT = """You are an expert in ACH payment processing with comprehensive knowledge of NACHA file formats 
+        for all SEC codes including PPD, CCD, TEL, WEB, IAT and others. You understand the specific requirements 
+        for international transactions, addenda records, batch structuring, and all transaction codes. 
+        You generate complete, valid NACHA files exactly according to specifications with proper record formatting, 
+        field validation, and accurate control totals."""
+
+
+def build_generation_params(nacha_config, model=None, max_tokens=None):
     """
-    Generate a NACHA file using Claude API
+    Build the Messages API parameters for generating a file from a NACHA configuration
     
     nacha_config: A dictionary containing all NACHA file specifications
+    model, max_tokens: Chosen and sized by model_router from the config's entries when omitted
+    
+    Returns:
+        dict: keyword arguments for client.messages.create (or one Message Batches request)
     """
     
+    if model is None or max_tokens is None:
+        decision = router.route_config(nacha_config)
+        model = model or decision["model"]
+        max_tokens = max_tokens or decision["max_tokens"]
+
     # Format the configuration as JSON for clear structure in the prompt
     formatted_config = json.dumps(nacha_config, indent=2)
     
@@ -34,26 +56,40 @@ def generate_nacha_file(nacha_config):
     Provide only the raw NACHA file content with each record on a new line, no explanations.
     """
     
-    # Call Claude API with system prompt focused on NACHA expertise
-    message = client.messages.create(
-        model="claude-3-7-sonnet-20250219",
-        max_tokens=8000,
-        temperature=0,
-        system="""You are an expert in ACH payment processing with comprehensive knowledge of NACHA file formats 
-        for all SEC codes including PPD, CCD, TEL, WEB, IAT and others. You understand the specific requirements 
-        for international transactions, addenda records, batch structuring, and all transaction codes. 
-        You generate complete, valid NACHA files exactly according to specifications with proper record formatting, 
-        field validation, and accurate control totals.""",
-        messages=[
+    # System prompt focused on NACHA expertise
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": 0,
+        "system": GENERATION_SYSTEM_PROMPT,
+        "messages": [
             {"role": "user", "content": prompt}
         ]
-    )
+    }
+
+
+@metrics.traced("generate_nacha_file")
+def generate_nacha_file(nacha_config):
+    """
+    Generate a NACHA file using Claude API
+    
+    nacha_config: A dictionary containing all NACHA file specifications
+    """
+    decision = router.route_config(nacha_config)
+    params = build_generation_params(nacha_config, decision["model"], decision["max_tokens"])
+    
+    # Call Claude API
+    with metrics.span("api_call"):
+        message = create_message(get_client(), params)
+    metrics.record_usage(getattr(message, "usage", None))
+    router.record_outcome(decision, message)
     
     # Extract the NACHA file from Claude's response
     nacha_content = message.content[0].text
     
     # Clean up any extra text Claude might have included
-    nacha_content = clean_nacha_content(nacha_content)
+    with metrics.span("clean_nacha_content"):
+        nacha_content = clean_nacha_content(nacha_content)
     
     return nacha_content
 
@@ -0,0 +1,147 @@
+from nacha_records import (
+    RECORD_SIZE, BLOCKING_FACTOR, PADDING_RECORD, ENTRY_DETAIL_FIELDS, BATCH_HEADER_FIELDS,
+    field, to_int, is_debit,
+)
+
+
+class ControlTotals:
+    """Entry/addenda count, entry hash and dollar totals for a batch or a whole file"""
+
+    def __init__(self):
+        self.entry_addenda_count = 0
+        self.entry_hash = 0
+        self.total_debit = 0
+        self.total_credit = 0
+
+    def add_entry(self, entry, addenda=()):
+        """Account for one type 6 record and the addenda that follow it"""
+        self.entry_addenda_count += 1 + len(addenda)
+        self.entry_hash += to_int(field(entry, ENTRY_DETAIL_FIELDS, "receiving_dfi_id"))
+        amount = to_int(field(entry, ENTRY_DETAIL_FIELDS, "amount"))
+        if is_debit(field(entry, ENTRY_DETAIL_FIELDS, "transaction_code")):
+            self.total_debit += amount
+        else:
+            self.total_credit += amount
+
+    def add(self, other):
+        """Fold another set of totals (e.g. a finished batch) into this one"""
+        self.entry_addenda_count += other.entry_addenda_count
+        self.entry_hash += other.entry_hash
+        self.total_debit += other.total_debit
+        self.total_credit += other.total_credit
+
+    @classmethod
+    def from_dict(cls, values):
+        """Rebuild totals saved with vars() (e.g. in a checkpoint)"""
+        totals = cls()
+        totals.entry_addenda_count = values["entry_addenda_count"]
+        totals.entry_hash = values["entry_hash"]
+        totals.total_debit = values["total_debit"]
+        totals.total_credit = values["total_credit"]
+        return totals
+
+    def as_dict(self):
+        return {
+            "entry_addenda_count": self.entry_addenda_count,
+            "entry_hash": self.entry_hash % 10**10,
+            "total_debit": self.total_debit,
+            "total_credit": self.total_credit,
+        }
+
+
+def build_batch_control(batch_header, totals):
+    """Create the Batch Control Record (Type 8) matching a batch header"""
+    record = '8'  # Record Type Code
+    record += field(batch_header, BATCH_HEADER_FIELDS, "service_class_code")  # Service Class Code
+    record += str(totals.entry_addenda_count).zfill(6)  # Entry/Addenda Count
+    record += str(totals.entry_hash)[-10:].zfill(10)  # Entry Hash (last 10 digits)
+    record += str(totals.total_debit).zfill(12)  # Total Debit Entry Dollar Amount
+    record += str(totals.total_credit).zfill(12)  # Total Credit Entry Dollar Amount
+    record += field(batch_header, BATCH_HEADER_FIELDS, "company_identification")  # Company Identification
+    record += ' ' * 19  # Message Authentication Code
+    record += ' ' * 6  # Reserved
+    record += field(batch_header, BATCH_HEADER_FIELDS, "originating_dfi_id")  # Originating DFI Identification
+    record += field(batch_header, BATCH_HEADER_FIELDS, "batch_number")  # Batch Number
+
+    return record
+
+
+def build_file_control(batch_count, block_count, totals):
+    """Create the File Control Record (Type 9)"""
+    record = '9'  # Record Type Code
+    record += str(batch_count).zfill(6)  # Batch Count
+    record += str(block_count).zfill(6)  # Block Count
+    record += str(totals.entry_addenda_count).zfill(8)  # Entry/Addenda Count
+    record += str(totals.entry_hash)[-10:].zfill(10)  # Entry Hash
+    record += str(totals.total_debit).zfill(12)  # Total Debit Entry Dollar Amount in File
+    record += str(totals.total_credit).zfill(12)  # Total Credit Entry Dollar Amount in File
+    record += ' ' * 39  # Reserved
+
+    return record
+
+
+class NachaWriter:
+    """
+    Stream a NACHA file record by record, computing controls and blocking on the fly
+
+    Only the totals of the current batch and of the file are kept, so files of any
+    size can be written with constant memory.
+    """
+
+    def __init__(self, out):
+        """
+        Args:
+            out: Writable text file object
+        """
+        self.out = out
+        self.record_count = 0
+        self.last_record = None
+        self.batch_count = 0
+        self.file_totals = ControlTotals()
+        self.batch_header = None
+        self.batch_totals = None
+
+    def write_record(self, record):
+        """Write one record, padding it to 94 characters"""
+        if len(record) > RECORD_SIZE:
+            raise ValueError(f"Record length {len(record)} exceeds {RECORD_SIZE} characters: {record!r}")
+        self.last_record = record.ljust(RECORD_SIZE)
+        self.out.write(self.last_record + "\n")
+        self.record_count += 1
+
+    def write_file_header(self, record):
+        self.write_record(record)
+
+    def begin_batch(self, batch_header):
+        """Write a Batch Header Record (Type 5) and start accumulating its controls"""
+        if self.batch_header is not None:
+            self.end_batch()
+        self.write_record(batch_header)
+        self.batch_header = batch_header.ljust(RECORD_SIZE)
+        self.batch_totals = ControlTotals()
+        self.batch_count += 1
+
+    def add_entry(self, entry, addenda=()):
+        """Write an Entry Detail Record (Type 6) followed by its addenda (Type 7)"""
+        if self.batch_header is None:
+            raise ValueError("Entry written outside of a batch")
+        self.write_record(entry)
+        for record in addenda:
+            self.write_record(record)
+        self.batch_totals.add_entry(entry, addenda)
+
+    def end_batch(self):
+        """Write the Batch Control Record (Type 8) for the open batch"""
+        self.write_record(build_batch_control(self.batch_header, self.batch_totals))
+        self.file_totals.add(self.batch_totals)
+        self.batch_header = None
+        self.batch_totals = None
+
+    def finish(self):
+        """Write the File Control Record (Type 9) and pad the last block with 9s"""
+        if self.batch_header is not None:
+            self.end_batch()
+        block_count = -(-(self.record_count + 1) // BLOCKING_FACTOR)
+        self.write_record(build_file_control(self.batch_count, block_count, self.file_totals))
+        while self.record_count % BLOCKING_FACTOR:
+            self.write_record(PADDING_RECORD)
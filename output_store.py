@@ -0,0 +1,250 @@
+import os
+import io
+import gzip
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+
+from nacha_records import FILE_CONTROL_FIELDS, field, to_int, is_padding
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+DEFAULT_STORE_DIR = "generated_files"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    content_hash TEXT PRIMARY KEY,
+    compression TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    entry_addenda_count INTEGER,
+    total_debit INTEGER,
+    total_credit INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash TEXT NOT NULL REFERENCES objects(content_hash),
+    prompt TEXT,
+    prompt_hash TEXT,
+    env TEXT,
+    env_values TEXT,
+    env_values_hash TEXT,
+    seed INTEGER,
+    model TEXT,
+    validation_status TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS generations_content_hash ON generations(content_hash);
+CREATE INDEX IF NOT EXISTS generations_prompt_hash ON generations(prompt_hash);
+CREATE INDEX IF NOT EXISTS generations_env ON generations(env);
+CREATE INDEX IF NOT EXISTS generations_env_values_hash ON generations(env_values_hash);
+CREATE INDEX IF NOT EXISTS generations_model ON generations(model);
+CREATE INDEX IF NOT EXISTS generations_validation_status ON generations(validation_status);
+CREATE INDEX IF NOT EXISTS objects_totals ON objects(total_debit, total_credit);
+CREATE INDEX IF NOT EXISTS objects_credit ON objects(total_credit);
+CREATE INDEX IF NOT EXISTS objects_entry_addenda_count ON objects(entry_addenda_count);
+"""
+
+
+# Columns added to generations after the first release, for indexes created before them
+ADDED_COLUMNS = (("env_values", "TEXT"), ("env_values_hash", "TEXT"), ("seed", "INTEGER"))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest() if text is not None else None
+
+
+class _FileControlScanner:
+    """Find the File Control Record in a stream of text chunks without buffering the file"""
+
+    def __init__(self):
+        self.partial = ""
+        self.file_control = None
+
+    def feed(self, chunk):
+        lines = (self.partial + chunk).split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            self._check(line.rstrip("\r"))
+
+    def close(self):
+        self._check(self.partial.rstrip("\r"))
+
+    def _check(self, record):
+        if record[:1] == '9' and not is_padding(record):
+            self.file_control = record.ljust(94)
+
+
+class OutputStore:
+    """
+    Content-addressed, compressed store for generated NACHA files
+
+    Each distinct file is stored once under objects/<hash[:2]>/<hash> and compressed
+    while it is written. A SQLite index records every generation that produced it
+    (prompt, environment profile, the environment values and seed chosen from it,
+    model, validation status) plus the file's control totals, so lookups by any of
+    those use an index instead of scanning the directory.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, compression="gzip"):
+        """
+        Args:
+            root: Directory holding objects/ and index.sqlite
+            compression: "gzip" or "zstd" (requires the zstandard package)
+        """
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        if compression not in ("gzip", "zstd"):
+            raise ValueError(f"Unknown compression: {compression}")
+        self.root = root
+        self.compression = compression
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(generations)")}
+            for name, kind in ADDED_COLUMNS:
+                if columns and name not in columns:  # index written by an older version
+                    self._db.execute(f"ALTER TABLE generations ADD COLUMN {name} {kind}")
+            self._db.executescript(SCHEMA)
+
+    def object_path(self, content_hash):
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash)
+
+    def _compressed_writer(self, raw):
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=10).stream_writer(raw)
+        return gzip.GzipFile(fileobj=raw, mode="wb", mtime=0)
+
+    def put_stream(self, chunks, prompt=None, env=None, env_values=None, seed=None, model=None, validation_status=None):
+        """
+        Store a file given as an iterable of text chunks, hashing and compressing as it streams
+
+        Args:
+            env: Environment profile path
+            env_values: The values chosen from the profile for this run, as
+                env_profiles.compact_prompt_text renders them
+            seed: Seed the values were chosen with, if any
+
+        Returns:
+            str: the SHA-256 content hash identifying the file
+        """
+        digest = hashlib.sha256()
+        scanner = _FileControlScanner()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                writer = self._compressed_writer(raw)
+                for chunk in chunks:
+                    data = chunk.encode('utf-8')
+                    digest.update(data)
+                    writer.write(data)
+                    scanner.feed(chunk)
+                    size += len(data)
+                writer.close()
+            scanner.close()
+            content_hash = digest.hexdigest()
+
+            path = self.object_path(content_hash)
+            if os.path.exists(path):
+                os.remove(tmp_path)  # identical content is already stored
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        control = scanner.file_control
+        totals = (to_int(field(control, FILE_CONTROL_FIELDS, "entry_addenda_count")),
+                  to_int(field(control, FILE_CONTROL_FIELDS, "total_debit")),
+                  to_int(field(control, FILE_CONTROL_FIELDS, "total_credit"))) if control else (None, None, None)
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, self.compression, size, os.path.getsize(self.object_path(content_hash)), *totals, now))
+            self._db.execute(
+                "INSERT INTO generations (content_hash, prompt, prompt_hash, env, env_values, env_values_hash, seed,"
+                " model, validation_status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, prompt, text_hash(prompt), env, env_values, text_hash(env_values), seed, model,
+                 validation_status, now))
+        return content_hash
+
+    def put(self, content, **metadata):
+        """Store a file given as a string; see put_stream for the metadata arguments"""
+        return self.put_stream([content], **metadata)
+
+    def open(self, content_hash):
+        """Open a stored file for streaming reads as text"""
+        with self._lock:
+            row = self._db.execute("SELECT compression FROM objects WHERE content_hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            raise KeyError(content_hash)
+        raw = open(self.object_path(content_hash), "rb")
+        if row["compression"] == "zstd":
+            if zstandard is None:
+                raise ValueError("Reading zstd objects requires the 'zstandard' package")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            stream = gzip.GzipFile(fileobj=raw, mode="rb")
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+    def get(self, content_hash):
+        """Return the content of a stored file"""
+        with self.open(content_hash) as f:
+            return f.read()
+
+    def find(self, prompt=None, env=None, env_values=None, seed=None, model=None, validation_status=None,
+             content_hash=None, entry_addenda_count=None, debit_range=None, credit_range=None, limit=100):
+        """
+        Look up generations by any combination of indexed metadata and file totals
+
+        Args:
+            env_values: Environment values as stored by put_stream (compact JSON text)
+            entry_addenda_count: Exact entry/addenda count of the file
+            debit_range, credit_range: (low, high) bounds in cents on the file's total
+                debit or credit, inclusive; either bound may be None
+
+        Returns:
+            list: dicts with the generation metadata and the stored file's totals, newest first
+        """
+        clauses = []
+        params = []
+        for column, value in (("g.prompt_hash", text_hash(prompt)), ("g.env", env),
+                              ("g.env_values_hash", text_hash(env_values)), ("g.seed", seed), ("g.model", model),
+                              ("g.validation_status", validation_status), ("g.content_hash", content_hash)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if entry_addenda_count is not None:
+            clauses.append("o.entry_addenda_count = ?")
+            params.append(entry_addenda_count)
+        for column, bounds in (("o.total_debit", debit_range), ("o.total_credit", credit_range)):
+            low, high = bounds or (None, None)
+            if low is not None:
+                clauses.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{column} <= ?")
+                params.append(high)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (f"SELECT g.*, o.size, o.stored_size, o.compression, o.entry_addenda_count, o.total_debit, o.total_credit"
+                 f" FROM generations g JOIN objects o USING (content_hash) {where}"
+                 f" ORDER BY g.id DESC LIMIT ?")
+        with self._lock:
+            return [dict(row) for row in self._db.execute(query, (*params, limit))]
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from instrumentation import metrics, percentile
+
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504, 529)
+RETRYABLE_ERROR_NAMES = ("APIConnectionError", "APITimeoutError", "InternalServerError",
+                         "RateLimitError", "OverloadedError", "ServiceUnavailableError")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call did not complete before its deadline, including retries and hedges"""
+
+
+def is_retryable(error):
+    """Timeouts, connection failures, 429 and 5xx responses are worth another attempt"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    if status in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+class CallPolicy:
+    """Deadline, retry and hedging settings for one kind of call"""
+
+    def __init__(self, deadline=120.0, retries=3, backoff=0.5, max_backoff=8.0,
+                 hedge_percentile=None, hedge_min_samples=20, hedge_budget=0.1, max_hedge_tokens=10.0):
+        """
+        Args:
+            deadline: Seconds the whole call may take, across every attempt and backoff
+            retries: Maximum number of retries after the first attempt
+            backoff: Base of the exponential backoff, in seconds
+            max_backoff: Cap on a single backoff sleep
+            hedge_percentile: Send a duplicate once an attempt is slower than this percentile
+                of recent latencies (e.g. 95); None disables hedging
+            hedge_min_samples: Latencies needed before hedging starts
+            hedge_budget: Hedges allowed per call on average (0.1 = at most ~10% extra requests)
+            max_hedge_tokens: Largest burst of hedges the budget can accumulate
+        """
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = hedge_budget
+        self.max_hedge_tokens = max_hedge_tokens
+
+    @classmethod
+    def from_env(cls):
+        """Policy for LLM calls, overridable with NACHA_CALL_DEADLINE, NACHA_CALL_RETRIES,
+        NACHA_HEDGE_PERCENTILE and NACHA_HEDGE_BUDGET"""
+        hedge = os.environ.get("NACHA_HEDGE_PERCENTILE")
+        return cls(deadline=float(os.environ.get("NACHA_CALL_DEADLINE", 300)),
+                   retries=int(os.environ.get("NACHA_CALL_RETRIES", 3)),
+                   hedge_percentile=float(hedge) if hedge else None,
+                   hedge_budget=float(os.environ.get("NACHA_HEDGE_BUDGET", 0.1)))
+
+
+class ResilientCaller:
+    """
+    Run calls under a deadline with jittered retries and optional hedging
+
+    Each attempt is given the time left before the deadline as its timeout. Retries
+    sleep for a random "full jitter" backoff so that clients which failed together
+    do not retry together. When hedging is enabled, an attempt still running after
+    the configured percentile of recent latencies gets a duplicate; whichever
+    finishes first wins and the other is cancelled if it has not started, or
+    abandoned and its result discarded. Hedges draw on a token budget refilled by
+    every call, so they can never multiply the request volume.
+    """
+
+    def __init__(self, policy=None, name="llm_call", max_workers=16, max_samples=1000):
+        """
+        Args:
+            policy: CallPolicy (default: CallPolicy())
+            name: Span name the calls are recorded under in the metrics
+            max_workers: Threads available for concurrent attempts and hedges
+            max_samples: Recent attempt latencies kept for the hedge percentile
+        """
+        self.policy = policy or CallPolicy()
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._latencies = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self._hedge_tokens = self.policy.max_hedge_tokens if self.policy.hedge_percentile is not None else 0.0
+        self._rng = random.Random()
+
+    def hedge_delay(self):
+        """Seconds after which an attempt is hedged, or None while hedging is off or still warming up"""
+        if self.policy.hedge_percentile is None:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.policy.hedge_min_samples:
+                return None
+            return percentile(self._latencies, self.policy.hedge_percentile)
+
+    def _take_hedge_token(self):
+        with self._lock:
+            if self._hedge_tokens >= 1:
+                self._hedge_tokens -= 1
+                return True
+            return False
+
+    def _record_latency(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _attempt(self, func, deadline, span):
+        """Run one attempt (plus its hedge, if any) and return the first successful result"""
+        started = time.monotonic()
+        primary = self._pool.submit(func, deadline - started)
+        pending = {primary}
+
+        delay = self.hedge_delay()
+        if delay is not None and started + delay < deadline:
+            done, _ = wait(pending, timeout=delay)
+            if not done and self._take_hedge_token():
+                metrics.add("hedges")
+                span["hedged"] = True
+                hedge = self._pool.submit(func, deadline - time.monotonic())
+                pending.add(hedge)
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is not primary:
+                        metrics.add("hedge_wins")
+                        span["hedge_won"] = True
+                    self._record_latency(time.monotonic() - started)
+                    return future.result()
+                error = future.exception()
+
+        for other in pending:
+            other.cancel()
+        if error is not None:
+            raise error
+        raise DeadlineExceeded(f"{self.name} attempt did not finish before the deadline")
+
+    def call(self, func):
+        """
+        Call func(timeout) until it succeeds, the retries run out or the deadline passes
+
+        Args:
+            func: Callable taking the seconds left before the deadline, to use as its own timeout
+
+        Returns:
+            The first successful result
+        """
+        policy = self.policy
+        deadline = time.monotonic() + policy.deadline
+        with self._lock:
+            if policy.hedge_percentile is not None:
+                self._hedge_tokens = min(policy.max_hedge_tokens, self._hedge_tokens + policy.hedge_budget)
+
+        with metrics.span(self.name) as span:
+            for attempt in range(policy.retries + 1):
+                if time.monotonic() >= deadline:
+                    break
+                span["attempts"] = attempt + 1
+                try:
+                    return self._attempt(func, deadline, span)
+                except Exception as e:
+                    if attempt == policy.retries or not is_retryable(e):
+                        raise
+                    metrics.add("retries")
+                    sleep = self._rng.uniform(0, min(policy.max_backoff, policy.backoff * 2 ** attempt))
+                    time.sleep(max(0.0, min(sleep, deadline - time.monotonic())))
+            metrics.add("deadline_exceeded")
+            raise DeadlineExceeded(f"{self.name} did not succeed within {policy.deadline}s")
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared caller for the Claude Messages API calls of the generation modules
+llm_caller = ResilientCaller(CallPolicy.from_env())
+
+
+def create_message(client, params):
+    """client.messages.create(**params) under the shared deadline, retry and hedging policy"""
+    return llm_caller.call(lambda timeout: client.messages.create(**params, timeout=timeout))
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        call_id = payload.get("id")
+        with server.lock:
+            server.requests += 1
+            slow = server.rng.random() < server.slow_fraction or call_id in server.slow_ids
+            failing = server.rng.random() < server.error_rate or call_id in server.fail_ids
+            server.slow_ids.discard(call_id)
+            server.fail_ids.discard(call_id)
+        latency = server.slow_seconds if slow else server.fast_seconds
+        time.sleep(latency)
+
+        status = 503 if failing else 200
+        body = json.dumps({"error": "injected"} if failing else {"ok": True, "latency": latency}).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up on this request (timeout or lost hedge)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeLatencyServer:
+    """
+    Local HTTP server with injected latency and errors, for exercising ResilientCaller
+
+    Every POST sleeps for fast_seconds, or slow_seconds with probability
+    slow_fraction, and fails with 503 with probability error_rate. For
+    deterministic tests, a JSON body whose "id" is in slow_ids or fail_ids is
+    slow or failing the first time that id is seen, so its retry or hedge is not.
+    """
+
+    def __init__(self, fast_seconds=0.01, slow_seconds=0.5, slow_fraction=0.05, error_rate=0.0, seed=0,
+                 slow_ids=(), fail_ids=()):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.rng = random.Random(seed)
+        self.httpd.requests = 0
+        self.httpd.fast_seconds = fast_seconds
+        self.httpd.slow_seconds = slow_seconds
+        self.httpd.slow_fraction = slow_fraction
+        self.httpd.error_rate = error_rate
+        self.httpd.slow_ids = set(slow_ids)
+        self.httpd.fail_ids = set(fail_ids)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1/messages"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def post_json(url, payload, timeout):
+    """Minimal JSON POST used against the fake server; raises urllib's HTTPError for non-2xx"""
+    import urllib.request
+
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=max(timeout, 0.001)) as response:
+        return json.loads(response.read())
+
+
+def benchmark(calls=200, hedge_percentile=95, **server_options):
+    """
+    Compare latency percentiles with and without hedging against a FakeLatencyServer
+
+    Returns:
+        dict: per mode, p50/p99 in milliseconds, hedges sent and requests seen by the server
+    """
+    report = {}
+    for mode, hedge in (("plain", None), ("hedged", hedge_percentile)):
+        metrics.reset()
+        caller = ResilientCaller(CallPolicy(deadline=10, hedge_percentile=hedge), name="fake_call")
+        with FakeLatencyServer(**server_options) as server:
+            for _ in range(calls):
+                caller.call(lambda timeout: post_json(server.url, {"model": "fake"}, timeout))
+            requests_seen = server.requests
+        caller.close()
+        span = metrics.summary()["spans"]["fake_call"]
+        report[mode] = {"p50_ms": span["p50_ms"], "p99_ms": span["p99_ms"],
+                        "hedges": metrics.counters.get("hedges", 0), "server_requests": requests_seen}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure hedging's effect on tail latency against a local fake server")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per mode")
+    parser.add_argument("--hedge-percentile", type=float, default=95, help="Latency percentile that triggers a hedge")
+    parser.add_argument("--fast", type=float, default=0.01, help="Normal latency in seconds")
+    parser.add_argument("--slow", type=float, default=0.5, help="Injected slow latency in seconds")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="Fraction of requests that are slow")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.calls, args.hedge_percentile, fast_seconds=args.fast, slow_seconds=args.slow,
+                               slow_fraction=args.slow_fraction, error_rate=args.error_rate), indent=2))
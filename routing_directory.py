@@ -0,0 +1,225 @@
+import os
+import sys
+import mmap
+import json
+import struct
+import argparse
+from array import array
+from bisect import bisect_left
+
+from nacha_records import ENTRY_DETAIL_FIELDS, iter_records, field
+
+_UNLOADED = object()
+numpy = _UNLOADED  # imported on first bulk use, so commands that never need it start without it
+
+MAGIC = b"ABAIDX1\0"
+HEADER = struct.Struct("<8sQ")  # magic, number of routing numbers
+ABA_WEIGHTS = (3, 7, 1, 3, 7, 1, 3, 7, 1)
+NUMPY_MIN_BATCH = 8  # below this, building the numpy arrays costs more than checking one by one
+
+
+def parse_fedach_directory(path):
+    """
+    Yield the routing numbers listed in a FedACH participant directory
+
+    Accepts the fixed-width FedACHdir.txt layout (routing number in positions 1-9),
+    CSV exports with the routing number in the first column, or one routing number
+    per line. Lines that do not start with 9 digits are skipped.
+    """
+    with open(path, 'r', encoding='latin-1') as f:
+        for line in f:
+            routing = line[:9]
+            if routing.isdigit():
+                yield routing
+
+
+def build_index(source, index_path):
+    """
+    Write the sorted, de-duplicated routing numbers of a directory as a memory-mappable binary
+
+    Layout: 16-byte header (magic, count) followed by little-endian uint32 routing numbers.
+
+    Args:
+        source: FedACH directory file, or an iterable of routing number strings
+        index_path: Output path for the binary index
+
+    Returns:
+        int: number of routing numbers written
+    """
+    routings = parse_fedach_directory(source) if isinstance(source, str) else source
+    numbers = array("I", sorted({int(routing) for routing in routings}))
+    if sys.byteorder != "little":
+        numbers.byteswap()
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(numbers)))
+        numbers.tofile(f)
+    os.replace(tmp_path, index_path)
+    return len(numbers)
+
+
+def _load_numpy():
+    """numpy, or None when it is not installed"""
+    global numpy
+    if numpy is _UNLOADED:
+        try:
+            import numpy as module
+        except ImportError:  # numpy is optional; lookups fall back to bisect
+            module = None
+        numpy = module
+    return numpy
+
+
+def _digit_matrix(routings):
+    """Return the well-formed mask and an (n, 9) numpy digit array of the well-formed routing numbers"""
+    well_formed = [len(routing) == 9 and routing.isdigit() for routing in routings]
+    candidates = "".join(routing for routing, ok in zip(routings, well_formed) if ok)
+    digits = numpy.frombuffer(candidates.encode("ascii"), dtype=numpy.uint8).reshape(-1, 9) - 48
+    return numpy.array(well_formed, dtype=bool), digits.astype(numpy.int64)
+
+
+def aba_valid_many(routings):
+    """
+    Check the ABA checksum of many 9-digit routing numbers at once
+
+    Returns:
+        list: one bool per routing number; non-numeric or wrong-length values are invalid
+    """
+    routings = list(routings)
+    if len(routings) < NUMPY_MIN_BATCH or _load_numpy() is None:
+        return [len(routing) == 9 and routing.isdigit()
+                and sum(int(digit) * weight for digit, weight in zip(routing, ABA_WEIGHTS)) % 10 == 0
+                for routing in routings]
+
+    well_formed, digits = _digit_matrix(routings)
+    result = numpy.zeros(len(routings), dtype=bool)
+    result[well_formed] = (digits @ numpy.array(ABA_WEIGHTS, dtype=numpy.int64)) % 10 == 0
+    return result.tolist()
+
+
+class RoutingDirectory:
+    """
+    Read-only set of known routing numbers backed by a memory-mapped index
+
+    Opening an index maps it without parsing, so it is ready immediately; the OS
+    pages in only the parts that lookups touch. Single lookups use bisect on the
+    mapped array; bulk lookups of NUMPY_MIN_BATCH or more use numpy.searchsorted
+    when numpy is installed, importing it on first use.
+    """
+
+    def __init__(self, index_path):
+        """
+        Args:
+            index_path: Binary index written by build_index
+        """
+        self.index_path = index_path
+        with open(index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a routing directory index")
+        if len(self._mmap) != HEADER.size + 4 * self.count:
+            raise ValueError(f"{index_path} is truncated")
+
+        self._array = None  # numpy view of the index, made on the first bulk lookup
+        if sys.byteorder == "little":
+            self._numbers = memoryview(self._mmap)[HEADER.size:].cast("I")
+        else:  # big-endian hosts have to swap into memory for bisect
+            self._numbers = array("I", self._mmap[HEADER.size:])
+            self._numbers.byteswap()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, routing):
+        if not (len(routing) == 9 and routing.isdigit()):
+            return False
+        number = int(routing)
+        position = bisect_left(self._numbers, number)
+        return position < self.count and self._numbers[position] == number
+
+    def contains_many(self, routings):
+        """
+        Look up many routing numbers at once
+
+        Returns:
+            list: one bool per routing number
+        """
+        routings = list(routings)
+        if len(routings) < NUMPY_MIN_BATCH or _load_numpy() is None:
+            return [routing in self for routing in routings]
+
+        if self._array is None:
+            self._array = numpy.frombuffer(self._mmap, dtype="<u4", count=self.count, offset=HEADER.size)
+        well_formed, digits = _digit_matrix(routings)
+        found = numpy.zeros(len(routings), dtype=bool)
+        if self.count:
+            numbers = digits @ (10 ** numpy.arange(8, -1, -1, dtype=numpy.int64))
+            positions = numpy.minimum(numpy.searchsorted(self._array, numbers), self.count - 1)
+            found[well_formed] = self._array[positions] == numbers
+        return found.tolist()
+
+    def close(self):
+        self._numbers = self._array = None
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def check_routing_numbers(routings, directory=None):
+    """
+    Validate the check digit of many routing numbers, and their presence in a directory
+
+    Args:
+        routings: List of (line number, 9-digit routing number)
+        directory: Optional RoutingDirectory
+
+    Returns:
+        list: error dicts shaped like validate_nacha_file's, with codes CHECK_DIGIT and RECEIVING_DFI_UNKNOWN
+    """
+    numbers = [routing for _, routing in routings]
+    valid = aba_valid_many(numbers)
+    known = directory.contains_many(numbers) if directory is not None else [True] * len(numbers)
+
+    errors = []
+    for (line, routing), checksum_ok, listed in zip(routings, valid, known):
+        if not checksum_ok:
+            errors.append({"line": line, "code": "CHECK_DIGIT", "message": f"Routing number {routing} fails the ABA checksum"})
+        elif not listed:
+            errors.append({"line": line, "code": "RECEIVING_DFI_UNKNOWN",
+                           "message": f"Routing number {routing} is not in the routing directory"})
+    return errors
+
+
+def file_routing_numbers(path):
+    """Return (line number, routing number) for every entry detail record of a file"""
+    return [(number, field(record, ENTRY_DETAIL_FIELDS, "receiving_dfi_id") + field(record, ENTRY_DETAIL_FIELDS, "check_digit"))
+            for number, record in enumerate(iter_records(path), 1) if record[:1] == "6"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query a memory-mapped routing number directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Index a FedACH directory file")
+    build.add_argument("directory", help="FedACHdir.txt, CSV export, or one routing number per line")
+    build.add_argument("index", help="Output index path")
+
+    check = subparsers.add_parser("check", help="Check every entry's routing number in NACHA files")
+    check.add_argument("index", help="Index built with 'build'")
+    check.add_argument("files", nargs="+", help="NACHA files")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Indexed {build_index(args.directory, args.index)} routing numbers into {args.index}")
+    else:
+        with RoutingDirectory(args.index) as directory:
+            for path in args.files:
+                for error in check_routing_numbers(file_routing_numbers(path), directory):
+                    print(json.dumps({"file": path, **error}))
@@ -0,0 +1,44 @@
+import time
+from agent import Agent
+
+sample = "resources/nacha_customer_CT_PPD.txt"
+
+
+def test_tool_calls_run_concurrently_with_timeouts():
+  agent = Agent(api_key="test")
+  agent.tools["slow"] = (None, lambda params: time.sleep(1))
+  agent.tool_executor.timeouts["slow"] = 0.1
+  with open(sample, encoding="utf-8") as f:
+    content = f.read()
+
+  started = time.monotonic()
+  response = agent.handle_tool_calls({"tool_calls": [
+    {"id": "1", "name": "slow", "parameters": {}},
+    {"id": "2", "name": "nacha_validate", "parameters": {"file_content": content}},
+  ]})
+
+  assert time.monotonic() - started < 0.5
+  slow, validate = response["tool_results"]
+  assert slow["result"]["status"] == "error" and "timed out" in slow["result"]["message"]
+  assert validate["result"]["validation_status"] == "valid"
+
+
+def test_nacha_tools_are_registered():
+  agent = Agent(api_key="test")
+  request = agent.build_mcp_request("hello")
+  assert [tool["name"] for tool in request["tools"]] == ["nacha_generate", "nacha_validate", "nacha_repair"]
+  agent.process_user_input("generate a payroll file")
+  assert agent.state["tools_used"] == {"nacha_generate": 1}
+
+
+def test_memory_is_bounded_and_compacted():
+  agent = Agent(api_key="test")
+  for i in range(100):
+    agent.add_to_memory({"type": "interaction", "user_input": f"question {i}", "agent_response": "ok"})
+
+  memory = agent.state["memory"]
+  assert len(memory) == 20
+  assert memory.summary["compacted_items"] == 80
+  content = agent.build_mcp_request("hello")["resources"][0]["content"]
+  assert content is memory.resource_content()  # cached until memory changes
+  assert '"question 99"' in content and '"question 0"' not in content
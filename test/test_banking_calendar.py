@@ -0,0 +1,29 @@
+from datetime import date, datetime, timezone
+
+from banking_calendar import default_calendar, federal_holidays
+
+morning = datetime(2025, 12, 24, 9, 0)
+evening = datetime(2025, 12, 24, 17, 0)
+
+
+def test_observed_holidays():
+  assert date(2022, 12, 26) in federal_holidays(2022)  # Christmas on a Sunday moves to Monday
+  assert date(2026, 7, 3) not in federal_holidays(2026)  # Saturday holidays are not observed
+  assert date(2025, 6, 19) in federal_holidays(2025) and date(2019, 6, 19) not in federal_holidays(2019)
+  assert not default_calendar.is_business_day("251127") and default_calendar.is_business_day("251128")
+
+
+def test_effective_dates_roll_to_banking_days():
+  assert default_calendar.resolve(None, morning) == date(2025, 12, 24)
+  assert default_calendar.resolve(None, evening) == date(2025, 12, 26)  # after the same-day cutoff
+  assert default_calendar.resolve(None, morning, same_day=False) == date(2025, 12, 26)
+  assert default_calendar.resolve("210512", morning) == date(2025, 12, 24)  # past dates settle on the earliest day
+  assert default_calendar.resolve("2025-12-27", morning) == date(2025, 12, 29)
+  assert default_calendar.resolve_many(["251225", "", "260101", "251224"], evening) == \
+    ["251226", "251226", "260102", "251226"]
+
+
+def test_cutoff_is_eastern_time():
+  # 18:00 UTC is 13:00 in New York, before the 16:45 cutoff; naive times are taken as Eastern
+  assert default_calendar.resolve(None, datetime(2025, 12, 24, 18, 0, tzinfo=timezone.utc)) == date(2025, 12, 24)
+  assert default_calendar.resolve(None, datetime(2025, 12, 24, 18, 0)) == date(2025, 12, 26)
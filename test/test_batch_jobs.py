@@ -0,0 +1,74 @@
+import pytest
+from batch_jobs import BatchJob, LocalBatchesStub
+from nacha_with_advanced_prompt import create_sample_iat_config
+
+with open("resources/nacha_customer_CT_PPD.txt", encoding="utf-8") as f:
+  sample = f.read()
+
+
+def test_interrupted_job_resumes_without_resubmitting(tmp_path):
+  stub = LocalBatchesStub(lambda params: "```\n" + sample + "\n```", polls_until_ended=2, fail_custom_ids=["file-2"])
+  job = BatchJob(str(tmp_path), stub)
+  for i in range(3):
+    job.add_config_request(f"file-{i}", create_sample_iat_config())
+  job.submit()
+  assert job.poll(interval=0, timeout=0) is False  # "interrupted" while the batch is still running
+
+  resumed = BatchJob(str(tmp_path), stub)
+  assert resumed.add_config_request("file-0", create_sample_iat_config()) is False
+  assert resumed.run(interval=0) is True
+  assert stub.create_calls == 1
+  assert resumed.summary() == {"succeeded_valid": 2, "errored": 1}
+  assert (tmp_path / "outputs" / "file-0.txt").read_text(encoding="utf-8") == sample
+
+  assert resumed.retry_failed() == 1
+  resumed.run(interval=0)
+  assert stub.create_calls == 2
+  assert resumed.summary() == {"succeeded_valid": 2, "errored": 1}
+
+
+def test_submission_interrupted_after_create_is_recovered(tmp_path):
+  stub = LocalBatchesStub(lambda params: sample)
+  create = stub.create
+
+  def create_then_crash(requests):
+    create(requests)
+    raise KeyboardInterrupt  # the batch exists, but its ID was never recorded
+
+  stub.create = create_then_crash
+  job = BatchJob(str(tmp_path), stub)
+  job.add_config_request("file-0", create_sample_iat_config())
+  with pytest.raises(KeyboardInterrupt):
+    job.submit()
+
+  stub.create = create
+  resumed = BatchJob(str(tmp_path), stub)
+  assert resumed.run(interval=0) is True
+  assert stub.create_calls == 1
+  assert resumed.summary() == {"succeeded_valid": 1}
+
+
+def test_interrupted_submission_does_not_claim_another_jobs_batch(tmp_path):
+  stub = LocalBatchesStub(lambda params: sample)
+  create = stub.create
+
+  def crash(requests):
+    raise KeyboardInterrupt  # interrupted before the batch was created
+
+  stub.create = crash
+  job = BatchJob(str(tmp_path / "mine"), stub)
+  job.add_config_request("file-0", create_sample_iat_config())
+  with pytest.raises(KeyboardInterrupt):
+    job.submit()
+  assert job.summary() == {"submitting": 1}
+
+  stub.create = create
+  other = BatchJob(str(tmp_path / "other"), stub)
+  other.add_config_request("other-0", create_sample_iat_config())
+  other.submit()  # same size, created inside the recovery window
+
+  resumed = BatchJob(str(tmp_path / "mine"), stub)
+  assert resumed.run(interval=0) is True
+  assert stub.create_calls == 2
+  assert resumed.summary() == {"succeeded_valid": 1}
+  assert {request["batch_id"] for request in resumed.state["requests"].values()} != set(other.state["batches"])
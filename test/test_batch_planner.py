@@ -0,0 +1,29 @@
+from datetime import datetime
+from batch_planner import BatchPlanner
+from nacha_file_validation import validate_nacha_file
+
+rows = [
+  {"company_id": "2222222222", "effective_date": "2025-05-02", "routing_number": "121000248", "account_number": "1", "amount": 100, "transaction_type": "credit"},
+  {"company_id": "1111111111", "effective_date": "250502", "routing_number": "071000505", "account_number": "2", "amount": 200, "transaction_type": "debit"},
+  {"company_id": "2222222222", "effective_date": "250502", "routing_number": "121000248", "account_number": "3", "amount": 300, "transaction_type": "debit"},
+  {"company_id": "1111111111", "sec_code": "CCD", "effective_date": "250502", "routing_number": "071000505", "account_number": "4", "amount": 400},
+  {"company_id": "2222222222", "effective_date": "250501", "routing_number": "121000248", "account_number": "5", "amount": 500},
+]
+
+
+def test_rows_are_grouped_across_spilled_runs(tmp_path):
+  out = str(tmp_path / "planned.ach")
+  with BatchPlanner(run_rows=2, work_dir=str(tmp_path), now=datetime(2025, 5, 1, 9, 0)) as planner:
+    planner.add_many(rows)
+    assert len(planner._runs) == 2
+    paths = planner.write(out, max_file_entries=4, now=datetime(2025, 5, 1, 9, 0))
+
+  assert paths == [out, str(tmp_path / "planned_002.ach")]
+  files = [open(path, encoding="utf-8").read() for path in paths]
+  assert all(validate_nacha_file(content) == ("valid", []) for content in files)
+  headers = [line for content in files for line in content.splitlines() if line.startswith("5")]
+  # (company, SEC, date) order; the last batch continues in the second file
+  assert [(h[1:4], h[40:50], h[50:53], h[69:75]) for h in headers] == [
+    ("220", "1111111111", "CCD", "250502"), ("225", "1111111111", "PPD", "250502"),
+    ("220", "2222222222", "PPD", "250501"), ("200", "2222222222", "PPD", "250502"),
+    ("200", "2222222222", "PPD", "250502")]
@@ -0,0 +1,23 @@
+import os
+import shutil
+import bulk_validate
+from bulk_validate import bulk_validate as validate_tree, write_report
+
+
+def test_bulk_validation_is_cached_per_rules_version(tmp_path, monkeypatch):
+  os.makedirs(tmp_path / "runs")
+  shutil.copy("resources/nacha_customer_CT_PPD.txt", tmp_path / "good.txt")
+  shutil.copy("2025-04-29_12-49-39.984_NACHA_FILE_68822326882232.txt", tmp_path / "runs" / "bad.txt")
+
+  summary, _ = validate_tree(str(tmp_path), workers=1)
+  assert (summary["files"], summary["valid"], summary["validated"]) == (2, 1, 2)
+  assert summary["error_classes"]["BATCH_ENTRY_HASH"] == {"errors": 1, "files": 1}
+
+  os.utime(tmp_path / "good.txt")  # touched but unchanged: answered from the content hash
+  assert validate_tree(str(tmp_path), workers=1)[0]["cached"] == 2
+
+  monkeypatch.setattr(bulk_validate, "RULES_VERSION", "test")
+  summary, results = validate_tree(str(tmp_path), workers=1)
+  assert summary["validated"] == 2
+  write_report(summary, results, str(tmp_path / "report.csv"))
+  assert "BATCH_ENTRY_HASH,1,1" in (tmp_path / "report.csv").read_text()
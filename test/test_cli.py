@@ -0,0 +1,31 @@
+import sys
+import subprocess
+import nacha
+
+sample = "resources/nacha_customer_CT_PPD.txt"
+
+
+def test_validate_and_inspect(capsys):
+  assert nacha.main(["validate", sample]) == 0
+  assert nacha.main(["inspect", sample]) == 0
+  assert '"batch_count": 1' in capsys.readouterr().out
+
+
+def test_repair_reports_wrong_check_digits_without_rewriting_them(tmp_path, capsys):
+  with open(sample, encoding="utf-8") as f:
+    lines = f.read().splitlines()
+  entry = next(number for number, line in enumerate(lines) if line.startswith("6"))
+  lines[entry] = lines[entry][:11] + str((int(lines[entry][11]) + 1) % 10) + lines[entry][12:]
+  source, output = tmp_path / "bad.ach", tmp_path / "fixed.ach"
+  source.write_text("\n".join(lines), encoding="utf-8")
+
+  assert nacha.main(["repair", str(source), "--output", str(output)]) == 1
+  assert output.read_text(encoding="utf-8").splitlines()[entry] == lines[entry]
+  assert f"Not repaired: Line {entry + 1}: routing number" in capsys.readouterr().err
+
+
+def test_local_commands_do_not_import_llm_ui_or_numpy_libraries():
+  code = ("import sys, nacha; nacha.main(['validate', %r]); "
+          "print(sorted(m for m in ('anthropic', 'gradio', 'requests', 'dotenv', 'numpy') if m in sys.modules))") % sample
+  result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+  assert result.stdout.strip().endswith("[]")
@@ -0,0 +1,31 @@
+from datetime import datetime
+from nacha_compiler import compile_to_string
+from nacha_file_validation import validate_nacha_file
+from nacha_with_advanced_prompt import create_sample_iat_config
+
+now = datetime(2025, 5, 1, 9, 30)
+
+
+def test_sample_iat_config_compiles_to_valid_file():
+  content = compile_to_string(create_sample_iat_config(), now=now)
+  lines = content.splitlines()
+
+  assert validate_nacha_file(content) == ("valid", [])
+  assert content == compile_to_string(create_sample_iat_config(), now=now)
+  iat_entry = lines[2]
+  assert iat_entry[12:16] == "0007" and iat_entry[78] == "1"
+  assert [line[1:3] for line in lines[3:10]] == ["10", "11", "12", "13", "14", "15", "16"]
+  assert all(line[87:94] == iat_entry[87:94] for line in lines[3:10])
+  assert lines[1][38:40] == "DE" and lines[1][63:69] == "USDEUR"
+
+
+def test_entries_can_be_streamed():
+  config = create_sample_iat_config()
+  config["batches"] = [config["batches"][1]]
+  entries = config["batches"][0]["entries"] * 500
+  config["batches"][0]["entries"] = (entry for entry in entries)
+  content = compile_to_string(config, now=now)
+
+  assert validate_nacha_file(content)[0] == "valid"
+  file_control = next(line for line in content.splitlines() if line.startswith("9"))
+  assert file_control[13:21] == "00002000" and file_control[31:43] == "000187500000"
@@ -0,0 +1,46 @@
+import io
+import json
+from nacha_diff import reconcile
+
+reference = "resources/nacha_customer_CT_PPD.txt"
+
+
+def test_reconcile_identical_files():
+  summary = reconcile(reference, reference)
+  assert summary["unchanged"] == 2
+  assert summary["added"] == summary["removed"] == summary["changed"] == 0
+  assert all(delta == 0 for delta in summary["controls"]["delta"].values())
+
+
+def test_reconcile_reports_changes(tmp_path):
+  with open(reference, encoding="utf-8") as f:
+    lines = f.read().split("\n")
+  # change the amount of the first entry and drop the second one
+  lines[2] = lines[2][:29] + "0000009999" + lines[2][39:]
+  del lines[3]
+  changed = tmp_path / "changed.txt"
+  changed.write_text("\n".join(lines), encoding="utf-8")
+
+  report = io.StringIO()
+  summary = reconcile(reference, str(changed), report, partition_entries=1)
+  events = [json.loads(line) for line in report.getvalue().splitlines()]
+
+  assert summary["changed"] == 1 and summary["removed"] == 1 and summary["added"] == 0
+  assert {e["status"] for e in events} == {"changed", "removed"}
+  change = next(e for e in events if e["status"] == "changed")
+  assert change["fields"] == {"amount": ["0000007104", "0000009999"]}
+  assert summary["controls"]["delta"]["entry_addenda_count"] == -1
+
+
+def test_duplicate_fallback_keys_pair_up_in_order(tmp_path):
+  with open(reference, encoding="utf-8") as f:
+    lines = f.read().split("\n")
+  untraced = lines[2][:79] + "0" * 15  # no trace number, so entries join on routing, account and amount
+
+  def write(name, copies):
+    path = tmp_path / name
+    path.write_text("\n".join(lines[:2] + [untraced] * copies + lines[4:]), encoding="utf-8")
+    return str(path)
+
+  summary = reconcile(write("a.txt", 300), write("b.txt", 301))
+  assert summary["unchanged"] == 300 and summary["added"] == 1 and summary["removed"] == 0
@@ -0,0 +1,29 @@
+import os
+import json
+import pytest
+from env_profiles import load_profile, resolve_env_values, generator_kwargs
+
+
+def test_selections_are_resolved_locally_and_reproducibly():
+  values = resolve_env_values(seed=7)
+  assert values == resolve_env_values(seed=7)
+  assert set(values) == {"Immediate Destination", "Immediate Origin", "Company Name"}
+  assert generator_kwargs(values)["immediate_destination"] == values["Immediate Destination"]
+
+
+def test_profile_is_cached_until_the_file_changes(tmp_path):
+  path = tmp_path / "env.json"
+  path.write_text(json.dumps({"FileHeader": {"Immediate Origin": {"possible_values": ["1"], "selection_type": "fixed"}}}))
+  first = load_profile(str(path))
+  assert load_profile(str(path)) is first
+
+  path.write_text(json.dumps({"FileHeader": {"Immediate Origin": {"possible_values": ["22"], "selection_type": "fixed"}}}))
+  os.utime(path, ns=(0, 10**9))
+  assert load_profile(str(path)).resolve() == {"Immediate Origin": "22"}
+
+
+def test_invalid_profile_is_rejected(tmp_path):
+  path = tmp_path / "env.json"
+  path.write_text(json.dumps({"FileHeader": {"Immediate Origin": {"possible_values": [], "selection_type": "random"}}}))
+  with pytest.raises(ValueError):
+    load_profile(str(path))
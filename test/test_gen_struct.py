@@ -0,0 +1,39 @@
+import dataclasses
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nacha_file_gen_struct import NachaGenerator, benchmark
+from nacha_file_validation import validate_nacha_file
+
+now = datetime(2025, 5, 1, 9, 30)
+
+
+def transactions(count, amount):
+  return [{"routing_number": "071000505", "account_number": str(number), "amount": amount + number,
+           "transaction_type": "debit" if number % 2 else "credit", "name": f"PAYEE {number}"}
+          for number in range(count)]
+
+
+def test_generated_file_is_valid():
+  content = NachaGenerator(company_name="ACME CORP").generate_file(transactions(12, 100), now)
+  lines = content.splitlines()
+
+  assert validate_nacha_file(content) == ("valid", [])
+  assert len(lines) == 20 and lines[-1] == "9" * 94
+  assert lines[2][79:94] == "071000500000001" and lines[13][79:94] == "071000500000012"
+
+
+def test_shared_generator_is_reentrant():
+  generator = NachaGenerator()
+  requests = [transactions(1 + number % 7, 1000 * number) for number in range(200)]
+  expected = [generator.generate_file(request, now) for request in requests]
+
+  with ThreadPoolExecutor(max_workers=8) as pool:
+    results = list(pool.map(lambda request: generator.generate_file(request, now), requests))
+
+  assert results == expected
+  with pytest.raises(dataclasses.FrozenInstanceError):
+    generator.originator.company_id = "9999999999"
+  assert benchmark(threads=4, files=40, entries=5)["mismatches"] == 0
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+from datetime import datetime
+from hybrid_generation import generate_hybrid, spec_from_file, build_hybrid_params
+from nacha_file_validation import validate_nacha_file
+from output_store import OutputStore
+from env_profiles import resolve_env_values, compact_prompt_text
+
+original = "resources/nacha_customer_CT_PPD.txt"
+now = datetime(2025, 5, 1, 9, 30)
+
+
+def test_structured_answer_renders_valid_file():
+  spec = spec_from_file(original)
+  message = SimpleNamespace(content=[SimpleNamespace(type="tool_use", name="emit_nacha_spec", input=spec)],
+                            usage={"input_tokens": 300, "output_tokens": 120})
+  client = SimpleNamespace(messages=SimpleNamespace(create=lambda **params: message))
+
+  content = generate_hybrid("two payroll credits", client=client, env_file=None, now=now)
+  assert validate_nacha_file(content) == ("valid", [])
+  # the file's 2021 effective date is rolled forward to the earliest banking day
+  rolled = [{**batch, "effective_date": "250501"} for batch in spec["batches"]]
+  assert spec_from_file(content.splitlines()) == {**spec, "batches": rolled}
+  assert build_hybrid_params("x")["tool_choice"]["name"] == "emit_nacha_spec"
+
+
+def test_stored_status_comes_from_validation(tmp_path):
+  spec = spec_from_file(original)
+  spec["batches"][0]["entries"][0]["routing_number"] = "121000249"  # wrong check digit
+  message = SimpleNamespace(content=[SimpleNamespace(type="tool_use", name="emit_nacha_spec", input=spec)], usage=None)
+  client = SimpleNamespace(messages=SimpleNamespace(create=lambda **params: message))
+  store = OutputStore(str(tmp_path))
+
+  generate_hybrid("two payroll credits", client=client, env_file=None, store=store, now=now)
+  assert store.find(validation_status="valid") == []
+  assert len(store.find(validation_status="invalid")) == 1
+
+
+def test_store_records_the_originator_values_and_seed(tmp_path):
+  message = SimpleNamespace(content=[SimpleNamespace(type="tool_use", name="emit_nacha_spec",
+                                                     input=spec_from_file(original))], usage=None)
+  client = SimpleNamespace(messages=SimpleNamespace(create=lambda **params: message))
+  store = OutputStore(str(tmp_path))
+
+  content = generate_hybrid("two payroll credits", client=client, seed=7, store=store, now=now)
+  values = resolve_env_values(seed=7)
+  row, = store.find(seed=7)
+  assert row["env_values"] == compact_prompt_text(values)
+  assert content.splitlines()[0][4:13] == values["Immediate Destination"]
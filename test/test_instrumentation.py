@@ -0,0 +1,29 @@
+import json
+from instrumentation import Metrics, summarize_jsonl
+
+
+def test_request_spans_and_exports(tmp_path):
+  jsonl = tmp_path / "metrics.jsonl"
+  metrics = Metrics(jsonl_path=str(jsonl))
+
+  for _ in range(3):
+    with metrics.request("generate", model="test-model"):
+      with metrics.span("api_call"):
+        metrics.record_usage({"input_tokens": 100, "output_tokens": 40, "cache_read_input_tokens": 80})
+      with metrics.span("file_write") as span:
+        span["bytes"] = 940
+
+  records = [json.loads(line) for line in jsonl.read_text().splitlines()]
+  assert len(records) == 3
+  assert [s["name"] for s in records[0]["spans"]] == ["api_call", "file_write", "generate"]
+  assert records[0]["counters"] == {"input_tokens": 100, "output_tokens": 40, "cache_read_tokens": 80,
+                                    "cache_write_tokens": 0, "cache_hits": 1}
+
+  summary = metrics.summary()
+  assert summary["spans"]["api_call"]["count"] == 3
+  assert summary["output_tokens_per_request"] == 40
+  assert summarize_jsonl(str(jsonl))["output_tokens_per_request"] == 40
+
+  text = metrics.prometheus_text()
+  assert 'nacha_span_seconds_count{span="generate"} 3' in text
+  assert "nacha_output_tokens_total 120" in text
@@ -0,0 +1,41 @@
+import sys
+import io
+from datetime import datetime
+from nacha_merge import merge_files
+from nacha_file_validation import validate_nacha_file
+
+ppd = "resources/nacha_customer_CT_PPD.txt"
+# the sample's batch control declares a wrong entry hash
+bad_hash = "2025-04-29_12-49-39.984_NACHA_FILE_68822326882232.txt"
+
+
+def test_merge_renumbers_batches_and_traces():
+  out = io.StringIO()
+  stats = merge_files([ppd, bad_hash, ppd], out, order="effective_date", resequence_traces=True,
+                      recompute_controls=True, now=datetime(2025, 5, 1, 8, 0))
+  content = out.getvalue()
+  lines = content.splitlines()
+
+  assert validate_nacha_file(content) == ("valid", [])
+  assert stats["batches"] == 3 and stats["entry_addenda_count"] == 5
+  assert [line[87:94] for line in lines if line[0] in "58"] == ["0000001"] * 2 + ["0000002"] * 2 + ["0000003"] * 2
+  assert [line[87:94] for line in lines if line[0] == "6"] == ["0000001", "0000002", "0000003", "0000004", "0000005"]
+  assert lines[0][23:33] == "2505010800"
+
+
+def test_merge_copies_declared_controls_by_default():
+  out = io.StringIO()
+  merge_files([bad_hash], out)
+  codes = {error["code"] for error in validate_nacha_file(out.getvalue())[1]}
+  assert "BATCH_ENTRY_HASH" in codes
+
+
+def test_destination_warning_stays_out_of_stdout_output(tmp_path, capsys):
+  other = tmp_path / "other.txt"
+  content = open(ppd, encoding="utf-8").read()
+  other.write_text(content[:3] + " 121000248" + content[13:], encoding="utf-8")
+  merge_files([ppd, str(other)], sys.stdout, now=datetime(2025, 5, 1, 8, 0))
+  captured = capsys.readouterr()
+
+  assert validate_nacha_file(captured.out) == ("valid", [])
+  assert "different immediate destination" in captured.err
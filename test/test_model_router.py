@@ -0,0 +1,40 @@
+import ast
+from types import SimpleNamespace
+from model_router import ModelRouter, estimate_records, summarize_log, SMALL_MODEL, LARGE_MODEL
+from nacha_with_advanced_prompt import create_sample_iat_config
+
+
+def test_max_tokens_follow_file_size_and_iat_stays_large(tmp_path):
+  log = str(tmp_path / "routing.jsonl")
+  router = ModelRouter(log_path=log)
+  assert estimate_records(2) == 10 and estimate_records(100, 3) == 110
+
+  small = router.route_prompt("Generate 5 payroll credits")
+  large = router.route_prompt("Generate 2000 payroll credits in 4 batches")
+  assert small["model"] == large["model"] == LARGE_MODEL
+  assert small["max_tokens"] < 2000 < 10000 < large["max_tokens"]
+
+  assert router.route_config(create_sample_iat_config())["model"] == LARGE_MODEL
+  edit = router.route_prompt("Fix the entry hash", ["resources/nacha_customer_CT_PPD.txt"])
+  assert (edit["model"], edit["reason"], edit["entries"]) == (SMALL_MODEL, "simple_edit", 2)
+  generate = router.route_prompt("Generate a file with 3 credits and update the control record",
+                                 ["resources/nacha_customer_CT_PPD.txt"])
+  assert (generate["model"], generate["reason"]) == (LARGE_MODEL, "generation")
+  assert router.route_prompt(" Please change the amounts to 100", ["resources/nacha_customer_CT_PPD.txt"])["reason"] == "simple_edit"
+  assert router.route(5000, output="spec")["reason"] == "structured_output_too_large"
+
+  router.record_outcome(edit, SimpleNamespace(usage={"output_tokens": 400}, stop_reason="end_turn"))
+  assert summarize_log(log)[SMALL_MODEL]["outcomes"] == 1
+
+
+def test_per_batch_counts_multiply_and_unknown_sizes_keep_the_old_budget():
+  # ui.py imports gradio, so read its default prompt from the source
+  tree = ast.parse(open("ui.py", encoding="utf-8").read())
+  ui_prompt = next(node.value.value for node in tree.body
+                   if isinstance(node, ast.Assign) and node.targets[0].id == "input_prompt")
+  router = ModelRouter()
+
+  decision = router.route_prompt(ui_prompt)
+  assert (decision["entries"], decision["batches"]) == (4, 2)
+  assert decision["max_tokens"] >= 1.25 * 760  # a 10-record file is about 760 tokens
+  assert router.route_prompt("What is an entry hash?")["max_tokens"] >= 2000
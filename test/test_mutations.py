@@ -0,0 +1,19 @@
+import pytest
+from nacha_mutations import MutationEngine
+from nacha_file_validation import validate_nacha_file
+
+sample = "resources/nacha_customer_CT_PPD.txt"
+
+
+def test_labels_match_the_validator():
+  with open(sample, 'rb') as f:
+    engine = MutationEngine(f.read(), seed=11)
+  for content, names, labels in engine.corpus(500, max_mutations=3):
+    status, errors = validate_nacha_file(content.decode())
+    assert status == "invalid", names
+    assert sorted({(error["line"], error["code"]) for error in errors}) == [(label["line"], label["code"]) for label in labels], names
+
+
+def test_base_must_be_valid():
+  with pytest.raises(ValueError):
+    MutationEngine(open("2025-04-29_12-49-39.984_NACHA_FILE_68822326882232.txt", 'rb').read())
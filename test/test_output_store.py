@@ -0,0 +1,61 @@
+import os
+import sqlite3
+from output_store import OutputStore
+
+with open("resources/nacha_customer_CT_PPD.txt", encoding="utf-8") as f:
+  sample = f.read()
+
+
+def test_identical_outputs_are_stored_once(tmp_path):
+  store = OutputStore(str(tmp_path))
+  first = store.put(sample, prompt="two payments", env="dev", model="model-a", validation_status="valid")
+  second = store.put_stream(iter([sample[:100], sample[100:]]), prompt="other prompt", env="uat", model="model-b")
+
+  assert first == second
+  objects = [name for _, _, names in os.walk(tmp_path / "objects") for name in names]
+  assert objects == [first]
+  assert store.get(first) == sample
+
+
+def test_lookups_by_metadata(tmp_path):
+  store = OutputStore(str(tmp_path))
+  content_hash = store.put(sample, prompt="two payments", env="dev", model="model-a", validation_status="valid")
+  store.put(sample.replace("ROZA", "ROSA"), prompt="two payments", env="uat", model="model-a", validation_status="invalid")
+
+  assert len(store.find(prompt="two payments")) == 2
+  rows = store.find(model="model-a", validation_status="valid")
+  assert [row["content_hash"] for row in rows] == [content_hash]
+  assert rows[0]["total_credit"] == 14309 and rows[0]["entry_addenda_count"] == 2
+  assert store.find(env="prod") == []
+
+
+def test_lookups_by_totals(tmp_path):
+  store = OutputStore(str(tmp_path))
+  content_hash = store.put(sample, prompt="two payments")
+
+  assert [row["content_hash"] for row in store.find(credit_range=(14000, 15000))] == [content_hash]
+  assert store.find(entry_addenda_count=2, debit_range=(0, 0))[0]["content_hash"] == content_hash
+  assert store.find(credit_range=(None, 14308)) == [] and store.find(entry_addenda_count=3) == []
+
+
+def test_lookups_by_environment_values_and_seed(tmp_path):
+  store = OutputStore(str(tmp_path))
+  first = store.put(sample, env="dev.json", env_values='{"Company Name":"ACME"}', seed=1)
+  store.put(sample.replace("ROZA", "ROSA"), env="dev.json", env_values='{"Company Name":"OTHER"}', seed=2)
+
+  assert len(store.find(env="dev.json")) == 2
+  rows = store.find(env_values='{"Company Name":"ACME"}')
+  assert [(row["content_hash"], row["seed"]) for row in rows] == [(first, 1)]
+  assert store.find(seed=2)[0]["env_values"] == '{"Company Name":"OTHER"}'
+
+
+def test_older_index_gains_the_new_columns(tmp_path):
+  db = sqlite3.connect(str(tmp_path / "index.sqlite"))
+  db.execute("CREATE TABLE generations (id INTEGER PRIMARY KEY AUTOINCREMENT, content_hash TEXT NOT NULL, prompt TEXT,"
+             " prompt_hash TEXT, env TEXT, model TEXT, validation_status TEXT, created_at REAL NOT NULL)")
+  db.commit()
+  db.close()
+
+  store = OutputStore(str(tmp_path))
+  store.put(sample, env_values="{}", seed=3)
+  assert store.find(seed=3)[0]["env_values"] == "{}"
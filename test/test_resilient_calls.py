@@ -0,0 +1,31 @@
+import time
+import pytest
+from resilient_calls import ResilientCaller, CallPolicy, FakeLatencyServer, DeadlineExceeded, post_json
+from instrumentation import metrics
+
+
+def test_slow_attempt_is_hedged_and_failures_retried():
+  caller = ResilientCaller(CallPolicy(deadline=5, backoff=0.01, hedge_percentile=90, hedge_min_samples=5, hedge_budget=0.5))
+  with FakeLatencyServer(fast_seconds=0.005, slow_seconds=2, slow_fraction=0, slow_ids=["slow"], fail_ids=["flaky"]) as server:
+    for i in range(10):
+      caller.call(lambda timeout: post_json(server.url, {"id": i}, timeout))
+    hedges = metrics.counters.get("hedges", 0)
+    started = time.monotonic()
+    assert caller.call(lambda timeout: post_json(server.url, {"id": "slow"}, timeout))["ok"]
+    assert time.monotonic() - started < 1
+    assert metrics.counters.get("hedges", 0) == hedges + 1
+
+    retries = metrics.counters.get("retries", 0)
+    assert caller.call(lambda timeout: post_json(server.url, {"id": "flaky"}, timeout))["ok"]
+    assert metrics.counters.get("retries", 0) == retries + 1
+  caller.close()
+
+
+def test_deadline_covers_all_attempts():
+  caller = ResilientCaller(CallPolicy(deadline=0.3, retries=5, backoff=0.01))
+  with FakeLatencyServer(fast_seconds=1, slow_fraction=0) as server:
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded, match="did not succeed within 0.3s"):
+      caller.call(lambda timeout: post_json(server.url, {}, timeout))
+    assert time.monotonic() - started < 0.8
+  caller.close()
@@ -0,0 +1,38 @@
+import os
+import pytest
+from datetime import datetime
+from resumable_generation import compile_resumable
+from nacha_file_validation import validate_nacha_file
+
+now = datetime(2025, 5, 1, 9, 30)
+
+
+def make_config(fail_at=None):
+  def batch(number):
+    def build():
+      if number == fail_at:
+        raise ConnectionError("model call failed")
+      entries = [{"transaction_code": "22", "receiving_dfi_id": "07100050", "check_digit": "5", "dfi_account_number": f"{number}{i}",
+                  "amount": 100 * i + number, "individual_name": f"PAYEE {i}"} for i in range(1, 4)]
+      return {"batch_header": {"service_class_code": "220", "company_name": "ACME", "company_identification": "1234567890",
+                               "standard_entry_class_code": "PPD", "company_entry_description": "PAYROLL"}, "entries": entries}
+    return build
+  return {"file_header": {"immediate_destination": "071000505", "immediate_origin": "1234567890"},
+          "batches": [batch(number) for number in range(1, 6)]}
+
+
+def test_resumed_run_is_byte_identical(tmp_path, capsys):
+  expected = tmp_path / "expected.ach"
+  compile_resumable(make_config(), str(expected), now=now)
+
+  out = tmp_path / "out.ach"
+  with pytest.raises(ConnectionError):
+    compile_resumable(make_config(fail_at=4), str(out), now=now)
+  assert os.path.exists(str(out) + ".checkpoint")
+
+  stats = compile_resumable(make_config(), str(out), now=datetime(2030, 1, 1))
+  assert stats["resumed_from"] == 3 and stats["entries"] == 15
+  assert capsys.readouterr().out == ""  # callers may be writing the file to stdout
+  assert out.read_bytes() == expected.read_bytes()
+  assert not os.path.exists(str(out) + ".checkpoint")
+  assert validate_nacha_file(out.read_text())[0] == "valid"
@@ -0,0 +1,32 @@
+import io
+from nacha_returns import synthesize, select_by_field
+
+original = "resources/nacha_customer_CT_PPD.txt"
+
+
+def test_return_file_matches_original():
+  out = io.StringIO()
+  stats = synthesize(original, out, kind="return", rule=lambda fields: "R03")
+  lines = out.getvalue().splitlines()
+
+  assert stats == {"entries_read": 2, "entries_returned": 2}
+  assert all(len(line) == 94 for line in lines) and len(lines) % 10 == 0
+  addenda = [line for line in lines if line.startswith("7")]
+  assert [a[3:6] for a in addenda] == ["R03", "R03"]
+  assert [a[6:21] for a in addenda] == ["121057260000081", "121057260000082"]
+  # returned credits keep their amounts: 71.04 + 72.05
+  file_control = next(line for line in lines if line.startswith("9") and line.strip("9"))
+  assert file_control[13:21] == "00000004" and file_control[43:55] == "000000014309"
+
+
+def test_noc_file_picks_entries_by_rule():
+  out = io.StringIO()
+  stats = synthesize(original, out, kind="noc", rule=select_by_field(amount="0000007205"), codes=["C01"])
+  lines = out.getvalue().splitlines()
+
+  assert stats["entries_returned"] == 1
+  assert lines[1][50:53] == "COR"
+  entry = next(line for line in lines if line.startswith("6"))
+  assert entry[29:39] == "0000000000"
+  noc = next(line for line in lines if line.startswith("7"))
+  assert noc[1:6] == "98C01" and noc[35:64].strip() == "1300001007"
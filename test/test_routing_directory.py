@@ -0,0 +1,61 @@
+import pytest
+import routing_directory
+from routing_directory import RoutingDirectory, build_index, aba_valid_many
+from nacha_file_validation import validate_nacha_file
+
+with open("resources/nacha_customer_CT_PPD.txt", encoding="utf-8") as f:
+  sample = f.read()
+
+
+def test_index_lookups_with_and_without_numpy(tmp_path, monkeypatch):
+  source = tmp_path / "FedACHdir.txt"
+  source.write_text("121000248O0710003011020801000000000WELLS FARGO BANK\n071000505\n071000505\nHEADER\n")
+  index = str(tmp_path / "routing.idx")
+  assert build_index(str(source), index) == 2
+
+  with RoutingDirectory(index) as directory:
+    assert "121000248" in directory and "121000249" not in directory
+    assert directory.contains_many(["071000505", "000000000", "99999999x"]) == [True, False, False]
+  monkeypatch.setattr(routing_directory, "numpy", None)
+  with RoutingDirectory(index) as directory:
+    assert directory.contains_many(["071000505", "999999999"]) == [True, False]
+    assert aba_valid_many(["121000248", "121000249", "12100024"]) == [True, False, False]
+
+
+def test_validation_flags_unknown_receiving_dfi(tmp_path):
+  index = str(tmp_path / "routing.idx")
+  build_index(["121000248"], index)
+  with RoutingDirectory(index) as directory:
+    status, errors = validate_nacha_file(sample, routing_directory=directory)
+  assert status == "invalid"
+  assert [e["code"] for e in errors] == ["RECEIVING_DFI_UNKNOWN", "RECEIVING_DFI_UNKNOWN"]
+
+
+def test_validator_checks_digits_in_bulk():
+  lines = sample.splitlines()
+  entry = next(number for number, line in enumerate(lines) if line.startswith("6"))
+  lines[entry] = lines[entry][:11] + str((int(lines[entry][11]) + 1) % 10) + lines[entry][12:]
+  status, errors = validate_nacha_file("\n".join(lines))
+
+  assert status == "invalid"
+  assert [(error["line"], error["code"]) for error in errors] == [(entry + 1, "CHECK_DIGIT")]
+
+
+def test_numpy_and_fallback_bulk_paths_agree(tmp_path, monkeypatch):
+  pytest.importorskip("numpy")
+  routings = ["121000248", "121000249", "071000505", "071000506", "021000021", "12100024", "12100024x",
+              "000000000", "011000015", "011000016"]
+  assert len(routings) >= routing_directory.NUMPY_MIN_BATCH
+  index = str(tmp_path / "routing.idx")
+  build_index(["121000248", "071000505", "011000015"], index)
+
+  valid = aba_valid_many(routings)
+  with RoutingDirectory(index) as directory:
+    known = directory.contains_many(routings)
+  assert routing_directory.numpy is not None
+  assert known == [True, False, True, False, False, False, False, False, True, False]
+
+  monkeypatch.setattr(routing_directory, "numpy", None)
+  assert aba_valid_many(routings) == valid
+  with RoutingDirectory(index) as directory:
+    assert directory.contains_many(routings) == known
@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+from hybrid_generation import spec_from_file
+from nacha_service import NachaService, request
+
+sample = "resources/nacha_customer_CT_PPD.txt"
+
+
+class SlowModel:
+  """Async client whose answers are held back until released"""
+
+  def __init__(self):
+    self.release = asyncio.Event()
+    self.messages = self
+
+  async def create(self, **params):
+    await self.release.wait()
+    spec = spec_from_file(sample)
+    return SimpleNamespace(content=[SimpleNamespace(type="tool_use", name="emit_nacha_spec", input=spec)], usage=None)
+
+
+def test_validate_jobs_and_backpressure():
+  async def run():
+    model = SlowModel()
+    async with await NachaService(workers=1, llm_workers=1, llm_queue_size=1, llm_client=model, env_file=None).start(port=0) as service:
+      call = lambda method, path, payload=None: request("127.0.0.1", service.port, method, path, payload)
+      with open(sample, 'r', encoding='utf-8') as f:
+        status, result = await call("POST", "/validate", {"content": f.read()})
+      assert (status, result["status"]) == (200, "valid")
+
+      statuses = []
+      for _ in range(3):  # one call in flight, one queued, one rejected
+        statuses.append(await call("POST", "/generate", {"prompt": "two payroll credits"}))
+        await asyncio.sleep(0.05)
+      assert [status for status, _ in statuses] == [202, 202, 429]
+
+      model.release.set()
+      job_id = statuses[0][1]["job_id"]
+      for _ in range(100):
+        status, job = await call("GET", f"/status/{job_id}")
+        if job["status"] == "done":
+          break
+        await asyncio.sleep(0.05)
+      assert job["result"]["content"].startswith("1")
+      assert (await call("GET", "/status"))[1]["rejected"] >= 1
+  asyncio.run(run())
+
+
+def test_spec_requests_cannot_choose_the_env_file():
+  async def run():
+    async with await NachaService(workers=1, llm_workers=1, env_file=None).start(port=0) as service:
+      payload = {"spec": spec_from_file(sample), "env": "/nonexistent/server-secrets.json"}
+      status, result = await request("127.0.0.1", service.port, "POST", "/generate", payload)
+      assert status == 200 and result["content"].startswith("1")
+  asyncio.run(run())
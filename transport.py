@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import re
+import random
+import hashlib
+import argparse
+import threading
+from types import SimpleNamespace
+from contextlib import contextmanager
+
+from instrumentation import metrics
+
+MODES = ("passthrough", "record", "replay")
+DEFAULT_CASSETTE_DIR = "cassettes"
+
+# Request keys that do not change the answer and are left out of the cassette key
+VOLATILE_KEYS = ("timeout", "metadata", "extra_headers", "extra_query", "extra_body")
+
+# Lines that look like NACHA records (a record type and two more digits, record length) keep their spacing
+RECORD_LINE = re.compile(r"[156789]\d\d.{77,}")
+
+
+class CassetteNotFound(LookupError):
+    """Replay mode found no cassette for a request"""
+
+
+class InjectedError(Exception):
+    """Synthetic overloaded response raised by fault injection; retryable like a real 529"""
+
+    status_code = 529
+
+
+def normalize_request(params):
+    """
+    Canonical form of Messages API parameters for keying cassettes
+
+    Volatile keys are dropped, runs of whitespace in prose are collapsed and
+    attachment data is replaced by its SHA-256, so the key survives reformatted
+    prompts and the cassette stays small. Record-shaped lines are kept verbatim,
+    as their spacing is data. Normalizing twice gives the same result.
+    """
+    def walk(value):
+        if isinstance(value, dict):
+            data = value.get("data")
+            if isinstance(data, str) and not data.startswith("sha256:") and "type" in value:
+                value = {**value, "data": "sha256:" + hashlib.sha256(data.encode()).hexdigest()}
+            return {key: walk(item) for key, item in sorted(value.items()) if key not in VOLATILE_KEYS}
+        if isinstance(value, (list, tuple)):
+            return [walk(item) for item in value]
+        if isinstance(value, str):
+            return _normalize_text(value)
+        return value
+    return walk(params)
+
+
+def _normalize_text(text):
+    chunks, words = [], []
+    for line in text.splitlines():
+        if RECORD_LINE.fullmatch(line):
+            if words:
+                chunks.append(" ".join(words))
+                words = []
+            chunks.append(line)
+        else:
+            words += line.split()
+    if words:
+        chunks.append(" ".join(words))
+    return "\n".join(chunks)
+
+
+def request_key(params):
+    """SHA-256 of the normalized request"""
+    return hashlib.sha256(json.dumps(normalize_request(params), sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def message_to_dict(message):
+    """Serialize an SDK Message (or a replayed one) for a cassette"""
+    if hasattr(message, "model_dump"):
+        return message.model_dump(mode="json")
+    if isinstance(message, SimpleNamespace):
+        data = vars(message).copy()
+        data["content"] = [vars(block) for block in message.content]
+        if isinstance(getattr(message, "usage", None), SimpleNamespace):
+            data["usage"] = vars(message.usage)
+        return data
+    return dict(message)
+
+
+def message_from_dict(data):
+    """
+    Rebuild a message with the attributes the generation code reads
+
+    Content blocks and usage become attribute objects; tool inputs stay dicts,
+    as they are in the SDK.
+    """
+    usage = data.get("usage")
+    return SimpleNamespace(**{**data, "content": [SimpleNamespace(**block) for block in data["content"]],
+                              "usage": SimpleNamespace(**usage) if usage else None})
+
+
+class _Messages:
+    def __init__(self, create):
+        self.create = create
+
+
+class ReplayClient:
+    """Answers messages.create from cassettes; never touches the network"""
+
+    def __init__(self, cassette_dir):
+        self.cassette_dir = cassette_dir
+        self.messages = _Messages(self._create)
+
+    def path(self, key):
+        return os.path.join(self.cassette_dir, f"{key}.json")
+
+    def load(self, params):
+        key = request_key(params)
+        try:
+            with open(self.path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise CassetteNotFound(f"No cassette {key} in {self.cassette_dir}; record one with NACHA_TRANSPORT=record") from None
+
+    def _create(self, **params):
+        metrics.add("cassette_replays")
+        return message_from_dict(self.load(params)["response"])
+
+
+class RecordingClient(ReplayClient):
+    """Replays known requests and sends new ones to the real client, saving each answer as a cassette"""
+
+    def __init__(self, cassette_dir, client):
+        super().__init__(cassette_dir)
+        self.client = client
+
+    def _create(self, **params):
+        try:
+            return super()._create(**params)
+        except CassetteNotFound:
+            pass
+        message = self.client.messages.create(**params)
+        cassette = {"key": request_key(params), "recorded_at": time.time(), "synthetic": False,
+                    "request": normalize_request(params), "response": message_to_dict(message)}
+        os.makedirs(self.cassette_dir, exist_ok=True)
+        tmp_path = self.path(cassette["key"]) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cassette, f, indent=1)
+        os.replace(tmp_path, self.path(cassette["key"]))
+        metrics.add("cassette_recordings")
+        return message
+
+
+class FaultInjectingClient:
+    """
+    Wrap a client with synthetic latency and errors
+
+    Each call sleeps latency plus a uniform jitter, and fails with InjectedError
+    (status 529, so resilient_calls retries it) with probability error_rate. A
+    call slower than its timeout sleeps for the timeout and raises TimeoutError.
+    """
+
+    def __init__(self, client, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.client = client
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.messages = _Messages(self._create)
+
+    def _create(self, timeout=None, **params):
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            failing = self._rng.random() < self.error_rate
+        if timeout is not None and delay > timeout:
+            time.sleep(max(0.0, timeout))
+            raise TimeoutError(f"Injected latency {delay:.3f}s exceeds the {timeout:.3f}s timeout")
+        time.sleep(delay)
+        if failing:
+            metrics.add("injected_errors")
+            raise InjectedError("Injected overloaded error")
+        return self.client.messages.create(**params)
+
+
+class Transport:
+    """
+    Source of the Claude client used by the generation modules
+
+    "passthrough" returns the real SDK client, "record" replays known requests and
+    records new ones, and "replay" answers only from cassettes, offline and without
+    an API key. Cassettes are JSON files named by request_key(). Any mode can add
+    synthetic latency and errors for tests and benchmarks. Configured from
+    NACHA_TRANSPORT, NACHA_CASSETTE_DIR, NACHA_TRANSPORT_LATENCY,
+    NACHA_TRANSPORT_JITTER and NACHA_TRANSPORT_ERROR_RATE.
+    """
+
+    def __init__(self, mode="passthrough", cassette_dir=DEFAULT_CASSETTE_DIR, latency=0.0, jitter=0.0,
+                 error_rate=0.0, seed=None, client=None):
+        """
+        Args:
+            mode: "passthrough", "record" or "replay"
+            cassette_dir: Directory holding the cassettes
+            latency, jitter, error_rate, seed: Fault injection (see FaultInjectingClient)
+            client: Real client for passthrough and record (default: Anthropic from ANTHROPIC_API_KEY)
+        """
+        self.configure(mode, cassette_dir, latency, jitter, error_rate, seed, client)
+
+    @classmethod
+    def from_env(cls):
+        return cls(mode=os.environ.get("NACHA_TRANSPORT", "passthrough"),
+                   cassette_dir=os.environ.get("NACHA_CASSETTE_DIR", DEFAULT_CASSETTE_DIR),
+                   latency=float(os.environ.get("NACHA_TRANSPORT_LATENCY", 0)),
+                   jitter=float(os.environ.get("NACHA_TRANSPORT_JITTER", 0)),
+                   error_rate=float(os.environ.get("NACHA_TRANSPORT_ERROR_RATE", 0)))
+
+    def configure(self, mode="passthrough", cassette_dir=DEFAULT_CASSETTE_DIR, latency=0.0, jitter=0.0,
+                  error_rate=0.0, seed=None, client=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown transport mode '{mode}', expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.cassette_dir = cassette_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self._real_client = client
+        self._client = None
+
+    @contextmanager
+    def use(self, mode, **options):
+        """Switch modes for the duration of a block (e.g. a test), then restore the previous settings"""
+        previous = {name: getattr(self, name) for name in ("mode", "cassette_dir", "latency", "jitter", "error_rate", "seed")}
+        real_client = self._real_client
+        self.configure(mode, **{"cassette_dir": self.cassette_dir, **options})
+        try:
+            yield self
+        finally:
+            self.configure(client=real_client, **previous)
+
+    def real_client(self):
+        if self._real_client is None:
+            api_key = os.environ.get("ANTHROPIC_API_KEY")
+            if not api_key:
+                raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
+            from anthropic import Anthropic
+            self._real_client = Anthropic(api_key=api_key, max_retries=0)  # retries and deadlines come from resilient_calls
+        return self._real_client
+
+    def client(self):
+        """The client for the current mode, created on first use"""
+        if self._client is None:
+            if self.mode == "replay":
+                client = ReplayClient(self.cassette_dir)
+            elif self.mode == "record":
+                client = RecordingClient(self.cassette_dir, self.real_client())
+            else:
+                client = self.real_client()
+            if self.latency or self.jitter or self.error_rate:
+                client = FaultInjectingClient(client, self.latency, self.jitter, self.error_rate, self.seed)
+            self._client = client
+        return self._client
+
+
+# Shared transport used by the generation modules
+transport = Transport.from_env()
+
+
+def benchmark(cassette_dir, calls=100, latency=0.5, jitter=0.5, error_rate=0.0, seed=0):
+    """
+    Replay every cassette in turn through create_message with synthetic latency
+
+    Returns:
+        dict: calls, failures, retries and p50/p95/p99 of the llm_call span in milliseconds
+    """
+    from resilient_calls import create_message
+
+    requests = []
+    for name in sorted(os.listdir(cassette_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(cassette_dir, name), 'r', encoding='utf-8') as f:
+                requests.append(json.load(f)["request"])
+    if not requests:
+        raise ValueError(f"No cassettes in {cassette_dir}")
+
+    metrics.reset()
+    failures = 0
+    with transport.use("replay", cassette_dir=cassette_dir, latency=latency, jitter=jitter,
+                       error_rate=error_rate, seed=seed) as replay:
+        for number in range(calls):
+            try:
+                create_message(replay.client(), requests[number % len(requests)])
+            except Exception:
+                failures += 1
+    span = metrics.summary()["spans"]["llm_call"]
+    return {"calls": calls, "failures": failures, "retries": metrics.counters.get("retries", 0),
+            "p50_ms": span["p50_ms"], "p95_ms": span["p95_ms"], "p99_ms": span["p99_ms"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded Claude calls with synthetic latency and errors")
+    parser.add_argument("--cassettes", default=DEFAULT_CASSETTE_DIR, help="Cassette directory")
+    parser.add_argument("--calls", type=int, default=100, help="Calls to make")
+    parser.add_argument("--latency", type=float, default=0.5, help="Base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Extra uniform latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls failing with a 529")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the injected latency and errors")
+
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.cassettes, args.calls, args.latency, args.jitter, args.error_rate, args.seed), indent=2))
@@ -1,6 +1,7 @@
 import gradio as gr
 from dotenv import load_dotenv
 from generate_nacha_file import claude_api_with_attachments
+from output_store import OutputStore
 
 # Load environment variables from .env file
 load_dotenv()
@@ -8,8 +9,8 @@ load_dotenv()
 # Specify file paths
 files = ["resources\\NACHA_format.pdf", "resources\\nacha_customer_CT_PPD.txt"]
 
-# Output file path (optional)
-output_file = "nacha_file_response.txt"
+# Generated files are kept in a content-addressed store instead of overwriting one output file
+store = OutputStore()
 input_prompt = """Please generate a NACHA outgoing payment file with ccd as sec code with 2 batches.
 Each batch will have 2 transactions of  50$ each."""
 
@@ -17,7 +18,7 @@ Each batch will have 2 transactions of  50$ each."""
 def generate_file(prompt):
     # This function would typically call a backend service to generate the Nacha file
     # For demonstration purposes, we will just return the prompt as output
-    message = claude_api_with_attachments(files, prompt, output_file=output_file)
+    message = claude_api_with_attachments(files, prompt, store=store)
     return message
   
 
@@ -36,5 +37,6 @@ with gr.Blocks() as demo:
     submit_btn.click(fn=generate_file, inputs=prompt, outputs=output)
     
     
-demo.launch()
+if __name__ == "__main__":
+    demo.launch()
     
\ No newline at end of file